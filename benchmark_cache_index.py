@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Check the server cache fuzzy index against the exhaustive difflib scan it
+replaces, and time both.
+
+Builds an index of portfolio-style questions, looks up edited copies of
+them plus unrelated questions, and compares every result with scoring all
+cached questions (best ratio >= threshold, first question on ties). Exits
+non-zero on any difference.
+
+Usage: python benchmark_cache_index.py [keys] [queries] [threshold]
+"""
+
+import difflib
+import random
+import sys
+import time
+
+from server.cache.fuzzy_index import FuzzyIndex, normalize_question
+
+SUBJECTS = ["ryan", "he", "the bot", "your portfolio", "the esp32 van controller", "rpaudio",
+            "the midi guitar overlay", "the aida press retrofit", "tegg inspections",
+            "the led grow light", "this chat app", "the palindrome classifier", "his pcb work"]
+QUESTIONS = ["what is {}", "tell me about {}", "how does {} work", "what did {} build",
+             "who made {}", "what languages does {} use", "show me photos of {}",
+             "why did {} start", "what libraries does {} use", "how long did {} take"]
+EXTRAS = ["", "?", " please", " in detail", " again", " for me", "!!", " exactly"]
+
+
+def brute_force(query: str, questions: list, threshold: float):
+    """The scan the chat route used to run over every cached question."""
+    query = normalize_question(query)
+    best, best_similarity = None, 0.0
+    for question in questions:
+        similarity = difflib.SequenceMatcher(None, query, normalize_question(question)).ratio()
+        if similarity > best_similarity and similarity >= threshold:
+            best, best_similarity = question, similarity
+    return (best, best_similarity) if best is not None else None
+
+
+def edit(text: str, rng: random.Random) -> str:
+    chars = list(text)
+    for _ in range(rng.randint(0, 6)):
+        position = rng.randrange(len(chars) + 1)
+        operation = rng.choice("ids")
+        if operation == "i":
+            chars.insert(position, rng.choice("abcdefghijklmnopqrstuvwxyz "))
+        elif chars and position < len(chars):
+            if operation == "d":
+                del chars[position]
+            else:
+                chars[position] = rng.choice("abcdefghijklmnopqrstuvwxyz ")
+    return "".join(chars)
+
+
+def main():
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 0.8
+    rng = random.Random(42)
+
+    questions = []
+    while len(questions) < keys:
+        question = rng.choice(QUESTIONS).format(rng.choice(SUBJECTS)) + rng.choice(EXTRAS) + \
+            (f" #{rng.randrange(1000)}" if rng.random() < 0.5 else "")
+        if question not in questions:
+            questions.append(question)
+    lookups = [edit(rng.choice(questions), rng) if rng.random() < 0.8
+               else rng.choice(QUESTIONS).format(rng.choice(SUBJECTS)) for _ in range(queries)]
+
+    index = FuzzyIndex()
+    index.rebuild(questions)
+    # Exercise incremental updates too, mirrored on the plain list
+    for question in rng.sample(questions, 20):
+        index.remove(question)
+        questions.remove(question)
+    for question in [f"what is new in {s} lately" for s in SUBJECTS]:
+        index.add(question)
+        questions.append(question)
+
+    start = time.perf_counter()
+    expected = [brute_force(query, questions, threshold) for query in lookups]
+    scan_ms = (time.perf_counter() - start) / queries * 1000
+
+    start = time.perf_counter()
+    actual = [index.best_match(query, threshold) for query in lookups]
+    index_ms = (time.perf_counter() - start) / queries * 1000
+
+    mismatches = [(q, e, a) for q, e, a in zip(lookups, expected, actual) if e != a]
+    hits = sum(result is not None for result in expected)
+    print(f"📊 {len(questions)} keys, {queries} queries ({hits} hits), threshold {threshold}")
+    print(f"   full scan {scan_ms:.2f} ms/query, index {index_ms:.3f} ms/query")
+    for query, want, got in mismatches[:10]:
+        print(f"❌ {query!r}: scan {want}, index {got}")
+    if mismatches:
+        print(f"❌ {len(mismatches)} result(s) differ from the full scan")
+        return 1
+    print("✅ Index results identical to the full scan")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
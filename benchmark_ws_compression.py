@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark WebSocket frame encodings for a typical bot answer.
+
+Compares bytes sent per client and CPU time per answer broadcast to a room
+of clients for JSON and msgpack, with no compression, the server's
+size-threshold deflate (?compress=1, done once per broadcast) and
+permessage-deflate style compression (every frame, once per client).
+
+Usage: python benchmark_ws_compression.py [threshold_bytes] [clients] [iterations]
+"""
+
+import sys
+import time
+import zlib
+
+from server.chat.connection import (
+    CONNECTION_CONFIG, PROTOCOL_JSON, PROTOCOL_MSGPACK, EncodedMessage, msgpack)
+
+
+def build_answer_frames(chunk_chars: int = 64) -> list:
+    """The frames one streamed bot answer produces, in order."""
+    answer = (
+        "I built a real-time portfolio chat that streams answers from a local LLM "
+        "over WebSockets, with sentence-by-sentence text to speech and a gallery "
+        "of project images. The backend is FastAPI with a Chroma vector store for "
+        "retrieval, SQLite for chat history and a small scheduler that keeps one "
+        "visitor from monopolising the CPU-only model. Before that I spent years as "
+        "an electrician, which is where the ESP32 van controller, the BLE RGB strip "
+        "driver and the MOSFET PCB projects came from. On the software side I mostly "
+        "write Python and JavaScript: async services, home automation glue, a MIDI "
+        "guitar overlay for streaming and plenty of small tools for my own workflow. "
+        "Ask me about any of them and I can show screenshots or videos. "
+        "[BUTTON|view_project_images|View Images]"
+    )
+    gallery = "[GALLERY_SHOW|" + "||".join(
+        f"/static/images/projects/project_{i}/screenshot_{i:02d}.png" for i in range(40)) + "|Projects]"
+
+    frames = [{"event": "bot_typing", "data": {"user": "ChatBot", "typing": True}}]
+    for start in range(0, len(answer), chunk_chars):
+        frames.append({"event": "bot_message_stream", "data": {
+            "user": "ChatBot", "chunk": answer[start:start + chunk_chars],
+            "is_first": start == 0, "is_complete": False}})
+    frames.append({"event": "bot_message_stream", "data": {
+        "user": "ChatBot", "chunk": "", "is_first": False, "is_complete": True,
+        "full_message": answer, "progress": 100}})
+    for segment in range(4):
+        frames.append({"event": "bot_voice", "data": {
+            "user": "ChatBot", "segment": segment, "is_last": segment == 3,
+            "voice_urls": {"opus": f"/voice/{segment:032x}.opus", "mp3": f"/voice/{segment:032x}.mp3"}}})
+    frames.append({"event": "gallery_commands", "data": {"user": "ChatBot", "commands": gallery}})
+    return frames
+
+
+def _size(frame) -> int:
+    return len(frame.encode("utf-8")) if isinstance(frame, str) else len(frame)
+
+
+def run_threshold(frames: list, protocol: str, compress: bool) -> tuple:
+    """Bytes for one answer and the frames that ended up deflated."""
+    total = deflated = 0
+    for payload in frames:
+        frame = EncodedMessage(payload=payload).encode(protocol, compress)
+        total += _size(frame)
+        deflated += compress and isinstance(frame, bytes) and frame[:1] == b"\x01"
+    return total, deflated
+
+
+def run_permessage_deflate(frames: list, protocol: str, clients: int) -> tuple:
+    """
+    Every frame deflated for every client with its own context, as
+    permessage-deflate does by default (context takeover).
+    """
+    compressors = [zlib.compressobj(CONNECTION_CONFIG["COMPRESS_LEVEL"], zlib.DEFLATED, -15)
+                   for _ in range(clients)]
+    total = 0
+    for payload in frames:
+        data = EncodedMessage(payload=payload).encode(protocol)
+        data = data.encode("utf-8") if isinstance(data, str) else data
+        for compressor in compressors:
+            # The 4-byte sync flush trailer is stripped on the wire
+            size = len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+        total += size
+    return total, len(frames)
+
+
+def measure(label: str, run, iterations: int):
+    start = time.process_time()
+    for _ in range(iterations):
+        total, deflated = run()
+    cpu_us = (time.process_time() - start) / iterations * 1e6
+    print(f"{label:<34} {total:>10} B {deflated:>9} {cpu_us:>10.1f} µs")
+
+
+def main():
+    if len(sys.argv) > 1:
+        CONNECTION_CONFIG["COMPRESS_THRESHOLD"] = int(sys.argv[1])
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    frames = build_answer_frames()
+    protocols = [PROTOCOL_JSON] + ([PROTOCOL_MSGPACK] if msgpack is not None else [])
+    print(f"📊 {len(frames)} frames per answer, {clients} clients, threshold "
+          f"{CONNECTION_CONFIG['COMPRESS_THRESHOLD']} B, {iterations} iterations")
+    print(f"{'encoding':<34} {'bytes/client':>12} {'deflated':>9} {'cpu/answer':>13}")
+    for protocol in protocols:
+        measure(f"{protocol}", lambda: run_threshold(frames, protocol, False), iterations)
+        measure(f"{protocol} + threshold deflate",
+                lambda: run_threshold(frames, protocol, True), iterations)
+        measure(f"{protocol} + permessage-deflate",
+                lambda: run_permessage_deflate(frames, protocol, clients), iterations)
+    if msgpack is None:
+        print("ℹ️ msgpack not installed, skipped msgpack rows")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
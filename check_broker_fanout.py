@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Check chat fan-out between two nodes over RedisBroker.
+
+Starts the local RESP stand-in (server/chat/resp_server.py), or uses a real
+server if a redis:// URL is given, connects two brokers as two nodes and
+checks that messages published on one reach the other (and never echo back
+to the sender), including after the publish connection or the whole server
+connection drops.
+
+Usage: python check_broker_fanout.py [redis://host:port]
+"""
+
+import asyncio
+import sys
+
+from server.chat.broker import PUBLIC_CHANNEL, RedisBroker
+from server.chat.resp_server import LocalRespServer
+
+
+class Node:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.broker = RedisBroker(url)
+        self.received = []
+        self.connects = 0
+        self.broker.subscribe(PUBLIC_CHANNEL, self.received.append)
+        self.broker.add_connect_listener(self._on_connect)
+
+    def _on_connect(self):
+        self.connects += 1
+
+
+async def wait_for(condition, timeout: float = 10.0) -> bool:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.02)
+    return True
+
+
+async def check_delivery(sender: Node, receiver: Node, label: str) -> bool:
+    before = len(receiver.received)
+    sender.broker.publish(PUBLIC_CHANNEL, {"op": "check", "label": label})
+    delivered = await wait_for(lambda: any(
+        m.get("label") == label for m in receiver.received[before:]))
+    echoed = any(m.get("label") == label for m in sender.received)
+    ok = delivered and not echoed
+    print(f"{'✅' if ok else '❌'} {label}: {sender.name} -> {receiver.name}"
+          f"{'' if delivered else ' not delivered'}{' echoed to sender' if echoed else ''}")
+    return ok
+
+
+async def main() -> int:
+    server = None
+    if len(sys.argv) > 1:
+        url = sys.argv[1]
+    else:
+        server = LocalRespServer()
+        url = f"redis://127.0.0.1:{await server.start()}"
+        print(f"📡 Local RESP server on {url}")
+
+    a, b = Node("node-a", url), Node("node-b", url)
+    results = []
+    try:
+        await a.broker.start()
+        await b.broker.start()
+        if not await wait_for(lambda: a.connects and b.connects):
+            print("❌ Brokers did not connect")
+            return 1
+
+        results.append(await check_delivery(a, b, "fan-out"))
+        results.append(await check_delivery(b, a, "fan-out back"))
+
+        if server is not None:
+            # Publish connections only: the done-callback must force a reconnect
+            connects = a.connects
+            server.drop_clients(subscribers=False)
+            reconnected = await wait_for(lambda: a.connects > connects, timeout=15)
+            print(f"{'✅' if reconnected else '❌'} reconnect after the publish connection dropped")
+            results.append(reconnected)
+            results.append(await check_delivery(a, b, "after publish drop"))
+
+            # Everything: messages published while down are buffered and sent on reconnect
+            connects = b.connects
+            server.drop_clients()
+            await asyncio.sleep(0.1)
+            results.append(await check_delivery(b, a, "buffered across reconnect"))
+            results.append(b.connects > connects)
+    finally:
+        await a.broker.close()
+        await b.broker.close()
+        if server is not None:
+            await server.close()
+
+    if all(results):
+        print("✅ Two-node fan-out works")
+        return 0
+    print(f"❌ {results.count(False)} check(s) failed")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,207 @@
+import difflib
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_question(text: str) -> str:
+    """Normalize a question the same way for indexing and lookup."""
+    return text.lower().strip()
+
+
+# Character count columns: printable ASCII, plus one shared column for everything else
+_COLUMNS = 96
+
+
+def _char_counts(text: str) -> np.ndarray:
+    counts = np.zeros(_COLUMNS, dtype=np.int32)
+    for char in text:
+        code = ord(char) - 32
+        counts[code if 0 <= code < _COLUMNS - 1 else _COLUMNS - 1] += 1
+    return counts
+
+
+class FuzzyIndex:
+    """
+    Fuzzy lookup over cached questions.
+
+    Gives exactly the result of scoring every cached question with difflib
+    (best ratio at or above the threshold, earliest question on ties) while
+    running SequenceMatcher on only a few of them. Questions are kept sorted
+    by length, so only those whose length allows the threshold are looked
+    at; their character counts give an upper bound on the ratio (the same
+    bound as SequenceMatcher.quick_ratio) for all of them in one vectorized
+    step; candidates are then verified best bound first, stopping once no
+    remaining bound can beat the best ratio found. An optional embedding
+    matrix (fed by the already loaded embedding model) catches paraphrases
+    difflib misses.
+    """
+
+    def __init__(self):
+        self.built = False
+        self._lock = threading.RLock()
+
+        # Row i of the arrays is question _keys[i], in insertion order
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._normalized: List[str] = []
+        self._counts = np.zeros((0, _COLUMNS), dtype=np.int32)
+        self._lengths = np.zeros(0, dtype=np.int64)
+        self._by_length: Optional[np.ndarray] = None  # rows sorted by length, rebuilt lazily
+        self._sorted_lengths = np.zeros(0, dtype=np.int64)
+
+        self._encoder: Optional[Callable[[List[str]], np.ndarray]] = None
+        self._embedding_threshold = 1.0
+        self._embedding_keys: List[str] = []
+        self._embeddings: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, question: str) -> bool:
+        return question in self._rows
+
+    @property
+    def has_encoder(self) -> bool:
+        return self._encoder is not None
+
+    def rebuild(self, questions: Iterable[str]):
+        """Replace the whole index with the given questions."""
+        with self._lock:
+            self._keys = []
+            self._rows = {}
+            self._normalized = []
+            for question in questions:
+                if question not in self._rows:
+                    self._rows[question] = len(self._keys)
+                    self._keys.append(question)
+                    self._normalized.append(normalize_question(question))
+            self._counts = np.array([_char_counts(text) for text in self._normalized],
+                                    dtype=np.int32).reshape(-1, _COLUMNS)
+            self._lengths = np.array([len(text) for text in self._normalized], dtype=np.int64)
+            self._by_length = None
+            self._embedding_keys = []
+            self._embeddings = None
+            if self._encoder is not None:
+                self._embed(list(self._keys))
+            self.built = True
+        print(f"🗂️ Built cache fuzzy index with {len(self._keys)} questions")
+
+    def clear(self):
+        self.rebuild([])
+
+    def add(self, question: str):
+        """Index a new cached question (appended, like a new key in the cache dict)."""
+        with self._lock:
+            if question in self._rows:
+                return
+            normalized = normalize_question(question)
+            self._rows[question] = len(self._keys)
+            self._keys.append(question)
+            self._normalized.append(normalized)
+            self._counts = np.vstack([self._counts, _char_counts(normalized)])
+            self._lengths = np.append(self._lengths, len(normalized))
+            self._by_length = None
+            if self._encoder is not None:
+                self._embed([question])
+
+    def remove(self, question: str):
+        """Drop a cached question from the index."""
+        with self._lock:
+            row = self._rows.pop(question, None)
+            if row is None:
+                return
+            del self._keys[row]
+            del self._normalized[row]
+            self._counts = np.delete(self._counts, row, axis=0)
+            self._lengths = np.delete(self._lengths, row)
+            for key in self._keys[row:]:
+                self._rows[key] -= 1
+            self._by_length = None
+            if question in self._embedding_keys:
+                row = self._embedding_keys.index(question)
+                del self._embedding_keys[row]
+                self._embeddings = np.delete(self._embeddings, row, axis=0)
+
+    def attach_encoder(self, encoder: Callable[[List[str]], np.ndarray], threshold: float):
+        """Enable embedding lookup; encoder returns L2-normalized row vectors."""
+        with self._lock:
+            self._encoder = encoder
+            self._embedding_threshold = threshold
+            self._embedding_keys = []
+            self._embeddings = None
+            self._embed(list(self._keys))
+
+    def best_match(self, text: str, threshold: float = 0.8) -> Optional[Tuple[str, float]]:
+        """Return (question, similarity) for the best cached question at or above threshold."""
+        query = normalize_question(text)
+        if not query:
+            return None
+
+        with self._lock:
+            match = self._difflib_match(query, threshold)
+            if match is None and self._encoder is not None:
+                match = self._embedding_match(query)
+        return match
+
+    def _difflib_match(self, query: str, threshold: float) -> Optional[Tuple[str, float]]:
+        if not self._keys or threshold <= 0:
+            return self._scan(query, threshold)
+        if self._by_length is None:
+            self._by_length = np.argsort(self._lengths, kind="stable")
+            self._sorted_lengths = self._lengths[self._by_length]
+
+        # ratio <= 2 * min(len) / (len(query) + len(key)), so only this length window can qualify
+        query_len = len(query)
+        low = int(np.floor(threshold * query_len / (2 - threshold)))
+        high = int(np.ceil(query_len * (2 - threshold) / threshold))
+        start, end = np.searchsorted(self._sorted_lengths, [low, high + 1])
+        rows = self._by_length[start:end]
+        if not len(rows):
+            return None
+
+        # ratio <= 2 * (characters in common) / total length, computed the same way as ratio()
+        common = np.minimum(self._counts[rows], _char_counts(query)).sum(axis=1)
+        bounds = 2.0 * common / (query_len + self._lengths[rows])
+        reachable = bounds >= threshold
+        rows, bounds = rows[reachable], bounds[reachable]
+
+        best_row, best_ratio = None, threshold
+        for i in np.lexsort((rows, -bounds)):
+            if best_row is not None and bounds[i] < best_ratio:
+                break
+            row = int(rows[i])
+            ratio = difflib.SequenceMatcher(None, query, self._normalized[row]).ratio()
+            if ratio > best_ratio or (ratio == best_ratio and (best_row is None or row < best_row)):
+                best_row, best_ratio = row, ratio
+        return None if best_row is None else (self._keys[best_row], best_ratio)
+
+    def _scan(self, query: str, threshold: float) -> Optional[Tuple[str, float]]:
+        """Score every question (the behaviour _difflib_match reproduces)."""
+        best = None
+        for question, normalized in zip(self._keys, self._normalized):
+            ratio = difflib.SequenceMatcher(None, query, normalized).ratio()
+            if ratio >= threshold and (best is None or ratio > best[1]):
+                best = (question, ratio)
+        return best
+
+    def _embed(self, questions: List[str]):
+        if not questions:
+            return
+        vectors = np.asarray(self._encoder(
+            [self._normalized[self._rows[q]] for q in questions]), dtype=np.float32)
+        self._embedding_keys.extend(questions)
+        self._embeddings = vectors if self._embeddings is None else np.vstack(
+            [self._embeddings, vectors])
+
+    def _embedding_match(self, query: str) -> Optional[Tuple[str, float]]:
+        if self._embeddings is None or not len(self._embedding_keys):
+            return None
+        vector = np.asarray(self._encoder([query]), dtype=np.float32)[0]
+        scores = self._embeddings @ vector
+        row = int(np.argmax(scores))
+        score = float(scores[row])
+        if score >= self._embedding_threshold:
+            return self._embedding_keys[row], score
+        return None
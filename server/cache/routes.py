@@ -12,6 +12,7 @@ from sqlalchemy.orm import Session
 from server.db.db import SessionLocal
 from server.auth.auth import get_user_by_username
 from server.chat.portfolio_assistant import PortfolioAssistant
+from server.cache.store import cache_store, get_cache_file_path
 # from server.cache.client_cache import client_cache  # DISABLED
 # Create dummy client_cache object since it's referenced in the code
 
@@ -110,56 +111,19 @@ def get_admin_user(request: Request):
 async def get_admin_user_async(request: Request):
     return get_admin_user(request)
 
-# Get cache file path
-
-
-def get_cache_file_path():
-    return os.path.join(os.getcwd(), "cache_data.json")
-
 # Load cache data
 
 
 def load_cache_data():
-    print("🔍 Loading cache data...")
-    try:
-        cache_file = get_cache_file_path()
-        print(f"📁 Cache file path: {cache_file}")
-
-        if os.path.exists(cache_file):
-            print(
-                f"✅ Cache file exists, size: {os.path.getsize(cache_file)} bytes")
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                print(f"📊 Loaded {len(data)} cache entries")
-                return data
-        else:
-            print("❌ Cache file does not exist")
-            return {}
-    except Exception as e:
-        print(f"❌ Error loading cache data: {e}")
-        import traceback
-        traceback.print_exc()
-        return {}
+    """Copy of the in-memory server cache (reloaded only if the file changed)."""
+    return cache_store.snapshot()
 
 # Save cache data
 
 
 def save_cache_data(cache_data):
-    print("💾 Saving cache data...")
-    try:
-        cache_file = get_cache_file_path()
-        print(f"📁 Saving to: {cache_file}")
-
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, indent=2, ensure_ascii=False)
-
-        print(f"✅ Saved {len(cache_data)} cache entries")
-        return True
-    except Exception as e:
-        print(f"❌ Error saving cache data: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+    """Replace the server cache and persist it atomically."""
+    return cache_store.replace(cache_data)
 
 
 @router.get("/cache/status", response_model=CacheResponse)
@@ -405,23 +369,14 @@ async def get_client_cache_stats():
 async def increment_hit_count(request: CacheRequest, admin: str = Depends(get_admin_user)):
     """Increment hit count for a cache entry (admin only)"""
     try:
-        cache_data = load_cache_data()
+        hit_count = cache_store.record_hit(request.question)
 
-        if request.question in cache_data:
-            cache_data[request.question]["hitCount"] = cache_data[request.question].get(
-                "hitCount", 0) + 1
-
-            if save_cache_data(cache_data):
-                return CacheResponse(
-                    success=True,
-                    message=f"Incremented hit count for: {request.question}",
-                    data={"hitCount": cache_data[request.question]["hitCount"]}
-                )
-            else:
-                return CacheResponse(
-                    success=False,
-                    message="Failed to save cache data"
-                )
+        if hit_count is not None:
+            return CacheResponse(
+                success=True,
+                message=f"Incremented hit count for: {request.question}",
+                data={"hitCount": hit_count}
+            )
         else:
             return CacheResponse(
                 success=False,
@@ -438,23 +393,14 @@ async def increment_hit_count(request: CacheRequest, admin: str = Depends(get_ad
 async def increment_public_hit_count(request: CacheRequest):
     """Increment hit count for a cache entry (public access for frontend)"""
     try:
-        cache_data = load_cache_data()
-
-        if request.question in cache_data:
-            cache_data[request.question]["hitCount"] = cache_data[request.question].get(
-                "hitCount", 0) + 1
+        hit_count = cache_store.record_hit(request.question)
 
-            if save_cache_data(cache_data):
-                return CacheResponse(
-                    success=True,
-                    message=f"Incremented hit count for: {request.question}",
-                    data={"hitCount": cache_data[request.question]["hitCount"]}
-                )
-            else:
-                return CacheResponse(
-                    success=False,
-                    message="Failed to save cache data"
-                )
+        if hit_count is not None:
+            return CacheResponse(
+                success=True,
+                message=f"Incremented hit count for: {request.question}",
+                data={"hitCount": hit_count}
+            )
         else:
             return CacheResponse(
                 success=False,
@@ -718,17 +664,17 @@ async def listen_tts_for_cache_entry(
         response_text = cache_data[request.question]["response"]
 
         # Import TTS function
-        from server.voice.synth import synthesize_to_base64
+        from server.voice.synth import synthesize_to_url_async
 
-        # Generate TTS audio
+        # Generate TTS audio (served from the TTS cache when already synthesized)
         try:
-            audio_base64 = synthesize_to_base64(response_text)
+            audio_url = await synthesize_to_url_async(response_text)
             print(f"✅ Generated TTS for listening: {request.question}")
 
             return CacheResponse(
                 success=True,
                 message=f"TTS audio generated for: {request.question}",
-                data={"question": request.question, "audio": audio_base64}
+                data={"question": request.question, "audio_url": audio_url}
             )
         except Exception as tts_error:
             print(f"❌ TTS generation error: {tts_error}")
@@ -851,18 +797,17 @@ async def regenerate_tts_for_cache_entry(
         response_text = cache_data[request.question]["response"]
 
         # Import TTS function
-        from server.voice.synth import synthesize_to_base64
+        from server.voice.synth import synthesize_to_url_async
 
-        # Generate new TTS audio
+        # Generate new TTS audio, replacing the cached clip
         try:
-            audio_base64 = synthesize_to_base64(response_text)
+            audio_url = await synthesize_to_url_async(response_text, force=True)
             print(f"✅ Generated TTS for: {request.question}")
 
             return CacheResponse(
                 success=True,
                 message=f"TTS audio regenerated for: {request.question}",
-                data={"question": request.question,
-                      "audio_length": len(audio_base64)}
+                data={"question": request.question, "audio_url": audio_url}
             )
         except Exception as tts_error:
             print(f"❌ TTS generation error: {tts_error}")
@@ -882,9 +827,7 @@ async def regenerate_tts_for_cache_entry(
 async def clear_all_cache_entries(admin: str = Depends(get_admin_user)):
     """Clear all cache entries"""
     try:
-        cache_file = get_cache_file_path()
-        if os.path.exists(cache_file):
-            os.remove(cache_file)
+        cache_store.clear()
 
         return CacheResponse(
             success=True,
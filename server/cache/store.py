@@ -0,0 +1,251 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from server.cache.fuzzy_index import FuzzyIndex
+from server.chat.portfolio_assistant import PortfolioAssistant
+
+
+# Server response cache settings
+CACHE_STORE_CONFIG = {
+    # Minimum difflib similarity for a fuzzy hit
+    "FUZZY_THRESHOLD": 0.8,
+
+    # Also match paraphrases using the loaded SentenceTransformer model
+    "EMBEDDING_MATCH": os.getenv("CACHE_EMBEDDING_MATCH", "false").lower() == "true",
+
+    # Minimum cosine similarity for an embedding hit
+    "EMBEDDING_THRESHOLD": 0.9,
+
+    # Seconds between checks of cache_data.json for external edits
+    "MTIME_CHECK_INTERVAL": 1.0,
+
+    # Seconds to batch hit-count updates before writing them to disk
+    "FLUSH_DELAY": 5.0
+}
+
+
+def get_cache_file_path():
+    return os.path.join(os.getcwd(), "cache_data.json")
+
+
+class CacheSnapshot(dict):
+    """Entries returned by CacheStore.snapshot(), with the hit totals at that moment."""
+
+    def __init__(self, entries: Dict[str, dict], hit_totals: Counter):
+        super().__init__(entries)
+        self.hit_totals = hit_totals
+
+
+class CacheStore:
+    """
+    Process-wide owner of the server response cache (cache_data.json).
+
+    Entries live in memory and are reloaded only when the file changes on
+    disk. Hit counts are applied in memory immediately and written back in
+    batches by a background flush; every write goes to a temp file that is
+    atomically renamed over the cache file.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: Dict[str, dict] = {}
+        self._loaded_path: Optional[str] = None
+        self._file_stamp = None
+        self._last_check = 0.0
+        self._pending_hits: Counter = Counter()
+        # Hits recorded by this process per question (only grows), so replace()
+        # can tell which hits happened after the caller's snapshot
+        self._hit_totals: Counter = Counter()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.index = FuzzyIndex()
+
+    @staticmethod
+    def _stamp(path: str):
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self, force: bool = False):
+        """Reload from disk if the file was changed by someone else."""
+        path = get_cache_file_path()
+        now = time.monotonic()
+        if not force and path == self._loaded_path and \
+                now - self._last_check < CACHE_STORE_CONFIG["MTIME_CHECK_INTERVAL"]:
+            return
+        self._last_check = now
+
+        stamp = self._stamp(path)
+        if path == self._loaded_path and stamp == self._file_stamp:
+            return
+
+        entries = {}
+        if stamp is not None:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+                print(f"📊 Loaded {len(entries)} cache entries from {path}")
+            except Exception as e:
+                print(f"❌ Error loading cache data: {e}")
+                return
+
+        # Hits not yet flushed still count on top of the edited file
+        for question, hits in self._pending_hits.items():
+            if question in entries:
+                entries[question]["hitCount"] = entries[question].get(
+                    "hitCount", 0) + hits
+
+        self._entries = entries
+        self._loaded_path = path
+        self._file_stamp = stamp
+        self.index.rebuild(entries.keys())
+
+    def _ensure_encoder(self):
+        if CACHE_STORE_CONFIG["EMBEDDING_MATCH"] and not self.index.has_encoder \
+                and PortfolioAssistant._model_cache is not None:
+            model = PortfolioAssistant._model_cache
+            self.index.attach_encoder(
+                lambda texts: model.encode(texts, normalize_embeddings=True),
+                CACHE_STORE_CONFIG["EMBEDDING_THRESHOLD"])
+            print("🧠 Cache fuzzy index using embedding matches")
+
+    def snapshot(self) -> CacheSnapshot:
+        """Copy of all entries, safe for the caller to modify and pass to replace()."""
+        with self._lock:
+            self._refresh()
+            return CacheSnapshot({q: dict(entry) for q, entry in self._entries.items()},
+                                 Counter(self._hit_totals))
+
+    def get(self, question: str) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(question)
+            return dict(entry) if entry is not None else None
+
+    def lookup(self, question: str) -> Optional[Tuple[str, dict, float]]:
+        """Return (cached question, entry, similarity) for an exact or fuzzy hit."""
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(question)
+            if entry is not None:
+                return question, dict(entry), 1.0
+            self._ensure_encoder()
+            index = self.index
+
+        match = index.best_match(question, CACHE_STORE_CONFIG["FUZZY_THRESHOLD"])
+        if match is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(match[0])
+            if entry is None:
+                return None
+            return match[0], dict(entry), match[1]
+
+    def record_hit(self, question: str) -> Optional[int]:
+        """Count a hit in memory and schedule a batched flush. Returns the new count."""
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(question)
+            if entry is None:
+                return None
+            entry["hitCount"] = entry.get("hitCount", 0) + 1
+            self._pending_hits[question] += 1
+            self._hit_totals[question] += 1
+            count = entry["hitCount"]
+        self._schedule_flush()
+        return count
+
+    def replace(self, cache_data: Dict[str, dict]) -> bool:
+        """
+        Replace every entry and write the file now (used by admin edits).
+
+        Hits recorded after cache_data was taken with snapshot() are added to
+        the entries that still exist rather than lost. For other dicts only
+        the hits not yet flushed are added, as if it was read from the file.
+        """
+        with self._lock:
+            self._refresh(force=True)
+            old_keys = set(self._entries)
+            baseline = getattr(cache_data, "hit_totals", None)
+            missed = self._hit_totals - baseline if baseline is not None else self._pending_hits
+
+            self._entries = {q: dict(entry) for q, entry in cache_data.items()}
+            for question, hits in missed.items():
+                entry = self._entries.get(question)
+                if entry is not None and question in old_keys:
+                    entry["hitCount"] = entry.get("hitCount", 0) + hits
+            self._pending_hits.clear()
+            for question in old_keys - set(self._entries):
+                self._hit_totals.pop(question, None)
+                self.index.remove(question)
+            for question in set(self._entries) - old_keys:
+                self.index.add(question)
+            return self._write()
+
+    def clear(self):
+        """Drop every entry and remove the cache file."""
+        with self._lock:
+            cache_file = get_cache_file_path()
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+            self._entries = {}
+            self._pending_hits.clear()
+            self._hit_totals.clear()
+            self._loaded_path = cache_file
+            self._file_stamp = None
+            self.index.clear()
+
+    def flush(self) -> bool:
+        """Write pending hit counts to disk."""
+        with self._lock:
+            if not self._pending_hits:
+                return True
+            self._refresh(force=True)
+            self._pending_hits.clear()
+            return self._write()
+
+    def _write(self) -> bool:
+        cache_file = get_cache_file_path()
+        tmp_file = f"{cache_file}.tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, cache_file)
+            self._loaded_path = cache_file
+            self._file_stamp = self._stamp(cache_file)
+            print(f"✅ Saved {len(self._entries)} cache entries")
+            return True
+        except Exception as e:
+            print(f"❌ Error saving cache data: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(CACHE_STORE_CONFIG["FLUSH_DELAY"])
+        await asyncio.to_thread(self.flush)
+
+    async def aclose(self):
+        """Flush outstanding hit counts (called on shutdown)."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await asyncio.to_thread(self.flush)
+
+
+# Global cache store shared by the chat and /cache routes
+cache_store = CacheStore()
@@ -21,13 +21,20 @@ class BotWebSocket:
         self.bot_username = bot_username
         self.is_connected = True
         
-    async def accept(self):
+    async def accept(self, subprotocol=None):
         pass
     
     async def send_json(self, data):
         # Bot receives messages but doesn't need to do anything with most of them
         # We'll handle specific message types in the bot logic
         pass
+
+    async def send_text(self, data: str):
+        # Broadcasts arrive pre-serialized; same as send_json, nothing to do
+        pass
+
+    async def send_bytes(self, data: bytes):
+        pass
     
     async def receive_json(self):
         # This won't be called for the bot
@@ -166,8 +173,8 @@ class ChatBot:
         self.private_manager = private_manager
         
         # Connect the bot to both managers
-        await manager.connect(self.websocket, self.username)
-        await private_manager.connect(self.websocket, self.username)
+        connection = await manager.connect(self.websocket, self.username)
+        await private_manager.connect(connection, self.username)
         
         print(f"✅ {self.username} is now online and ready to chat!")
         
@@ -0,0 +1,306 @@
+import asyncio
+import functools
+import json
+import os
+import socket
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+
+# Cross-worker fan-out settings
+BROKER_CONFIG = {
+    # "" / "memory://" keeps everything in this process; "redis://[:password@]host:port"
+    # shares chat traffic between uvicorn workers or machines
+    "URL": os.getenv("CHAT_BROKER_URL", ""),
+
+    # Seconds between roster announcements; nodes silent for 3 intervals are forgotten
+    "ROSTER_SYNC_INTERVAL": float(os.getenv("CHAT_ROSTER_SYNC_INTERVAL", "30")),
+
+    # Messages buffered while the Redis connection is down (oldest are dropped)
+    "MAX_PENDING": 10000
+}
+
+PUBLIC_CHANNEL = "chat:public"
+PRIVATE_CHANNEL = "chat:private"
+
+Handler = Callable[[dict], None]
+
+
+class Broker(ABC):
+    """
+    Pub/sub transport between chat server processes.
+
+    publish() never blocks: messages are tagged with this node's id and sent
+    in the background. Handlers receive messages from every other node (never
+    this node's own) and are plain functions, since local delivery only
+    enqueues frames on ClientConnections.
+    """
+
+    def __init__(self):
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._connect_listeners: List[Callable[[], None]] = []
+
+    def subscribe(self, channel: str, handler: Handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def add_connect_listener(self, callback: Callable[[], None]):
+        """Called every time the broker (re)connects, e.g. to re-announce state."""
+        self._connect_listeners.append(callback)
+
+    @property
+    def has_peers(self) -> bool:
+        """Whether anything published can reach another node; when False, skip building messages."""
+        return True
+
+    @abstractmethod
+    def publish(self, channel: str, message: dict):
+        pass
+
+    async def start(self):
+        self._connected()
+
+    async def close(self):
+        pass
+
+    def _connected(self):
+        for callback in self._connect_listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"❌ Broker connect listener failed: {e}")
+
+    def _dispatch(self, channel: str, message: dict):
+        if message.get("origin") == self.node_id:
+            return
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(message)
+            except Exception as e:
+                print(f"❌ Error handling {channel} message from {message.get('origin')}: {e}")
+
+
+class InProcessBroker(Broker):
+    """
+    Broker for a single process. Brokers created with the same hub behave
+    like separate nodes, which is handy for trying multi-node behaviour
+    without a Redis server; by default every broker has a hub of its own,
+    so publishing is effectively free.
+    """
+
+    def __init__(self, hub: Optional[List["InProcessBroker"]] = None):
+        super().__init__()
+        self._hub = hub if hub is not None else []
+        self._hub.append(self)
+
+    @property
+    def has_peers(self) -> bool:
+        return len(self._hub) > 1
+
+    def publish(self, channel: str, message: dict):
+        if not self.has_peers:
+            return
+        message = dict(message, origin=self.node_id)
+        loop = asyncio.get_running_loop()
+        for broker in self._hub:
+            if broker is not self:
+                loop.call_soon(broker._dispatch, channel, message)
+
+    async def close(self):
+        if self in self._hub:
+            self._hub.remove(self)
+
+
+def _encode_command(*args) -> bytes:
+    """RESP array of bulk strings."""
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        parts.append(f"${len(data)}\r\n".encode())
+        parts.append(data + b"\r\n")
+    return b"".join(parts)
+
+
+class RedisError(Exception):
+    pass
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    """Read one RESP2 reply (errors are returned, not raised)."""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Redis connection closed")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        return RedisError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(count)]
+    raise ConnectionError(f"Unexpected Redis reply: {line[:50]!r}")
+
+
+class RedisBroker(Broker):
+    """
+    Broker over Redis PUBLISH/SUBSCRIBE using a minimal RESP client on asyncio
+    streams (no extra dependency). Any server speaking the Redis protocol
+    works, including the local stand-in in resp_server.py. Publishes are
+    pipelined without waiting for replies and buffered while reconnecting.
+    """
+
+    def __init__(self, url: str):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self._pending = deque(maxlen=BROKER_CONFIG["MAX_PENDING"])
+        self._pub_writer: Optional[asyncio.StreamWriter] = None
+        self._sub_writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+            writer.write(_encode_command(*auth))
+            await writer.drain()
+            reply = await _read_reply(reader)
+            if isinstance(reply, RedisError):
+                writer.close()
+                raise reply
+        return reader, writer
+
+    def subscribe(self, channel: str, handler: Handler):
+        is_new = channel not in self._handlers
+        super().subscribe(channel, handler)
+        if is_new and self._sub_writer is not None:
+            self._sub_writer.write(_encode_command("SUBSCRIBE", channel))
+
+    def publish(self, channel: str, message: dict):
+        data = json.dumps(dict(message, origin=self.node_id),
+                          separators=(",", ":"), ensure_ascii=False)
+        command = _encode_command("PUBLISH", channel, data)
+        if self._pub_writer is None or self._pub_writer.is_closing():
+            self._pending.append(command)
+            return
+        self._pub_writer.write(command)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        delay = 1.0
+        while not self._closed:
+            pub_reader_task = None
+            pub_writer = None
+            try:
+                sub_reader, self._sub_writer = await self._open()
+                pub_reader, pub_writer = await self._open()
+                if self._handlers:
+                    self._sub_writer.write(_encode_command("SUBSCRIBE", *self._handlers))
+                    await self._sub_writer.drain()
+                pub_reader_task = asyncio.create_task(self._read_publish_replies(pub_reader))
+                pub_reader_task.add_done_callback(
+                    functools.partial(self._publish_replies_done, self._sub_writer, pub_writer))
+
+                self._pub_writer = pub_writer
+                while self._pending:
+                    pub_writer.write(self._pending.popleft())
+                print(f"📡 Chat broker connected to redis://{self.host}:{self.port} as {self.node_id}")
+                delay = 1.0
+                self._connected()
+
+                while True:
+                    reply = await _read_reply(sub_reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        try:
+                            message = json.loads(reply[2])
+                        except ValueError:
+                            continue
+                        self._dispatch(reply[1].decode(), message)
+                    elif isinstance(reply, RedisError):
+                        print(f"❌ Redis subscribe error: {reply}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Chat broker connection lost ({e}), retrying in {delay:.0f}s")
+            finally:
+                self._pub_writer = None
+                if pub_reader_task is not None:
+                    pub_reader_task.cancel()
+                for writer in (self._sub_writer, pub_writer):
+                    if writer is not None:
+                        writer.close()
+                self._sub_writer = None
+
+            if self._closed:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    async def _read_publish_replies(self, reader: asyncio.StreamReader):
+        while True:
+            reply = await _read_reply(reader)
+            if isinstance(reply, RedisError):
+                print(f"❌ Redis publish error: {reply}")
+
+    def _publish_replies_done(self, sub_writer: asyncio.StreamWriter, pub_writer: asyncio.StreamWriter,
+                              task: asyncio.Task):
+        """
+        The publish connection failed: stop writing to it and close the
+        subscribe connection too, so _run reconnects both and flushes what
+        was buffered meanwhile.
+        """
+        if task.cancelled():
+            return
+        print(f"⚠️ Chat broker publish connection lost ({task.exception()}), reconnecting")
+        if self._pub_writer is pub_writer:
+            self._pub_writer = None
+        pub_writer.close()
+        sub_writer.close()
+
+    async def close(self):
+        self._closed = True
+        writer = self._pub_writer
+        if writer is not None:
+            try:
+                await writer.drain()
+            except Exception:
+                pass
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+def create_broker(url: Optional[str] = None) -> Broker:
+    url = BROKER_CONFIG["URL"] if url is None else url
+    if not url or url.startswith("memory://"):
+        return InProcessBroker()
+    if url.startswith("redis://"):
+        return RedisBroker(url)
+    raise ValueError(f"Unsupported CHAT_BROKER_URL: {url}")
+
+
+# Shared by ConnectionManager and PrivateConnectionManager
+chat_broker = create_broker()
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Optional
+
+
+# Bot stream batching - text is flushed to clients every INTERVAL_MS or
+# MAX_CHARS characters, whichever comes first
+STREAM_COALESCE_CONFIG = {
+    "INTERVAL_MS": int(os.getenv("STREAM_FLUSH_MS", "50")),
+    "MAX_CHARS": int(os.getenv("STREAM_FLUSH_CHARS", "64"))
+}
+
+
+async def coalesce_chunks(stream: AsyncIterator[str],
+                          interval_ms: Optional[int] = None,
+                          max_chars: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Batch a token stream into fewer, larger chunks.
+
+    Buffered text goes out once it is interval_ms old or max_chars long, even
+    if the model is between tokens. [STATUS|...] markers are passed straight
+    through (after any buffered text, so ordering is kept).
+    """
+    interval = (interval_ms if interval_ms is not None
+                else STREAM_COALESCE_CONFIG["INTERVAL_MS"]) / 1000
+    max_chars = max_chars if max_chars is not None else STREAM_COALESCE_CONFIG["MAX_CHARS"]
+
+    iterator = stream.__aiter__()
+    buffer = ""
+    deadline = None
+    pending: Optional[asyncio.Task] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+
+            if buffer:
+                timeout = max(0.0, deadline - time.monotonic())
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if not done:
+                    # Model is slower than the window; send what we have
+                    yield buffer
+                    buffer = ""
+                    continue
+
+            try:
+                chunk = await pending
+            except StopAsyncIteration:
+                break
+            finally:
+                if pending.done():
+                    pending = None
+
+            if not chunk:
+                continue
+            if chunk.startswith("[STATUS|"):
+                if buffer:
+                    yield buffer
+                    buffer = ""
+                yield chunk
+                continue
+
+            if not buffer:
+                deadline = time.monotonic() + interval
+            buffer += chunk
+            if len(buffer) >= max_chars:
+                yield buffer
+                buffer = ""
+
+        if buffer:
+            yield buffer
+    finally:
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration, Exception):
+                pass
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import os
+import time
+import zlib
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Union
+
+from fastapi import WebSocket
+
+try:
+    import msgpack
+except ImportError:  # Binary protocol is optional; clients fall back to JSON
+    msgpack = None
+
+
+# Outbound WebSocket queue settings
+CONNECTION_CONFIG = {
+    # Frames buffered per client before the overflow policy kicks in
+    "QUEUE_SIZE": int(os.getenv("WS_QUEUE_SIZE", "256")),
+
+    # Seconds a single write may take before the client is considered dead
+    "SEND_TIMEOUT": float(os.getenv("WS_SEND_TIMEOUT", "5.0")),
+
+    # Disconnect a client whose oldest queued frame has waited this long (seconds)
+    "MAX_LAG": float(os.getenv("WS_MAX_LAG", "30.0")),
+
+    # Frames at least this many bytes are deflated for clients that opted in
+    # with ?compress=1 (0 disables). Small stream chunks never pay the CPU cost.
+    # uvicorn's permessage-deflate (on by default) compresses every frame
+    # instead; start it with --ws-per-message-deflate false to rely on this.
+    "COMPRESS_THRESHOLD": int(os.getenv("WS_COMPRESS_THRESHOLD", "1024")),
+    "COMPRESS_LEVEL": int(os.getenv("WS_COMPRESS_LEVEL", "6"))
+}
+
+
+# Wire protocols a client can ask for with ?proto= or Sec-WebSocket-Protocol
+PROTOCOL_JSON = "json"
+PROTOCOL_MSGPACK = "msgpack"
+
+# First byte of every binary frame sent to a client that accepts compression
+FLAG_PLAIN = b"\x00"
+FLAG_DEFLATE = b"\x01"
+
+Frame = Union[str, bytes]
+
+
+def encode_message(message: dict) -> str:
+    """JSON text frame, encoded the same way Starlette's send_json does."""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_frame(message: dict, protocol: str, compress: bool = False) -> Frame:
+    """Serialize a message for a wire protocol (binary frame for msgpack)."""
+    if protocol == PROTOCOL_MSGPACK:
+        frame = msgpack.packb(message, use_bin_type=True)
+    else:
+        frame = encode_message(message)
+    return compress_frame(frame) if compress else frame
+
+
+def compress_frame(frame: Frame) -> Frame:
+    """
+    Raw-deflate a frame that is over COMPRESS_THRESHOLD into a binary frame
+    flagged FLAG_DEFLATE. Smaller JSON stays a text frame; smaller msgpack
+    is flagged FLAG_PLAIN.
+    """
+    data = frame.encode("utf-8") if isinstance(frame, str) else frame
+    threshold = CONNECTION_CONFIG["COMPRESS_THRESHOLD"]
+    if threshold and len(data) >= threshold:
+        compressor = zlib.compressobj(CONNECTION_CONFIG["COMPRESS_LEVEL"], zlib.DEFLATED, -15)
+        deflated = compressor.compress(data) + compressor.flush()
+        if len(deflated) < len(data):
+            return FLAG_DEFLATE + deflated
+    return frame if isinstance(frame, str) else FLAG_PLAIN + frame
+
+
+def negotiate_protocol(websocket: WebSocket):
+    """
+    Pick the outbound protocol for a client: (protocol, subprotocol to echo).
+    Client-to-server messages stay JSON either way.
+    """
+    offered = [p.strip() for p in websocket.headers.get(
+        "sec-websocket-protocol", "").split(",") if p.strip()]
+    wanted = websocket.query_params.get("proto", "").lower()
+    if PROTOCOL_MSGPACK in offered or wanted == PROTOCOL_MSGPACK:
+        if msgpack is None:
+            print("⚠️ Client asked for msgpack but it isn't installed, using JSON")
+        else:
+            return PROTOCOL_MSGPACK, PROTOCOL_MSGPACK if PROTOCOL_MSGPACK in offered else None
+    return PROTOCOL_JSON, None
+
+
+def wants_compression(websocket: WebSocket) -> bool:
+    """Whether the client can inflate FLAG_DEFLATE frames (?compress=1)."""
+    return websocket.query_params.get("compress", "").lower() in ("1", "true", "deflate")
+
+
+class EncodedMessage:
+    """A message serialized (and compressed) at most once per wire format, however many clients get it."""
+
+    def __init__(self, payload: Optional[dict] = None, text: Optional[str] = None):
+        self._payload = payload
+        self._frames: Dict[tuple, Frame] = {}
+        if text is not None:
+            self._frames[PROTOCOL_JSON, False] = text
+
+    @property
+    def payload(self) -> dict:
+        if self._payload is None:
+            self._payload = json.loads(self._frames[PROTOCOL_JSON, False])
+        return self._payload
+
+    @property
+    def text(self) -> str:
+        return self.encode(PROTOCOL_JSON)
+
+    def encode(self, protocol: str, compress: bool = False) -> Frame:
+        frame = self._frames.get((protocol, compress))
+        if frame is None:
+            if compress:
+                frame = compress_frame(self.encode(protocol))
+            else:
+                frame = encode_frame(self.payload, protocol)
+            self._frames[protocol, compress] = frame
+        return frame
+
+
+class ConnectionClosed(Exception):
+    """Raised when sending on a connection that has already been closed."""
+
+
+class _Frame:
+    __slots__ = ("data", "kind", "payload", "queued_at")
+
+    def __init__(self, data: Frame, kind: Optional[str], payload: Optional[dict]):
+        self.data = data
+        self.kind = kind
+        self.payload = payload
+        self.queued_at = time.monotonic()
+
+
+class ClientConnection:
+    """
+    A client WebSocket with its own bounded outbound queue and writer task.
+
+    Senders only enqueue, so a slow reader never holds up anyone else. When
+    the queue is full, queued "status" frames are dropped, adjacent "chunk"
+    frames of a bot stream are merged, and if that still doesn't make room
+    (or the client falls MAX_LAG seconds behind) the client is disconnected.
+    """
+
+    def __init__(self, websocket: WebSocket, username: str,
+                 on_close: Optional[Callable[["ClientConnection"], None]] = None,
+                 protocol: str = PROTOCOL_JSON, compress: bool = False):
+        self.websocket = websocket
+        self.username = username
+        self.protocol = protocol
+        self.compress = compress
+        self.closed = False
+        self._on_close = on_close
+        self._queue: Deque[_Frame] = deque()
+        self._wakeup = asyncio.Event()
+
+        # Lag metrics (seconds from enqueue until the write completed)
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.frames_coalesced = 0
+        self.bytes_sent = 0  # characters for text frames
+        self.last_lag = 0.0
+        self.avg_lag = 0.0
+        self.max_lag = 0.0
+        self.max_depth = 0
+
+        self._writer = asyncio.create_task(self._drain())
+
+    def deliver(self, message: EncodedMessage, kind: Optional[str] = None) -> bool:
+        """Queue a shared message in this client's protocol."""
+        return self.send(message.encode(self.protocol, self.compress), kind,
+                         message.payload if kind == "chunk" else None)
+
+    def send(self, data: Frame, kind: Optional[str] = None, payload: Optional[dict] = None) -> bool:
+        """
+        Queue an encoded frame without waiting. kind="status" frames may be
+        dropped and kind="chunk" frames merged (payload required) under backpressure.
+        """
+        if self.closed:
+            return False
+        if len(self._queue) >= CONNECTION_CONFIG["QUEUE_SIZE"]:
+            self._make_room()
+            if len(self._queue) >= CONNECTION_CONFIG["QUEUE_SIZE"]:
+                if kind == "status":
+                    self.frames_dropped += 1
+                    return True
+                self._evict(f"outbound queue full ({len(self._queue)} frames)")
+                return False
+
+        self._queue.append(_Frame(data, kind, payload))
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._wakeup.set()
+        return True
+
+    async def send_text(self, text: str):
+        if not self.send(text):
+            raise ConnectionClosed(self.username)
+
+    async def send_json(self, data: dict):
+        """Send a message in this client's protocol (despite the name, kept for WebSocket parity)."""
+        if not self.send(encode_frame(data, self.protocol, self.compress)):
+            raise ConnectionClosed(self.username)
+
+    @staticmethod
+    def _mergeable(previous: _Frame, frame: _Frame) -> bool:
+        """
+        Chunks merge only within one answer: same message id, and a frame
+        that opens a message is never folded into an earlier one (several
+        answers can stream to a room at once, all from the same bot user).
+        """
+        if previous.kind != "chunk" or frame.kind != "chunk":
+            return False
+        previous_data = previous.payload.get("data", {})
+        data = frame.payload.get("data", {})
+        message_id = data.get("message_id")
+        return message_id is not None and previous_data.get("message_id") == message_id \
+            and not data.get("is_first")
+
+    def _make_room(self):
+        """Drop queued status frames, then merge runs of chunks of the same answer."""
+        compacted: Deque[_Frame] = deque()
+        for frame in self._queue:
+            if frame.kind == "status":
+                self.frames_dropped += 1
+                continue
+            previous = compacted[-1] if compacted else None
+            if previous is not None and self._mergeable(previous, frame):
+                merged = dict(previous.payload)
+                merged["data"] = dict(previous.payload["data"])
+                merged["data"]["chunk"] = previous.payload["data"].get(
+                    "chunk", "") + frame.payload["data"].get("chunk", "")
+                previous.payload = merged
+                previous.data = None  # re-encoded when written
+                self.frames_coalesced += 1
+                continue
+            compacted.append(frame)
+        self._queue = compacted
+
+    async def _drain(self):
+        try:
+            while True:
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                # Taken off the queue first so _make_room never merges into an in-flight frame
+                frame = self._queue.popleft()
+                lag = time.monotonic() - frame.queued_at
+                if lag > CONNECTION_CONFIG["MAX_LAG"]:
+                    self._evict(f"{lag:.1f}s behind")
+                    return
+
+                data = frame.data
+                if data is None:
+                    data = encode_frame(frame.payload, self.protocol, self.compress)
+                send = self.websocket.send_bytes if isinstance(data, bytes) else self.websocket.send_text
+                try:
+                    await asyncio.wait_for(send(data), CONNECTION_CONFIG["SEND_TIMEOUT"])
+                except Exception as e:
+                    self._evict(f"send failed: {type(e).__name__}")
+                    return
+
+                self.bytes_sent += len(data)
+                self._record_lag(time.monotonic() - frame.queued_at)
+        except asyncio.CancelledError:
+            pass
+
+    def _record_lag(self, lag: float):
+        self.frames_sent += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.avg_lag = lag if self.frames_sent == 1 else self.avg_lag * 0.9 + lag * 0.1
+
+    def _evict(self, reason: str):
+        print(f"🐢 Disconnecting slow client {self.username}: {reason}")
+        self.close(code=1013)
+
+    def close(self, code: int = 1000):
+        """Stop the writer, drop queued frames and close the socket in the background."""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        asyncio.ensure_future(self._close_socket(code))
+        if self._on_close is not None:
+            self._on_close(self)
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "protocol": self.protocol,
+            "compress": self.compress,
+            "queued": len(self._queue),
+            "max_queued": self.max_depth,
+            "sent": self.frames_sent,
+            "dropped": self.frames_dropped,
+            "coalesced": self.frames_coalesced,
+            "bytes_sent": self.bytes_sent,
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "avg_lag_ms": round(self.avg_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "closed": self.closed
+        }
+
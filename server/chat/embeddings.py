@@ -0,0 +1,250 @@
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+
+# Sentence embedding backend used for project documents and queries
+EMBEDDING_CONFIG = {
+    # "torch" (sentence-transformers), "onnx" (ONNX Runtime, fp32) or
+    # "onnx-int8" (ONNX Runtime with dynamically quantized int8 weights).
+    # The ONNX backends need the optional requirements-onnx.txt packages
+    "BACKEND": os.getenv("EMBEDDING_BACKEND", "torch").lower(),
+
+    "MODEL": os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
+
+    # Where the exported ONNX model and tokenizer are kept
+    "ONNX_DIR": os.getenv("EMBEDDING_ONNX_DIR", ".portfolio_cache/onnx"),
+
+    # ONNX Runtime intra-op threads (0 lets ONNX Runtime decide)
+    "THREADS": int(os.getenv("EMBEDDING_THREADS", "0")),
+
+    # Tokens per text, same as the sentence-transformers model
+    "MAX_LENGTH": 256,
+
+    "BATCH_SIZE": 32
+}
+
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+BACKEND_ONNX_INT8 = "onnx-int8"
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+
+
+class EmbeddingBackend(ABC):
+    """
+    Turns texts into unit-length sentence embeddings.
+
+    encode() takes the same arguments as SentenceTransformer.encode, so the
+    assistant and the response cache call every backend the same way.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def encode(self, texts: Union[str, List[str]], batch_size: Optional[int] = None,
+               show_progress_bar: bool = False, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = True) -> np.ndarray:
+        pass
+
+
+class TorchEmbeddingBackend(EmbeddingBackend):
+    """The sentence-transformers model on PyTorch (the original setup)."""
+
+    name = BACKEND_TORCH
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts, batch_size=None, show_progress_bar=False, convert_to_numpy=True,
+               normalize_embeddings=True) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size or EMBEDDING_CONFIG["BATCH_SIZE"],
+                                 show_progress_bar=show_progress_bar, convert_to_numpy=True,
+                                 normalize_embeddings=normalize_embeddings)
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """
+    The same model exported to ONNX and run with ONNX Runtime: mean pooling
+    and L2 normalization as in the sentence-transformers pipeline, without
+    importing PyTorch. The model is exported on first use if missing (that
+    one step needs sentence-transformers), or ahead of time with
+    `python -m server.chat.embeddings export`.
+    """
+
+    def __init__(self, model_name: str, model_dir: str, quantize: bool = False):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.name = BACKEND_ONNX_INT8 if quantize else BACKEND_ONNX
+        directory = Path(model_dir) / model_name.replace("/", "__")
+        model_path = directory / (ONNX_INT8_FILE if quantize else ONNX_FILE)
+        if not model_path.exists():
+            export_onnx(model_name, directory, quantize=quantize)
+
+        self.tokenizer = Tokenizer.from_file(str(directory / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_CONFIG["MAX_LENGTH"])
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if EMBEDDING_CONFIG["THREADS"]:
+            options.intra_op_num_threads = EMBEDDING_CONFIG["THREADS"]
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts, batch_size=None, show_progress_bar=False, convert_to_numpy=True,
+               normalize_embeddings=True) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        batch_size = batch_size or EMBEDDING_CONFIG["BATCH_SIZE"]
+        batches = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+        if normalize_embeddings and len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+
+        # Mean over real tokens only
+        weights = mask[..., None].astype(np.float32)
+        return (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+
+
+def export_onnx(model_name: str, directory: Union[str, Path], quantize: bool = False) -> Path:
+    """Export the sentence-transformers model (and tokenizer) to ONNX, optionally int8-quantized."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    fp32_path = directory / ONNX_FILE
+
+    if not fp32_path.exists():
+        print(f"📦 Exporting {model_name} to ONNX in {directory}...")
+        model = SentenceTransformer(model_name, device="cpu")
+        model.tokenizer.save_pretrained(str(directory))
+        transformer = model[0].auto_model.eval()
+
+        class LastHiddenState(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.transformer = transformer
+
+            def forward(self, input_ids, attention_mask, token_type_ids):
+                return self.transformer(input_ids=input_ids, attention_mask=attention_mask,
+                                        token_type_ids=token_type_ids)[0]
+
+        sample = model.tokenizer(["export sample"], return_tensors="pt")
+        names = ["input_ids", "attention_mask", "token_type_ids"]
+        torch.onnx.export(
+            LastHiddenState(), tuple(sample[n] for n in names), str(fp32_path),
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes={n: {0: "batch", 1: "sequence"} for n in names + ["last_hidden_state"]},
+            opset_version=14)
+        print(f"✅ Exported {fp32_path}")
+
+    if not quantize:
+        return fp32_path
+
+    int8_path = directory / ONNX_INT8_FILE
+    if not int8_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        print("📦 Quantizing ONNX model weights to int8...")
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        print(f"✅ Quantized {int8_path}")
+    return int8_path
+
+
+def create_embedding_backend(backend: Optional[str] = None) -> EmbeddingBackend:
+    backend = (backend or EMBEDDING_CONFIG["BACKEND"]).lower()
+    started = time.perf_counter()
+    encoder = None
+    if backend in (BACKEND_ONNX, BACKEND_ONNX_INT8):
+        try:
+            encoder = OnnxEmbeddingBackend(EMBEDDING_CONFIG["MODEL"], EMBEDDING_CONFIG["ONNX_DIR"],
+                                           quantize=backend == BACKEND_ONNX_INT8)
+        except ImportError as e:
+            print(f"⚠️ {backend} embedding backend unavailable ({e}); "
+                  f"pip install -r requirements-onnx.txt. Using torch")
+    elif backend != BACKEND_TORCH:
+        print(f"⚠️ Unknown EMBEDDING_BACKEND '{backend}', using torch")
+    if encoder is None:
+        encoder = TorchEmbeddingBackend(EMBEDDING_CONFIG["MODEL"])
+    print(f"🔍 {encoder.name} embedding backend loaded in {time.perf_counter() - started:.2f}s")
+    return encoder
+
+
+def check_parity(backend: str, texts: List[str], reference: Optional[EmbeddingBackend] = None) -> dict:
+    """Compare a backend's embeddings with the PyTorch model's on the same texts."""
+    reference = reference or create_embedding_backend(BACKEND_TORCH)
+    candidate = create_embedding_backend(backend)
+    expected = reference.encode(texts)
+    actual = candidate.encode(texts)
+    cosine = (expected * actual).sum(axis=1)
+
+    # Retrieval parity: does each text still rank the same nearest neighbour?
+    def neighbours(embeddings: np.ndarray) -> np.ndarray:
+        return np.argsort(-(embeddings @ embeddings.T), axis=1)[:, 1]
+
+    def ms_per_query(encoder: EmbeddingBackend) -> float:
+        started = time.perf_counter()
+        for text in texts:
+            encoder.encode([text])
+        return (time.perf_counter() - started) / len(texts) * 1000
+
+    return {
+        "backend": candidate.name,
+        "torch_ms_per_query": round(ms_per_query(reference), 2),
+        "ms_per_query": round(ms_per_query(candidate), 2),
+        "texts": len(texts),
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "max_abs_diff": float(np.abs(expected - actual).max()),
+        "same_neighbour": float((neighbours(expected) == neighbours(actual)).mean()) if len(texts) > 1 else 1.0
+    }
+
+
+def main(argv: List[str]) -> int:
+    """`export [onnx|onnx-int8]` prepares the ONNX files; `parity [backend]` checks them against PyTorch."""
+    command = argv[0] if argv else "parity"
+    backend = argv[1] if len(argv) > 1 else BACKEND_ONNX_INT8
+    if command == "export":
+        directory = Path(EMBEDDING_CONFIG["ONNX_DIR"]) / EMBEDDING_CONFIG["MODEL"].replace("/", "__")
+        export_onnx(EMBEDDING_CONFIG["MODEL"], directory, quantize=backend == BACKEND_ONNX_INT8)
+        return 0
+    if command == "parity":
+        from server.chat.intent_router import INTENT_PROTOTYPES
+        texts = [text for examples in INTENT_PROTOTYPES.values() for text in examples]
+        result = check_parity(backend, texts)
+        print(result)
+        # fp32 should match to rounding; int8 weights cost a little precision
+        minimum = 0.98 if backend == BACKEND_ONNX_INT8 else 0.9999
+        if result["min_cosine"] < minimum:
+            print(f"❌ {backend} embeddings drift from PyTorch (min cosine < {minimum})")
+            return 1
+        print(f"✅ {backend} embeddings match PyTorch")
+        return 0
+    print(main.__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,252 @@
+import os
+import sys
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+INTENT_ROUTER_CONFIG = {
+    "ENABLED": os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true",
+
+    # Minimum cosine similarity to the closest prototype for the router to decide;
+    # below it the keyword classifier (query_intent) is used instead
+    "THRESHOLD": float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.5")),
+
+    # How far off_topic must beat every portfolio intent before a query is declined
+    "OFF_TOPIC_MARGIN": float(os.getenv("INTENT_ROUTER_OFF_TOPIC_MARGIN", "0.05")),
+
+    # The list intents replace the answer with a canned project list, so the
+    # router only decides them (against the keywords) above this score. Keep it
+    # above every negative in LIST_INTENT_CHECKS: python -m server.chat.intent_router
+    "LIST_THRESHOLD": float(os.getenv("INTENT_ROUTER_LIST_THRESHOLD", "0.75"))
+}
+
+# Example questions per intent. A query gets the intent of its most similar example.
+INTENT_PROTOTYPES: Dict[str, List[str]] = {
+    "off_topic": [
+        "what is the weather like today",
+        "give me a recipe for dinner",
+        "who won the game last night",
+        "tell me a joke",
+        "what is the capital of france",
+        "can you help me with my homework",
+        "what stocks should I buy",
+        "recommend a good movie to watch"
+    ],
+    "hobby_list": [
+        "what are his hobbies",
+        "show me his hobby projects",
+        "what does he build for fun",
+        "list his personal electronics projects",
+        "what side projects does he have"
+    ],
+    "software_list": [
+        "what programming projects has he built",
+        "list his software projects",
+        "what programming languages does he know",
+        "which languages does he code in",
+        "show me his code projects"
+    ],
+    "professional_story": [
+        "how did he go from electrician to coder",
+        "what is his story",
+        "tell me about his journey",
+        "how did he get into programming",
+        "how did he bridge power systems and code"
+    ],
+    "professional": [
+        "what is his professional background",
+        "what is his work experience",
+        "show me his resume",
+        "what are his qualifications",
+        "what is his career history"
+    ],
+    "electrical": [
+        "what electrical work has he done",
+        "tell me about his infrared thermal inspections",
+        "what did he do at TEGG",
+        "does he have power distribution experience",
+        "what electrical QA work has he done"
+    ],
+    "manufacturing": [
+        "tell me about the AIDA servo press retrofits",
+        "what manufacturing work has he done",
+        "did he work on industrial press assembly",
+        "what production equipment has he installed"
+    ],
+    "software": [
+        "what python libraries has he written",
+        "tell me about his FastAPI websocket app",
+        "how does this chatbot work",
+        "what is rpaudio",
+        "has he trained any machine learning models"
+    ],
+    "hobby": [
+        "tell me about the ESP32 van controller",
+        "what PCBs has he designed",
+        "tell me about the MIDI guitar overlay",
+        "how did he build the LED grow light",
+        "what microcontroller projects has he made"
+    ],
+    "general": [
+        "who is ryan",
+        "tell me about ryan",
+        "what can you tell me about him",
+        "what does he do",
+        "what is he good at"
+    ]
+}
+
+# Intents answered with a canned list instead of a generated answer
+LIST_INTENTS = ("hobby_list", "software_list")
+
+# Labelled queries for LIST_THRESHOLD: the list intent each should get, or None
+# for questions that need a real answer. None of them are prototypes verbatim.
+LIST_INTENT_CHECKS = {
+    "what hobbies does ryan have": "hobby_list",
+    "show me all of his hobby projects": "hobby_list",
+    "which electronics projects does he do at home": "hobby_list",
+    "list the side projects he works on": "hobby_list",
+    "list all of his software projects": "software_list",
+    "which programming languages does ryan use": "software_list",
+    "show me the coding projects he has built": "software_list",
+    "what languages does he program in": "software_list",
+    "what has he built": None,
+    "what does he do for fun at work": None,
+    "what is his favorite project": None,
+    "tell me about the ESP32 van controller": None,
+    "how does this chatbot work": None,
+    "what is rpaudio": None,
+    "what did he do at TEGG": None,
+    "what has he worked on recently": None,
+    "how did he learn to code": None,
+    "what python libraries has he written": None,
+    "does he enjoy electrical work": None,
+    "what projects is he proudest of": None
+}
+
+# Project type searched for each intent (intents not listed search every type)
+INTENT_FILTER_TYPES = {
+    "hobby_list": "hobby",
+    "software_list": "software",
+    "professional_story": "professional_story",
+    "professional": "professional",
+    "electrical": "electrical",
+    "manufacturing": "electrical",  # AIDA project is stored as electrical type
+    "software": "software",
+    "hobby": "hobby"
+}
+
+
+class IntentMatch:
+    """The closest intent to a query embedding, with the best score of every intent."""
+
+    __slots__ = ("intent", "score", "scores")
+
+    def __init__(self, intent: str, score: float, scores: Dict[str, float]):
+        self.intent = intent
+        self.score = score
+        self.scores = scores
+
+    def __repr__(self) -> str:
+        return f"IntentMatch({self.intent!r}, {self.score:.2f})"
+
+    @property
+    def confident(self) -> bool:
+        return self.score >= INTENT_ROUTER_CONFIG["THRESHOLD"]
+
+    @property
+    def off_topic(self) -> bool:
+        if self.intent != "off_topic" or not self.confident:
+            return False
+        runner_up = max((score for intent, score in self.scores.items() if intent != "off_topic"),
+                        default=-1.0)
+        return self.score - runner_up >= INTENT_ROUTER_CONFIG["OFF_TOPIC_MARGIN"]
+
+    @property
+    def filter_type(self) -> Optional[str]:
+        return INTENT_FILTER_TYPES.get(self.intent) if self.confident else None
+
+    @property
+    def decides_list(self) -> bool:
+        """Sure enough to decide the canned-list intents by itself (see LIST_THRESHOLD)."""
+        return self.score >= INTENT_ROUTER_CONFIG["LIST_THRESHOLD"]
+
+
+class IntentRouter:
+    """
+    Routes a query by the embedding retrieval already computes for it.
+
+    The prototype questions are embedded once into a matrix of unit vectors,
+    so routing a query is a single matrix-vector product and no model call.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray],
+                 prototypes: Optional[Dict[str, List[str]]] = None):
+        prototypes = prototypes or INTENT_PROTOTYPES
+        self.intents = list(prototypes)
+        texts = [text for examples in prototypes.values() for text in examples]
+        self._labels = np.repeat(np.arange(len(self.intents)),
+                                 [len(examples) for examples in prototypes.values()])
+
+        vectors = np.asarray(encode(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self._vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def route(self, embedding) -> Optional[IntentMatch]:
+        """Closest intent to a query embedding, or None if it can't be compared."""
+        if embedding is None:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        if vector.shape[0] != self._vectors.shape[1]:
+            return None
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+
+        similarities = self._vectors @ (vector / norm)
+        best = np.full(len(self.intents), -1.0, dtype=np.float32)
+        np.maximum.at(best, self._labels, similarities)
+        top = int(np.argmax(best))
+        return IntentMatch(self.intents[top], float(best[top]),
+                           dict(zip(self.intents, best.tolist())))
+
+
+def check_list_threshold(router: IntentRouter, encode: Callable[[List[str]], np.ndarray],
+                         checks: Optional[Dict[str, Optional[str]]] = None) -> dict:
+    """
+    Route the labelled queries and measure LIST_THRESHOLD: the canned-list
+    answers it would give wrongly (false positives) or leave to the keywords,
+    and the lowest threshold that gives no wrong list answer.
+    """
+    checks = checks or LIST_INTENT_CHECKS
+    queries = list(checks)
+    matches = [router.route(vector) for vector in encode(queries)]
+    threshold = INTENT_ROUTER_CONFIG["LIST_THRESHOLD"]
+
+    wrong = {query: (match.intent, round(match.score, 3)) for query, match in zip(queries, matches)
+             if match.intent in LIST_INTENTS and match.intent != checks[query]}
+    missed = [query for query, match in zip(queries, matches)
+              if checks[query] and not (match.intent == checks[query] and match.score >= threshold)]
+    return {
+        "threshold": threshold,
+        "false_positives": {query: hit for query, hit in wrong.items() if hit[1] >= threshold},
+        "left_to_keywords": missed,
+        "lowest_safe_threshold": round(max((score for _, score in wrong.values()), default=0.0) + 0.01, 2)
+    }
+
+
+if __name__ == "__main__":
+    from server.chat.embeddings import create_embedding_backend
+
+    encoder = create_embedding_backend()
+    result = check_list_threshold(IntentRouter(encoder.encode), encoder.encode)
+    print(result)
+    if result["false_positives"]:
+        print(f"❌ LIST_THRESHOLD {result['threshold']} gives canned lists for "
+              f"{len(result['false_positives'])} labelled question(s)")
+        sys.exit(1)
+    print(f"✅ No wrong canned-list answers at LIST_THRESHOLD {result['threshold']}")
@@ -1,18 +1,70 @@
 from fastapi import WebSocket
+import asyncio
 import json
+import time
+from collections import OrderedDict
 from datetime import datetime
-from server.utils.models import UserListMessage, ChatMessageData
+from typing import Dict, Iterable, Optional, Set, Union
+from server.utils.models import UserListMessage, UserListDeltaMessage, ChatMessageData
 from server.db.db import SessionLocal
 from server.db.dbmodels import UserConnection
+from server.chat.connection import ClientConnection, EncodedMessage, PROTOCOL_JSON
+from server.chat.broker import Broker, InProcessBroker, BROKER_CONFIG, PUBLIC_CHANNEL
+
+
+# Shared room for clients that want to watch every bot answer, not just their own
+LOBBY_ROOM = "lobby"
+
+
+def bot_room(username: str) -> str:
+    """Room that receives the bot's answers to this user."""
+    return f"bot:{username}"
 
 
 class ConnectionManager:
-    def __init__(self):
+    """
+    Public chat connections of this process. Broadcasts and direct messages
+    are also published on the broker so clients connected to other workers
+    get them, and the user list covers every node.
+    """
+
+    # Completed bot answers kept for clients whose rebuilt text didn't match
+    RECENT_BOT_MESSAGES = 64
+
+    def __init__(self, broker: Optional[Broker] = None):
         self.active_connections = {}
+        self.broker = broker or InProcessBroker()
+        self.broker.subscribe(PUBLIC_CHANNEL, self._on_remote)
+        self.broker.add_connect_listener(self._announce)
+        # node id -> usernames connected there, and when that node last spoke
+        self.remote_users: Dict[str, Set[str]] = {}
+        self._remote_seen: Dict[str, float] = {}
+        self._sync_task: Optional[asyncio.Task] = None
+        # Bumped on every join/leave; clients apply deltas in order and ask
+        # for a snapshot ("user_list_request") when they see a gap
+        self.roster_version = 0
+        # room name -> subscribed usernames (every user is in their own bot room)
+        self.rooms: Dict[str, Set[str]] = {}
+        # Voice formats each client reported it can play (see "audio_formats" messages)
+        self.audio_formats = {}
+        # message_id -> full text of recent bot answers (see "bot_message_request")
+        self.recent_bot_messages: "OrderedDict[str, str]" = OrderedDict()
 
-    async def connect(self, websocket: WebSocket, username: str):
-        await websocket.accept()
-        self.active_connections[username] = websocket
+    async def connect(self, websocket: WebSocket, username: str,
+                      protocol: str = PROTOCOL_JSON, subprotocol: Optional[str] = None,
+                      compress: bool = False) -> ClientConnection:
+        await websocket.accept(subprotocol=subprotocol)
+        previous = self.active_connections.get(username)
+        connection = ClientConnection(websocket, username, on_close=self._evict,
+                                      protocol=protocol, compress=compress)
+        self._update_roster(
+            lambda: self.active_connections.__setitem__(username, connection),
+            joined_locally=username)
+        if previous is not None:
+            previous.close()
+        else:
+            self.broker.publish(PUBLIC_CHANNEL, {"op": "roster", "joined": [username]})
+        self.join_room(username, bot_room(username))
 
         # Get client IP address
         client_ip = self._get_client_ip(websocket)
@@ -22,15 +74,74 @@ class ConnectionManager:
         await self._record_connection(username, client_ip, user_agent)
 
         # Send welcome message to the new user
-        await self.send_welcome_message(websocket, username)
+        await self.send_welcome_message(connection, username)
+
+        self.send_user_list(username)
+        return connection
+
+    def disconnect(self, username: str, connection: Optional[ClientConnection] = None):
+        """Drop a user's connection (only the given one, if the user has since reconnected)."""
+        current = self.active_connections.get(username)
+        if connection is not None and current is not connection:
+            connection.close()
+            return
+        if current is not None:
+            self._update_roster(lambda: self.active_connections.pop(username, None))
+            self.broker.publish(PUBLIC_CHANNEL, {"op": "roster", "left": [username]})
+            current.close()
+        for room in list(self.rooms):
+            self.leave_room(username, room)
+        self.audio_formats.pop(username, None)
+
+    def _evict(self, connection: ClientConnection):
+        # A slow or dead client closed itself
+        self.disconnect(connection.username, connection)
 
-        await self.broadcast_user_list()
+    def join_room(self, username: str, room: str):
+        self.rooms.setdefault(room, set()).add(username)
 
-    def disconnect(self, username: str):
-        if username in self.active_connections:
-            del self.active_connections[username]
+    def leave_room(self, username: str, room: str):
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(username)
+            if not members:
+                del self.rooms[room]
 
-    async def send_message(self, message: str, websocket: WebSocket):
+    def room_members(self, rooms: Iterable[str]) -> Set[str]:
+        """Connected users subscribed to any of the given rooms."""
+        members = set()
+        for room in rooms:
+            members.update(self.rooms.get(room, ()))
+        return {username for username in members if username in self.active_connections}
+
+    def remember_bot_message(self, message_id: str, text: str):
+        self.recent_bot_messages[message_id] = text
+        while len(self.recent_bot_messages) > self.RECENT_BOT_MESSAGES:
+            self.recent_bot_messages.popitem(last=False)
+
+    def bot_message(self, message_id: str) -> Optional[str]:
+        return self.recent_bot_messages.get(message_id)
+
+    def connection(self, username: str) -> Optional[ClientConnection]:
+        return self.active_connections.get(username)
+
+    def connection_stats(self) -> dict:
+        """Outbound queue depth and lag metrics per connected client."""
+        return {username: connection.stats()
+                for username, connection in self.active_connections.items()}
+
+    def set_audio_formats(self, username: str, formats: list):
+        self.audio_formats[username] = [str(fmt) for fmt in formats]
+
+    def requested_audio_formats(self, rooms: Optional[Iterable[str]] = None) -> set:
+        """Union of the voice formats the connected clients (or room subscribers) can play."""
+        usernames = self.active_connections if rooms is None else self.room_members(rooms)
+        requested = set()
+        for username in usernames:
+            requested.update(self.audio_formats.get(username, []))
+        return requested
+
+    async def send_message(self, message: str, websocket: Union[WebSocket, ClientConnection]):
         await websocket.send_json({
             "event": "chat_message",
             "data": {
@@ -39,45 +150,149 @@ class ConnectionManager:
             }
         })
 
-    async def broadcast(self, message: str):
-        # Create a copy of connections to avoid modification during iteration
-        connections_copy = list(self.active_connections.items())
-        parsed_message = json.loads(message)
-
-        for username, connection in connections_copy:
-            try:
-                await connection.send_json(parsed_message)
-            except Exception:
-                # Connection is closed, remove it from active connections
-                if username in self.active_connections:
-                    del self.active_connections[username]
+    async def broadcast(self, message: Union[str, dict], kind: Optional[str] = None,
+                        rooms: Optional[Iterable[str]] = None):
+        """
+        Queue one frame for every client, or only for subscribers of rooms. The
+        message is serialized once per wire protocol in use; kind ("status" or
+        "chunk") lets slow clients drop or merge it under backpressure.
+        """
+        if isinstance(message, str):
+            encoded = EncodedMessage(text=message)
+        else:
+            encoded = EncodedMessage(payload=message)
+        if rooms is None:
+            connections = list(self.active_connections.values())
+        else:
+            connections = [self.active_connections[username]
+                           for username in self.room_members(rooms)]
+        for connection in connections:
+            connection.deliver(encoded, kind)
+        # Only serialize to JSON text for other nodes if there are any
+        if self.broker.has_peers:
+            self.broker.publish(PUBLIC_CHANNEL, {
+                "op": "broadcast", "text": encoded.text, "kind": kind,
+                "rooms": list(rooms) if rooms is not None else None})
 
     async def send_to_user(self, username: str, message: dict):
-        if username in self.active_connections:
-            try:
-                await self.active_connections[username].send_json(message)
-            except Exception:
-                # Connection is closed, remove it from active connections
-                if username in self.active_connections:
-                    del self.active_connections[username]
-
-    async def broadcast_user_list(self):
-        usernames = list(self.active_connections.keys())
-        # Create a copy of connections to avoid modification during iteration
-        connections_copy = list(self.active_connections.items())
-
-        for username, ws in connections_copy:
-            try:
-                await ws.send_json({
-                    "type": "user_list",
-                    "users": usernames
-                })
-            except Exception:
-                # Connection is closed, remove it from active connections
-                if username in self.active_connections:
-                    del self.active_connections[username]
-
-    async def send_welcome_message(self, websocket: WebSocket, username: str):
+        connection = self.active_connections.get(username)
+        if connection is not None:
+            connection.deliver(EncodedMessage(payload=message))
+        elif self.broker.has_peers and self.is_online(username):
+            self.broker.publish(PUBLIC_CHANNEL, {
+                "op": "user", "user": username, "text": EncodedMessage(payload=message).text})
+
+    def online_users(self) -> list:
+        """Everyone connected to any node, local users first."""
+        users = list(self.active_connections.keys())
+        seen = set(users)
+        for usernames in self.remote_users.values():
+            for username in sorted(usernames - seen):
+                users.append(username)
+                seen.add(username)
+        return users
+
+    def is_online(self, username: str) -> bool:
+        return username in self.active_connections or any(
+            username in usernames for usernames in self.remote_users.values())
+
+    def send_user_list(self, username: str):
+        """Send the full roster to one client (on connect or when it asks after a gap)."""
+        connection = self.active_connections.get(username)
+        if connection is not None:
+            connection.deliver(EncodedMessage(payload=UserListMessage(
+                users=self.online_users(),
+                version=self.roster_version).model_dump()))
+
+    def _update_roster(self, change, joined_locally: Optional[str] = None):
+        """
+        Apply change() to the local or remote user sets and, if the combined
+        roster changed, bump the version and send the delta to local clients.
+        """
+        before = self.online_users()
+        change()
+        after = self.online_users()
+        before_set, after_set = set(before), set(after)
+        joined = [username for username in after if username not in before_set]
+        left = [username for username in before if username not in after_set]
+        if not joined and not left:
+            return
+
+        self.roster_version += 1
+        delta = UserListDeltaMessage(joined=joined, left=left, version=self.roster_version)
+        encoded = EncodedMessage(payload=delta.model_dump())
+        for username, connection in list(self.active_connections.items()):
+            # A client that just connected gets a snapshot instead
+            if username != joined_locally:
+                connection.deliver(encoded)
+
+    def _on_remote(self, message: dict):
+        """Deliver traffic published by another node."""
+        op = message.get("op")
+        origin = message.get("origin")
+        self._remote_seen[origin] = time.monotonic()
+
+        if op == "broadcast":
+            kind, rooms = message.get("kind"), message.get("rooms")
+            encoded = EncodedMessage(text=message["text"])
+            usernames = self.active_connections if rooms is None else self.room_members(rooms)
+            for username in list(usernames):
+                self.active_connections[username].deliver(encoded, kind)
+
+        elif op == "user":
+            connection = self.active_connections.get(message.get("user"))
+            if connection is not None:
+                connection.deliver(EncodedMessage(text=message["text"]))
+
+        elif op == "roster":
+            def change():
+                users = self.remote_users.setdefault(origin, set())
+                users.update(message.get("joined", []))
+                users.difference_update(message.get("left", []))
+            self._update_roster(change)
+
+        elif op in ("hello", "roster_sync"):
+            users = set(message.get("users", []))
+            self._update_roster(lambda: self.remote_users.__setitem__(origin, users))
+            if op == "hello":
+                # Let the new node learn who is connected here
+                self.broker.publish(PUBLIC_CHANNEL, {
+                    "op": "roster_sync", "users": list(self.active_connections.keys())})
+
+        elif op == "bye":
+            self._forget_node(origin)
+
+    def _forget_node(self, node_id: str):
+        self._remote_seen.pop(node_id, None)
+        self._update_roster(lambda: self.remote_users.pop(node_id, None))
+
+    def _announce(self):
+        """Broker (re)connected: share our roster and keep it fresh on other nodes."""
+        self.broker.publish(PUBLIC_CHANNEL, {
+            "op": "hello", "users": list(self.active_connections.keys())})
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_roster())
+
+    async def _sync_roster(self):
+        interval = BROKER_CONFIG["ROSTER_SYNC_INTERVAL"]
+        while True:
+            await asyncio.sleep(interval)
+            self.broker.publish(PUBLIC_CHANNEL, {
+                "op": "roster_sync", "users": list(self.active_connections.keys())})
+            # Nodes that crashed without saying bye
+            cutoff = time.monotonic() - interval * 3
+            for node_id, seen in list(self._remote_seen.items()):
+                if seen < cutoff:
+                    print(f"📡 Dropping users of silent chat node {node_id}")
+                    self._forget_node(node_id)
+
+    def detach(self):
+        """Tell other nodes this one is going away (called on shutdown)."""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+        self.broker.publish(PUBLIC_CHANNEL, {"op": "bye"})
+
+    async def send_welcome_message(self, websocket: Union[WebSocket, ClientConnection], username: str):
         """Send welcome messages to a newly connected user"""
         welcome_messages = [
             "Welcome to Ryan's Portfolio Chat! This AI runs on CPU-only hardware, not GPU-accelerated infrastructure, which limits LLM performance. The LLM is quite accurate, its just not running on optimal hardware.",
@@ -1,17 +1,26 @@
+import asyncio
 import json
 import os
 import hashlib
 import pickle
+import re
 from pathlib import Path
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional, Iterator, Callable
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Callable, Tuple
+import httpx
 import requests
 import chromadb
 from chromadb.config import Settings
 from datetime import datetime
 from server.db.db import SessionLocal
 from server.db.dbmodels import ChatHistory
+from server.chat.semantic_cache import SemanticCache
+from server.chat.project_index import ProjectIndex
+from server.chat.query_intent import classify_query
+from server.chat.intent_router import INTENT_ROUTER_CONFIG, IntentMatch, IntentRouter
+from server.chat.query_context import QueryContext
+from server.chat.embeddings import EMBEDDING_CONFIG, create_embedding_backend
+from server.chat.user_state import UserStateStore, create_user_state_store
 import time
 
 
@@ -30,10 +39,33 @@ OLLAMA_CONFIG = {
     # Request timeout in seconds
     "TIMEOUT": 300,
 
+    # Max pooled connections for the shared async Ollama client
+    "MAX_CONNECTIONS": 10,
+
+    # Max generations running on Ollama at once; extra requests are queued
+    "MAX_CONCURRENT_GENERATIONS": 2,
+
     # Stream responses for real-time typing effect
     "STREAM": True
 }
 
+# Semantic answer cache - reuse answers for paraphrased questions
+SEMANTIC_CACHE_CONFIG = {
+    "ENABLED": os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true",
+
+    # Minimum cosine similarity between query embeddings for a hit
+    "THRESHOLD": float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+
+    # Max cached answers (least recently used is evicted)
+    "CAPACITY": 256,
+
+    # Seconds before a cached answer expires
+    "TTL": 3600,
+
+    # Seconds between checks of the project files hash
+    "HASH_CHECK_INTERVAL": 5
+}
+
 
 PROMPT_CONFIG = {
     "CURRENT_STYLE": "default",
@@ -108,6 +140,15 @@ class PortfolioAssistant:
     # Class-level model cache for sharing across instances
     _model_cache = None
     _chroma_client = None
+    _http_client = None
+    _semantic_cache = SemanticCache(
+        SEMANTIC_CACHE_CONFIG["CAPACITY"],
+        SEMANTIC_CACHE_CONFIG["THRESHOLD"],
+        SEMANTIC_CACHE_CONFIG["TTL"]
+    )
+    _corpus_hash_state = (0.0, None)
+    _intent_router: Optional[IntentRouter] = None
+    _user_state_store: Optional[UserStateStore] = None
 
     def __init__(self, projects_file: str = "server/chat/projects.json"):
         """Initialize the portfolio assistant with optimized loading."""
@@ -115,16 +156,15 @@ class PortfolioAssistant:
         self.model = None
         self.collection = None
         self.projects = []
+        self.project_index: Optional[ProjectIndex] = None
 
         # Create cache directories
         self.cache_dir = Path(".portfolio_cache")
         self.cache_dir.mkdir(exist_ok=True)
         self.db_dir = self.cache_dir / "chroma_db"
-        # User-specific state management (per-user state)
-        self.user_states = {}  # Dict[user_id, user_state]
-
-        # Global image data for View Images button (shared across all users)
-        self.current_project_images = []
+        # Per-user state (hobby selection, images for the View Images button)
+        # lives in a shared store; see get_user_state / update_user_state
+        self.user_states = self._get_user_state_store()
 
         try:
             print("🤖 Initializing Optimized Portfolio Assistant...")
@@ -185,6 +225,8 @@ class PortfolioAssistant:
         self.projects = software_projects + electrical_projects + \
             hobby_projects + professional_profile + professional_story
         print(f"✅ Loaded {len(self.projects)} total projects")
+        # Name/keyword lookups for _find_direct_project_matches, built once per load
+        self.project_index = ProjectIndex(self.projects)
 
         # Debug: Print all electrical projects to verify AIDA is loaded
         electrical_projects_names = [
@@ -298,16 +340,7 @@ Most Active Repositories:
         if not query:
             return False
 
-        programming_keywords = [
-            "programming", "code", "python", "javascript", "typescript", "java", "rust", "go",
-            "languages", "libraries", "frameworks", "github", "repositories", "development",
-            "software", "lines of code", "functions", "classes", "libraries", "commits",
-            "repositories", "projects", "coding", "developer", "programming experience",
-            "technical skills", "codebase", "codebase", "programming languages"
-        ]
-
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in programming_keywords)
+        return classify_query(query).programming
 
     def list_hobby_projects(self) -> str:
         hobbies = [proj for proj in self.projects if proj.get(
@@ -341,10 +374,10 @@ Most Active Repositories:
     def handle_hobby_selection(self, query: str, user_id: str = "default") -> Optional[str]:
         """Process user's selection of a hobby project by number or name."""
         user_state = self.get_user_state(user_id)
-        hobby_projects = user_state.get("last_hobby_list", [])
+        hobby_projects = self._hobby_list(user_state)
 
         if not hobby_projects:
-            user_state["awaiting_hobby_choice"] = False
+            self.update_user_state(user_id, awaiting_hobby_choice=False)
             return "Sorry, I don't have the list anymore. Please ask about hobbies again."
 
         # Clean the query by removing @bot mentions and extra whitespace
@@ -357,7 +390,7 @@ Most Active Repositories:
             index = int(selection) - 1
             if 0 <= index < len(hobby_projects):
                 # Reset only on success
-                user_state["awaiting_hobby_choice"] = False
+                self.update_user_state(user_id, awaiting_hobby_choice=False)
                 project = hobby_projects[index]
                 return self._summarize_project(project)
 
@@ -365,7 +398,7 @@ Most Active Repositories:
         for proj in hobby_projects:
             if selection in proj["name"].lower():
                 # Reset only on success
-                user_state["awaiting_hobby_choice"] = False
+                self.update_user_state(user_id, awaiting_hobby_choice=False)
                 return self._summarize_project(proj)
 
         # Don't reset state on invalid selection, let user try again
@@ -471,9 +504,10 @@ Most Active Repositories:
         if not hobby_projects:
             return "I don't have any hobby projects listed right now."
 
-        user_state = self.get_user_state(user_id)
-        user_state["awaiting_hobby_choice"] = True
-        user_state["last_hobby_list"] = hobby_projects
+        # Remember the list as indices into self.projects
+        self.update_user_state(
+            user_id, awaiting_hobby_choice=True,
+            last_hobby_list=[self.projects.index(p) for p in hobby_projects])
 
         lines = ["Here are a few of Ryan's hobby projects:\n"]
         for i, proj in enumerate(hobby_projects, 1):
@@ -486,14 +520,53 @@ Most Active Repositories:
 
         return "\n".join(lines)
 
+    @classmethod
+    def _get_user_state_store(cls) -> UserStateStore:
+        """Get the shared user state store, creating the backend on first use."""
+        if cls._user_state_store is None:
+            cls._user_state_store = create_user_state_store()
+        return cls._user_state_store
+
     def get_user_state(self, user_id: str) -> Dict:
-        """Get or create user-specific state."""
-        if user_id not in self.user_states:
-            self.user_states[user_id] = {
-                "awaiting_hobby_choice": False,
-                "last_hobby_list": []
-            }
-        return self.user_states[user_id]
+        """
+        Get a copy of user-specific state. Changes are not saved unless
+        written back with update_user_state.
+        """
+        state = {
+            "awaiting_hobby_choice": False,
+            "last_hobby_list": [],  # indices into self.projects
+            "project_images": []  # projects shown by the View Images button
+        }
+        state.update(self.user_states.get(user_id) or {})
+        return state
+
+    def update_user_state(self, user_id: str, **changes):
+        """Apply changes to a user's state and write it back to the store."""
+        state = self.get_user_state(user_id)
+        state.update(changes)
+        if not state["awaiting_hobby_choice"] and not state["project_images"]:
+            # Nothing worth keeping - don't hold an entry for every visitor
+            self.user_states.delete(user_id)
+        else:
+            self.user_states.set(user_id, state)
+
+    def ensure_project_images(self, query: str, user_id: str, context: Optional[QueryContext] = None) -> List[dict]:
+        """
+        Images for the View Images button when this user's answer didn't come
+        from their own generation (response caches, shared generations).
+        """
+        context = context or self.query_context(query, user_id)
+        matches = context.matches
+        if matches is None:
+            matches = self.query_portfolio(query, top_k=3, context=context)
+        images = self._extract_project_images(matches, top_n=2)
+        self.update_user_state(user_id, project_images=images)
+        return images
+
+    def _hobby_list(self, user_state: Dict) -> List[Dict[str, Any]]:
+        """Projects of the user's last hobby list, resolved from their indices."""
+        return [self.projects[i] for i in user_state.get("last_hobby_list", [])
+                if 0 <= i < len(self.projects)]
 
     def handle_button_click(self, query: str, user_id: str = "default") -> Optional[str]:
         """Handle button clicks for hobby selection and project images."""
@@ -517,16 +590,17 @@ Most Active Repositories:
 
                     if 0 <= index < len(hobby_projects):
                         # Clear the awaiting state since user made a selection
-                        user_state = self.get_user_state(user_id)
-                        user_state["awaiting_hobby_choice"] = False
+                        self.update_user_state(
+                            user_id, awaiting_hobby_choice=False)
 
                         project = hobby_projects[index]
                         return self._summarize_project(project)
 
                 # Handle general project image viewing
                 elif button_id == "view_project_images":
-                    # Use global image data instead of per-user data
-                    projects_with_images = self.current_project_images
+                    # Images of the projects in this user's last answer
+                    projects_with_images = self.get_user_state(
+                        user_id)["project_images"]
 
                     if not projects_with_images:
                         return "Sorry, no images are available for the current projects."
@@ -767,21 +841,30 @@ Most Active Repositories:
             return "no_file"
 
     def _initialize_model(self):
-        """Initialize the SentenceTransformer model with caching."""
+        """Initialize the embedding model (EMBEDDING_BACKEND: torch, onnx or onnx-int8) with caching."""
         if PortfolioAssistant._model_cache is None:
             try:
-                print("🔍 Loading SentenceTransformer model (cached)...")
-                PortfolioAssistant._model_cache = SentenceTransformer(
-                    "all-MiniLM-L6-v2")
+                print(
+                    f"🔍 Loading {EMBEDDING_CONFIG['MODEL']} embedding model ({EMBEDDING_CONFIG['BACKEND']}, cached)...")
+                PortfolioAssistant._model_cache = create_embedding_backend()
                 print("✅ Model loaded and cached")
             except Exception as e:
-                print(f"❌ Error loading SentenceTransformer: {e}")
+                print(f"❌ Error loading embedding model: {e}")
                 raise
         else:
-            print("🚀 Using cached SentenceTransformer model")
+            print("🚀 Using cached embedding model")
 
         self.model = PortfolioAssistant._model_cache
 
+        if INTENT_ROUTER_CONFIG["ENABLED"] and PortfolioAssistant._intent_router is None:
+            try:
+                PortfolioAssistant._intent_router = IntentRouter(
+                    lambda texts: self.model.encode(texts, show_progress_bar=False, convert_to_numpy=True))
+                print(
+                    f"🧭 Intent router ready ({len(PortfolioAssistant._intent_router)} prototypes)")
+            except Exception as e:
+                print(f"⚠️ Intent router unavailable, using keyword routing: {e}")
+
     def _initialize_chromadb(self):
         """Initialize ChromaDB client with persistence."""
         if PortfolioAssistant._chroma_client is None:
@@ -905,8 +988,9 @@ Most Active Repositories:
                         corpus_texts.append("")
 
             # Check for cached embeddings
+            # Backends differ slightly (int8), so each keeps its own cached embeddings
             embedding_cache_file = self.cache_dir / \
-                f"embeddings_{self._get_file_hash()}.pkl"
+                f"embeddings_{self.model.name}_{self._get_file_hash()}.pkl"
 
             # Force cache regeneration if we have professional story
             project_types = [p.get('type', 'unknown') for p in self.projects]
@@ -1091,7 +1175,8 @@ Most Active Repositories:
             cache_data = {
                 'texts': texts,
                 'embeddings': embeddings,
-                'model_name': 'all-MiniLM-L6-v2',
+                'model_name': EMBEDDING_CONFIG["MODEL"],
+                'backend': self.model.name,
                 'projects': self.projects  # optional, for debug
             }
             with open(cache_file, 'wb') as f:
@@ -1100,7 +1185,7 @@ Most Active Repositories:
         except Exception as e:
             print(f"⚠️ Failed to cache embeddings: {e}")
 
-    def query_portfolio(self, question: str, top_k: int = 3, filter_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    def query_portfolio(self, question: str, top_k: int = 3, filter_type: Optional[str] = None, q_embedding: Optional[List[float]] = None, context: Optional[QueryContext] = None) -> List[Dict[str, Any]]:
         """Query the portfolio database for relevant projects (with optional type filter)."""
         self._ensure_initialized()
 
@@ -1129,10 +1214,10 @@ Most Active Repositories:
             print(f"[DEBUG] No direct matches found, falling back to semantic search")
 
         try:
-            q_embedding = self.model.encode(
-                [question], convert_to_numpy=True)[0]
-            q_embedding_list = self._ensure_list_format([q_embedding])
-            q_embedding = q_embedding_list[0] if q_embedding_list else []
+            if q_embedding is None and context is not None:
+                q_embedding = context.embedding
+            if q_embedding is None:
+                q_embedding = self._encode_query(question)
 
             # Check if collection has any documents
             collection_count = self.collection.count()
@@ -1175,299 +1260,44 @@ Most Active Repositories:
             print(f"❌ Error querying portfolio: {e}")
             print(f"[DEBUG] Falling back to returning all projects for context")
             # Fallback: return all projects to ensure we have context for repository data
-            fallback_matches = []
-            for i, project in enumerate(self.projects):
-                if filter_type and project.get("type") != filter_type:
-                    continue
-
-                project_display_name = project.get(
-                    "name", project.get("title", f"Project {i}"))
-                text = f"""Project: {project_display_name}
-                    Description: {project.get('description', '')}
-                    Skills: {", ".join(project.get("skills", []))}
-                    Code URL: {project.get("code_url", "N/A")}
-                    Notes:
-                    - """ + "\n- ".join(project.get('notes', []))
-
-                fallback_matches.append({
-                    "text": text.strip(),
-                    "metadata": {
-                        "type": project.get("type", "software"),
-                        "name": project_display_name,
-                        "code_url": project.get("code_url", ""),
-                        "skills": ", ".join(project.get("skills", [])),
-                        "image": project.get("image", "")
-                    }
-                })
-
-            return fallback_matches[:top_k]
-
-    def _find_direct_project_matches(self, question: str, filter_type: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Find projects by direct name matching and skill-based matching before falling back to semantic search."""
-        question_lower = question.lower().strip()
-
-        # Special handling for LED/horticulture queries - prioritize LED grow light project
-        if any(word in question_lower for word in ["led", "horticulture", "grow light", "hydroponic"]):
-            print(f"[DEBUG] Looking for LED horticulture project...")
-            for i, project in enumerate(self.projects):
-                project_name = project.get('name', '').lower()
-                project_type = project.get('type', '')
-                project_skills = " ".join(project.get("skills", [])).lower()
-
-                print(
-                    f"[DEBUG] Checking project {i}: {project.get('name', 'Unknown')} (type: {project_type})")
-                print(f"[DEBUG] Project name: '{project_name}'")
-                print(f"[DEBUG] Project skills: '{project_skills}'")
-
-                # Look specifically for the LED grow light project
-                if (project_type == "hobby" and
-                        "custom hydroponic hot pepper led grow light" in project_name):
-
-                    print(
-                        f"[DEBUG] Found LED horticulture project: {project['name']}")
-                    # Create the same format as ChromaDB results for LED project
-                    text = f"""Project: {project['name']}
-                        Description: {project['description']}
-                        Skills: {", ".join(project.get("skills", []))}
-                        Code URL: {project.get("code_url", "N/A")}
-                        Notes:
-                        - """ + "\n- ".join(project.get('notes', []))
-
-                    return [{
-                        "text": text.strip(),
-                        "metadata": {
-                            "type": project.get("type", "hobby"),
-                            "name": project.get("name", f"Project {i}"),
-                            "code_url": project.get("code_url", ""),
-                            "skills": ", ".join(project.get("skills", [])),
-                            "image": project.get("image", "")
-                        }
-                    }]
-            print(f"[DEBUG] No LED horticulture project found in direct search")
-
-        # Special handling for manufacturing queries - prioritize AIDA project
-        if "manufacturing" in question_lower:
-            print(f"[DEBUG] Looking for AIDA manufacturing project...")
-            print(f"[DEBUG] Filter type: {filter_type}")
-            for i, project in enumerate(self.projects):
-                print(
-                    f"[DEBUG] Checking project {i}: {project.get('name', 'Unknown')} (type: {project.get('type', 'Unknown')})")
-                if (project.get("type") == "electrical" and
-                    "aida" in project.get("name", "").lower() and
-                        "manufacturing" in " ".join(project.get("skills", [])).lower()):
-
-                    print(
-                        f"[DEBUG] Found AIDA manufacturing project: {project['name']}")
-                    # Create the same format as ChromaDB results for AIDA project
-                    text = f"""Project: {project['name']}
-                        Description: {project['description']}
-                        Skills: {", ".join(project.get("skills", []))}
-                        Code URL: {project.get("code_url", "N/A")}
-                        Notes:
-                        - """ + "\n- ".join(project.get('notes', []))
-
-                    return [{
-                        "text": text.strip(),
-                        "metadata": {
-                            "type": project.get("type", "electrical"),
-                            "name": project.get("name", f"Project {i}"),
-                            "code_url": project.get("code_url", ""),
-                            "skills": ", ".join(project.get("skills", [])),
-                            "image": project.get("image", "")
-                        }
-                    }]
-            print(f"[DEBUG] No AIDA manufacturing project found in direct search")
-
-            # Fallback: Look for any electrical projects with manufacturing skills
-            print(
-                f"[DEBUG] Looking for any electrical projects with manufacturing skills...")
-            manufacturing_projects = []
-            for i, project in enumerate(self.projects):
-                if (project.get("type") == "electrical" and
-                        any("manufacturing" in skill.lower() for skill in project.get("skills", []))):
-                    manufacturing_projects.append(project)
-                    print(
-                        f"[DEBUG] Found manufacturing project: {project['name']}")
-
-            if manufacturing_projects:
-                # Return the first manufacturing project found
-                project = manufacturing_projects[0]
-                text = f"""Project: {project['name']}
-                    Description: {project['description']}
-                    Skills: {", ".join(project.get("skills", []))}
-                    Code URL: {project.get("code_url", "N/A")}
-                    Notes:
-                    - """ + "\n- ".join(project.get('notes', []))
-
-                return [{
-                    "text": text.strip(),
-                    "metadata": {
-                        "type": project.get("type", "electrical"),
-                        "name": project.get("name", f"Project {i}"),
-                        "code_url": project.get("code_url", ""),
-                        "skills": ", ".join(project.get("skills", [])),
-                        "image": project.get("image", "")
-                    }
-                }]
-
-        # Special handling for professional profile queries
-        if any(word in question_lower for word in ["professional", "profile", "background", "experience", "career", "resume", "cv", "about you", "your background"]):
-            print(f"[DEBUG] Looking for professional profile...")
-            for i, project in enumerate(self.projects):
-                if project.get("type") == "professional":
-                    print(
-                        f"[DEBUG] Found professional profile: {project['name']}")
-                    # Create the same format as ChromaDB results for professional profile
-                    text = f"""Project: {project['name']}
-                        Description: {project['description']}
-                        Skills: {", ".join(project.get("skills", []))}
-                        Code URL: {project.get("code_url", "N/A")}
-                        Notes:
-                        - """ + "\n- ".join(project.get('notes', []))
-
-                    # Add YouTube tutorials if available
-                    if project.get("youtube_tutorials"):
-                        text += f"\nYouTube Tutorials: {', '.join(project['youtube_tutorials'])}"
-
-                    return [{
-                        "text": text.strip(),
-                        "metadata": {
-                            "type": project.get("type", "professional"),
-                            "name": project.get("name", f"Project {i}"),
-                            "code_url": project.get("code_url", ""),
-                            "skills": ", ".join(project.get("skills", [])),
-                            "image": project.get("image", ""),
-                            "youtube_tutorials": ", ".join(project.get("youtube_tutorials", []))
-                        }
-                    }]
-            print(f"[DEBUG] No professional profile found in direct search")
-
-        # Special handling for professional story queries
-        if any(word in question_lower for word in ["story", "journey", "path", "how did you", "how did you get", "your story", "your journey", "electrician coder", "bridging", "power systems and code"]):
-            print(f"[DEBUG] Looking for professional story...")
-            print(f"[DEBUG] Question: '{question_lower}'")
-            print(
-                f"[DEBUG] Available project types: {[p.get('type', 'unknown') for p in self.projects]}")
-            for i, project in enumerate(self.projects):
-                print(
-                    f"[DEBUG] Checking project {i}: type={project.get('type', 'unknown')}, title={project.get('title', 'N/A')}")
-                if project.get("type") == "professional_story":
-                    print(
-                        f"[DEBUG] Found professional story: {project.get('title', 'Professional Story')}")
-                    # Create the same format as ChromaDB results for professional story
-                    text = f"""Project: {project.get('title', 'Professional Story')}
-                        Intro: {project.get('intro', '')}
-                        """
-
-                    # Add sections
-                    for section in project.get("sections", []):
-                        text += f"\n{section.get('heading', '')}:"
-                        for content in section.get("content", []):
-                            text += f"\n{content}"
-                        for bullet in section.get("bullets", []):
-                            text += f"\n- {bullet}"
-
-                    # Add YouTube tutorials if available
-                    if project.get("youtube_tutorials"):
-                        text += f"\nYouTube Tutorials: {', '.join(project['youtube_tutorials'])}"
-
-                    return [{
-                        "text": text.strip(),
-                        "metadata": {
-                            "type": project.get("type", "professional_story"),
-                            "name": project.get("title", f"Professional Story {i}"),
-                            "code_url": "",
-                            "skills": "",
-                            "image": "",
-                            "youtube_tutorials": ", ".join(project.get("youtube_tutorials", []))
-                        }
-                    }]
-            print(f"[DEBUG] No professional story found in direct search")
-
-        # Special handling for YouTube queries - prioritize professional story
-        if any(word in question_lower for word in ["youtube", "video", "tutorial", "stream", "twitch", "reddit", "content"]):
-            print(f"[DEBUG] Looking for YouTube/content projects...")
-            for i, project in enumerate(self.projects):
-                if project.get("type") == "professional_story" and project.get("youtube_tutorials"):
-                    print(
-                        f"[DEBUG] Found professional story with YouTube tutorials: {project.get('title', 'Professional Story')}")
-                    # Create the same format as ChromaDB results for professional story
-                    text = f"""Project: {project.get('title', 'Professional Story')}
-                        Intro: {project.get('intro', '')}
-                        """
-
-                    # Add sections
-                    for section in project.get("sections", []):
-                        text += f"\n{section.get('heading', '')}:"
-                        for content in section.get("content", []):
-                            text += f"\n{content}"
-                        for bullet in section.get("bullets", []):
-                            text += f"\n- {bullet}"
-
-                    # Add YouTube tutorials if available
-                    if project.get("youtube_tutorials"):
-                        text += f"\nYouTube Tutorials: {', '.join(project['youtube_tutorials'])}"
-
-                    return [{
-                        "text": text.strip(),
-                        "metadata": {
-                            "type": project.get("type", "professional_story"),
-                            "name": project.get("title", f"Professional Story {i}"),
-                            "code_url": "",
-                            "skills": "",
-                            "image": "",
-                            "youtube_tutorials": ", ".join(project.get("youtube_tutorials", []))
-                        }
-                    }]
-            print(f"[DEBUG] No YouTube projects found in direct search")
+            if self.project_index is None:
+                return []
+            return self.project_index.all_matches(filter_type)[:top_k]
 
-        # Remove common query words to extract project name
-        query_words = ["what", "is", "tell", "me",
-                       "about", "@bot", "whats", "what's"]
-        for word in query_words:
-            question_lower = question_lower.replace(word, "").strip()
+    def _encode_query(self, question: str) -> List[float]:
+        """Embed a query once so retrieval and the semantic cache can share it."""
+        self._ensure_initialized()
+        q_embedding = self.model.encode([question], convert_to_numpy=True)[0]
+        q_embedding_list = self._ensure_list_format([q_embedding])
+        return q_embedding_list[0] if q_embedding_list else []
 
-        matches = []
+    def _query_embedding(self, query: str) -> Optional[List[float]]:
+        """Embed a query up front for routing, the semantic cache and retrieval (None for button clicks)."""
+        if query.startswith("[BUTTON_CLICK|"):
+            return None
+        try:
+            return self._encode_query(query)
+        except Exception as e:
+            print(f"❌ Error embedding query: {e}")
+            return None
 
-        for i, project in enumerate(self.projects):
-            # Skip if filter doesn't match
-            if filter_type and project.get("type") != filter_type:
-                continue
+    def query_context(self, query: str, user_id: str = "default") -> QueryContext:
+        """Per-message context whose embedding and intent are computed once, on first use."""
+        return QueryContext(query, user_id, encode=self._query_embedding, route=self._route_intent)
 
-            # Handle different project formats (some use 'name', others use 'title')
-            project_name = project.get(
-                "name", project.get("title", f"Project {i}")).lower()
-
-            # Check if the cleaned question matches the project name (full or partial)
-            if (question_lower in project_name or
-                # First word of project name
-                project_name.split()[0] in question_lower or
-                    any(word in project_name for word in question_lower.split() if len(word) > 3)):  # Significant words
-
-                # Create the same format as ChromaDB results
-                project_display_name = project.get(
-                    "name", project.get("title", f"Project {i}"))
-                text = f"""Project: {project_display_name}
-                    Description: {project.get('description', '')}
-                    Skills: {", ".join(project.get("skills", []))}
-                    Code URL: {project.get("code_url", "N/A")}
-                    Notes:
-                    - """ + "\n- ".join(project.get('notes', []))
-                if project.get("image"):
-                    text += f"\nImage: {project['image']}"
-
-                matches.append({
-                    "text": text.strip(),
-                    "metadata": {
-                        "type": project.get("type", "software"),
-                        "name": project_display_name,
-                        "code_url": project.get("code_url", ""),
-                        "skills": ", ".join(project.get("skills", [])),
-                        "image": project.get("image", "")
-                    }
-                })
+    def _route_intent(self, q_embedding: Optional[List[float]]) -> Optional[IntentMatch]:
+        """Closest intent prototype to the query embedding, if the router is available."""
+        if PortfolioAssistant._intent_router is None or not q_embedding:
+            return None
+        routed = PortfolioAssistant._intent_router.route(q_embedding)
+        print(f"[DEBUG] Intent router: {routed}")
+        return routed
 
-        return matches
+    def _find_direct_project_matches(self, question: str, filter_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Find projects by direct name matching and skill-based matching before falling back to semantic search."""
+        if self.project_index is None:
+            self.project_index = ProjectIndex(self.projects)
+        return self.project_index.find_direct_matches(question, filter_type)
 
     def ask_ollama_stream(
         self,
@@ -1475,7 +1305,8 @@ Most Active Repositories:
         matches: List[dict],
         user_id: str = "default",
         filter_type: Optional[str] = None,
-        is_regenerate: bool = False
+        is_regenerate: bool = False,
+        q_embedding: Optional[List[float]] = None
     ) -> Iterator[str]:
         """Generate a streaming response
           using Ollama HTTP API with project context."""
@@ -1485,22 +1316,9 @@ Most Active Repositories:
             yield self._get_fallback_response(query)
             return
 
-        print(f"[DEBUG] Query: '{query}'")
-        print(f"[DEBUG] Found {len(matches)} matches")
-        for i, match in enumerate(matches):
-            meta = match.get("metadata", {})
-            print(
-                f"[DEBUG] Match {i}: {meta.get('name', 'Unknown')} (type: {meta.get('type', 'unknown')})")
-            print(f"[DEBUG]   - Image: '{meta.get('image', 'None')}'")
-            print(
-                f"[DEBUG]   - YouTube: '{meta.get('youtube_tutorials', 'None')}'")
-
-        projects_with_images = self._extract_project_images(matches, top_n=2)
+        prompt, projects_with_images = self._prepare_generation(query, matches)
         if projects_with_images:
-            self.current_project_images = projects_with_images
-
-        context = self._build_context(matches, query)
-        prompt = self._format_prompt(context, query)
+            self.update_user_state(user_id, project_images=projects_with_images)
 
         yield "[STATUS|Passing data to LLM...]"
         try:
@@ -1513,24 +1331,12 @@ Most Active Repositories:
             )
         except (requests.ConnectionError, requests.Timeout) as e:
             print(f"❌ Ollama request failed: {e}")
-            if is_regenerate:
-                print(
-                    f"🔄 Regenerate fallback: Providing alternative response for: {query}")
-                yield self._get_alternative_response(matches, query)
-            else:
-                print(f"🔄 Falling back to simple response for: {query}")
-                yield self._get_simple_response(matches, query)
+            yield self._generation_fallback(matches, query, is_regenerate)
             return
 
         if response.status_code != 200:
             print(f"❌ Ollama HTTP {response.status_code}")
-            if is_regenerate:
-                print(
-                    f"🔄 Regenerate fallback: Providing alternative response for: {query}")
-                yield self._get_alternative_response(matches, query)
-            else:
-                print(f"🔄 Falling back to simple response for: {query}")
-                yield self._get_simple_response(matches, query)
+            yield self._generation_fallback(matches, query, is_regenerate)
             return
 
         # Stream the response and collect the full text simultaneously
@@ -1541,6 +1347,127 @@ Most Active Repositories:
                 full_response += chunk
             yield chunk
 
+        extras = list(self._response_extras(
+            matches, full_response, query, projects_with_images))
+        yield from extras
+
+        self._remember_answer(query, q_embedding, filter_type,
+                              full_response, extras, projects_with_images)
+
+        # Finally save the response
+        self.save_query_and_response(query, full_response, user_id)
+
+    async def aask_ollama_stream(
+        self,
+        query: str,
+        matches: List[dict],
+        user_id: str = "default",
+        filter_type: Optional[str] = None,
+        is_regenerate: bool = False,
+        q_embedding: Optional[List[float]] = None
+    ) -> AsyncIterator[str]:
+        """Async counterpart of ask_ollama_stream using the pooled httpx client."""
+        print(f"[📤] Prompt → Ollama model {OLLAMA_CONFIG['MODEL']} (async)")
+
+        if not matches:
+            yield self._get_fallback_response(query)
+            return
+
+        prompt, projects_with_images = await asyncio.to_thread(
+            self._prepare_generation, query, matches)
+        if projects_with_images:
+            await asyncio.to_thread(
+                self.update_user_state, user_id, project_images=projects_with_images)
+
+        yield "[STATUS|Passing data to LLM...]"
+        client = self._get_http_client()
+        request = client.build_request(
+            "POST",
+            OLLAMA_CONFIG["API_URL"],
+            json={"model": OLLAMA_CONFIG["MODEL"],
+                  "prompt": prompt, "stream": True},
+        )
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.TransportError as e:
+            print(f"❌ Ollama request failed: {e}")
+            yield self._generation_fallback(matches, query, is_regenerate)
+            return
+
+        full_response = ""
+        try:
+            if response.status_code != 200:
+                print(f"❌ Ollama HTTP {response.status_code}")
+                yield self._generation_fallback(matches, query, is_regenerate)
+                return
+
+            async for chunk in self._astream_response(response):
+                if not chunk.startswith("[STATUS|"):
+                    full_response += chunk
+                yield chunk
+        finally:
+            await response.aclose()
+
+        extras = list(self._response_extras(
+            matches, full_response, query, projects_with_images))
+        for extra in extras:
+            yield extra
+
+        self._remember_answer(query, q_embedding, filter_type,
+                              full_response, extras, projects_with_images)
+
+        await asyncio.to_thread(
+            self.save_query_and_response, query, full_response, user_id)
+
+    @classmethod
+    def _get_http_client(cls) -> httpx.AsyncClient:
+        """Get the shared async HTTP client, creating the connection pool on first use."""
+        if cls._http_client is None or cls._http_client.is_closed:
+            cls._http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(OLLAMA_CONFIG["TIMEOUT"]),
+                limits=httpx.Limits(
+                    max_connections=OLLAMA_CONFIG["MAX_CONNECTIONS"],
+                    max_keepalive_connections=OLLAMA_CONFIG["MAX_CONNECTIONS"]
+                )
+            )
+        return cls._http_client
+
+    @classmethod
+    async def close_http_client(cls):
+        """Close the shared async HTTP client (called on app shutdown)."""
+        if cls._http_client is not None:
+            await cls._http_client.aclose()
+            cls._http_client = None
+
+    def _prepare_generation(self, query: str, matches: List[dict]) -> Tuple[str, List[dict]]:
+        """Build the LLM prompt for a query and collect the matched project images."""
+        print(f"[DEBUG] Query: '{query}'")
+        print(f"[DEBUG] Found {len(matches)} matches")
+        for i, match in enumerate(matches):
+            meta = match.get("metadata", {})
+            print(
+                f"[DEBUG] Match {i}: {meta.get('name', 'Unknown')} (type: {meta.get('type', 'unknown')})")
+            print(f"[DEBUG]   - Image: '{meta.get('image', 'None')}'")
+            print(
+                f"[DEBUG]   - YouTube: '{meta.get('youtube_tutorials', 'None')}'")
+
+        projects_with_images = self._extract_project_images(matches, top_n=2)
+
+        context = self._build_context(matches, query)
+        prompt = self._format_prompt(context, query)
+        return prompt, projects_with_images
+
+    def _generation_fallback(self, matches: List[dict], query: str, is_regenerate: bool) -> str:
+        """Response used when Ollama is unreachable or returns an error."""
+        if is_regenerate:
+            print(
+                f"🔄 Regenerate fallback: Providing alternative response for: {query}")
+            return self._get_alternative_response(matches, query)
+        print(f"🔄 Falling back to simple response for: {query}")
+        return self._get_simple_response(matches, query)
+
+    def _response_extras(self, matches: List[dict], full_response: str, query: str, projects_with_images: List[dict]) -> Iterator[str]:
+        """Yield the buttons and gallery commands appended after a generated response."""
         # Append image‑gallery button only if we have actual images
         print(f"[DEBUG] projects_with_images: {projects_with_images}")
         if projects_with_images and len(projects_with_images) > 0:
@@ -1573,9 +1500,6 @@ Most Active Repositories:
         if self._is_programming_query(query):
             yield "\n\n[BUTTON|show_programming_report|View Detailed Programming Report]"
 
-        # Finally save the response
-        self.save_query_and_response(query, full_response, user_id)
-
     # — Helpers —
 
     def _extract_project_images(self, matches: List[dict], top_n: int) -> List[dict]:
@@ -1651,10 +1575,7 @@ Most Active Repositories:
         context = "\n---\n".join(parts)
 
         # Add repository data for programming-related queries
-        programming_keywords = ["programming", "code", "python", "javascript",
-                                "languages", "libraries", "repositories", "github", "development", "software"]
-        matching_keywords = [
-            keyword for keyword in programming_keywords if keyword in query.lower()]
+        matching_keywords = classify_query(query).matching("repo_context")
         print(f"[DEBUG] _build_context - Query: '{query}'")
         print(
             f"[DEBUG] _build_context - Matching programming keywords: {matching_keywords}")
@@ -1685,6 +1606,7 @@ Most Active Repositories:
         """
         buffer = ""
         count = 0
+        streamed = False
 
         for chunk in response.iter_lines(decode_unicode=True):
             if not chunk:
@@ -1693,9 +1615,10 @@ Most Active Repositories:
             text = data.get("response", "")
             buffer += text
             count += 1
+            streamed = streamed or bool(text)
 
-            # periodic status
-            if count % 10 == 0:
+            # periodic status, only until text is flowing (a status flushes batched text)
+            if count % 10 == 0 and not streamed:
                 yield f"[STATUS|Generated {count} chunks...]"
 
             # flush on punctuation or length
@@ -1708,6 +1631,34 @@ Most Active Repositories:
                     yield buffer
                     break
 
+    async def _astream_response(self, response: httpx.Response) -> AsyncIterator[str]:
+        """
+        Async counterpart of _stream_response for httpx streaming responses.
+        Tokens are yielded as they arrive; batching for the wire is done by
+        coalesce_chunks in the chat route.
+        """
+        count = 0
+        streamed = False
+
+        async for chunk in response.aiter_lines():
+            if not chunk:
+                continue
+            data = json.loads(chunk)
+            text = data.get("response", "")
+            count += 1
+
+            # periodic status, only until text is flowing: a status makes
+            # coalesce_chunks flush whatever text it is batching
+            if count % 10 == 0 and not streamed:
+                yield f"[STATUS|Generated {count} chunks...]"
+
+            if text:
+                streamed = True
+                yield text
+
+            if data.get("done"):
+                break
+
     def _collect_full_response(self, response: requests.Response) -> str:
         """
         Collect the full response text from Ollama without streaming.
@@ -2030,27 +1981,82 @@ Most Active Repositories:
             traceback.print_exc()
             return self._get_fallback_response(query)
 
-    def get_response_stream(self, query: str, user_id: str = "default", bypass_predefined: bool = False) -> Iterator[str]:
+    def get_response_stream(self, query: str, user_id: str = "default", bypass_predefined: bool = False, context: Optional[QueryContext] = None) -> Iterator[str]:
         """Main optimized method to get a streaming response to a query, with hobby handling."""
         print(
             f"[DEBUG] get_response_stream called with query: '{query}' for user: {user_id}")
         print(f"[DEBUG] bypass_predefined: {bypass_predefined}")
 
+        context = context or self.query_context(query, user_id)
+        reply = self._route_query(context, bypass_predefined)
+        if reply is not None:
+            yield reply
+            return
+
+        print(f"[DEBUG] Query is portfolio-related, proceeding with full processing")
+        try:
+            cached = self._cached_answer(context, bypass_predefined)
+            if cached is not None:
+                yield cached["answer"]
+                self.save_query_and_response(query, cached["response"], user_id)
+                return
+
+            matches = self._retrieve_matches(context)
+            yield from self.ask_ollama_stream(query, matches, user_id, context.filter_type,
+                                              context.is_regenerate, context.embedding)
+        except Exception as e:
+            yield self._stream_error_response(query, e)
+
+    async def aget_response_stream(self, query: str, user_id: str = "default", bypass_predefined: bool = False, context: Optional[QueryContext] = None) -> AsyncIterator[str]:
+        """Async counterpart of get_response_stream that never blocks the event loop."""
+        print(
+            f"[DEBUG] aget_response_stream called with query: '{query}' for user: {user_id}")
+        print(f"[DEBUG] bypass_predefined: {bypass_predefined}")
+
+        # Embedding happens on first use, inside these worker threads
+        context = context or self.query_context(query, user_id)
+        reply = await asyncio.to_thread(self._route_query, context, bypass_predefined)
+        if reply is not None:
+            yield reply
+            return
+
+        print(f"[DEBUG] Query is portfolio-related, proceeding with full processing")
+        try:
+            cached = await asyncio.to_thread(self._cached_answer, context, bypass_predefined)
+            if cached is not None:
+                yield cached["answer"]
+                await asyncio.to_thread(
+                    self.save_query_and_response, query, cached["response"], user_id)
+                return
+
+            matches = await asyncio.to_thread(self._retrieve_matches, context)
+            async for chunk in self.aask_ollama_stream(query, matches, user_id, context.filter_type,
+                                                       context.is_regenerate, context.embedding):
+                yield chunk
+        except Exception as e:
+            yield self._stream_error_response(query, e)
+
+    def _route_query(self, context: QueryContext, bypass_predefined: bool = False) -> Optional[str]:
+        """
+        Answer queries that don't need retrieval or the LLM (button clicks, hobby
+        selection, predefined and off-topic replies). Returns None otherwise.
+        """
+        query, user_id = context.query, context.user_id
+
         # Check for button clicks first
         button_result = self.handle_button_click(query, user_id)
         if button_result:
             print(
                 f"[DEBUG] Button click handled, returning: {button_result[:50]}...")
-            yield button_result
-            return
+            return button_result
 
-        # Clear any old global image data when starting a new query (not a button click)
-        self.current_project_images = []
+        # Clear this user's old image data when starting a new query (not a button click)
+        if self.get_user_state(user_id)["project_images"]:
+            self.update_user_state(user_id, project_images=[])
 
         if not self.projects:
             print(f"[DEBUG] No projects loaded, using fallback")
-            yield self._get_fallback_response(query)
-            return
+            return self._get_fallback_response(query)
 
         user_state = self.get_user_state(user_id)
         print(f"[DEBUG] User state: {user_state}")
@@ -2060,7 +2066,7 @@ Most Active Repositories:
             print(f"[DEBUG] User is awaiting hobby choice")
             # Check if the query looks like a hobby selection (number or hobby name match)
             cleaned_query = query.strip().lower()
-            hobby_projects = user_state.get("last_hobby_list", [])
+            hobby_projects = self._hobby_list(user_state)
 
             # Is this a number selection (1, 2, 3)?
             is_number_selection = cleaned_query.isdigit() and 1 <= int(
@@ -2073,100 +2079,132 @@ Most Active Repositories:
             if is_number_selection or is_name_match:
                 # This looks like a hobby selection, handle it
                 result = self.handle_hobby_selection(query, user_id)
-                yield result or "Please click a 'View Photos' button to see project details."
-                return
+                return result or "Please click a 'View Photos' button to see project details."
         else:
             print(f"[DEBUG] User is not awaiting hobby choice")
 
-        # If user asked about hobbies - expanded detection
-        hobby_keywords = [
-            "hobbies", "hobby projects", "hobby project", "personal projects",
-            "hardware projects", "electronics projects", "diy projects",
-            "side projects", "hobby showcases", "hobby work", "what hobbies",
-            "tell me about his hobbies", "hardware work", "electronics work"
-        ]
-        if any(keyword in query.lower() for keyword in hobby_keywords):
+        # If user asked about hobbies (the intent router decides when confident, keywords otherwise)
+        if context.is_hobby_list:
             print(f"[DEBUG] Hobby keywords detected, handling hobby list")
-            yield self.handle_hobby_list(user_id)
-            return
+            return self.handle_hobby_list(user_id)
 
         # Intercept software/project list questions and respond with predefined text
         # BUT skip predefined response if bypass_predefined is True
-        if not bypass_predefined and any(kw in query.lower() for kw in [
-            "programming projects", "software projects", "code projects", "python projects",
-            "what projects has he built", "list his projects", "developer projects",
-            "programming languages", "languages", "what languages", "programming language"
-        ]):
-            print(
-                f"[DEBUG] Software project keywords detected, using predefined response")
-            yield from self._predefined_software_projects()
-            return
-        elif bypass_predefined and any(kw in query.lower() for kw in [
-            "programming projects", "software projects", "code projects", "python projects",
-            "what projects has he built", "list his projects", "developer projects",
-            "programming languages", "languages", "what languages", "programming language"
-        ]):
+        if context.is_software_list:
+            if not bypass_predefined:
+                print(
+                    f"[DEBUG] Software project keywords detected, using predefined response")
+                return "".join(self._predefined_software_projects())
             print(
                 f"[DEBUG] Software project keywords detected but bypass_predefined=True, skipping predefined response")
 
         # Check if the query is portfolio-related before processing
         print(f"[DEBUG] Checking if query is portfolio-related: '{query}'")
-        is_portfolio = self.is_portfolio_related(query)
+        is_portfolio = context.is_portfolio
         print(f"[DEBUG] Query portfolio-related: {is_portfolio}")
 
         if not is_portfolio:
             print(f"[DEBUG] Query not portfolio-related, using off-topic response")
-            yield self._get_off_topic_response(query)
-            return
+            return self._get_off_topic_response(query)
 
-        print(f"[DEBUG] Query is portfolio-related, proceeding with full processing")
-        try:
-            filter_type = self.infer_filter_type(query)
-            print(
-                f"[DEBUG] Filter type detected: {filter_type} for query: '{query}'")
+        return None
 
-            # Detect broad queries that should return more results
-            is_broad_query = any(phrase in query.lower() for phrase in [
-                "programming projects", "software projects", "projects", "portfolio",
-                "all projects", "what projects", "work on", "built", "developed"
-            ])
+    def _is_hobby_list_query(self, query: str) -> bool:
+        """Check if the user is asking for the list of hobby projects."""
+        return classify_query(query).hobby_list
 
-            # Use more results for broad queries
-            top_k = 6 if is_broad_query else 3
-            print(
-                f"[DEBUG] Querying portfolio with top_k={top_k}, filter_type={filter_type}")
-            matches = self.query_portfolio(
-                query, top_k=top_k, filter_type=filter_type)
-            print(
-                f"[DEBUG] Found {len(matches)} matches for '{query}' (filter={filter_type}, top_k={top_k})")
-            print(
-                f"[DEBUG] Project names: {[m.get('metadata', {}).get('name', 'Unknown') for m in matches]}")
+    def coalesce_key(self, query: str, user_id: str = "default", bypass_predefined: bool = False) -> Optional[tuple]:
+        """
+        Key under which identical questions from different users can share one
+        generation, or None when the answer depends on this user's own state.
+        """
+        if query.startswith("[BUTTON_CLICK|"):
+            return None
+        if self.get_user_state(user_id).get("awaiting_hobby_choice"):
+            return None
+        if self._is_hobby_list_query(query):
+            # Listing hobbies arms this user's hobby selection state
+            return None
 
-            # Check if this is a regenerate request
-            is_regenerate = "[REGENERATE]" in query
+        normalized = " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+        if not normalized:
+            return None
+        return (normalized, self.infer_filter_type(query), bypass_predefined)
 
-            # Clear cache for programming-related queries that might have been incorrectly cached
-            if self._is_programming_query(query) and not is_regenerate:
-                print(f"[DEBUG] Programming query detected, checking cache...")
-                # The cache bypass logic in routes.py should handle this, but we can add extra logging here
+    def _retrieve_matches(self, context: QueryContext) -> List[Dict[str, Any]]:
+        """Fetch the project matches used as LLM context (kept on the context)."""
+        query, filter_type = context.query, context.filter_type
+        print(
+            f"[DEBUG] Filter type detected: {filter_type} for query: '{query}'")
 
-            yield from self.ask_ollama_stream(query, matches, user_id, filter_type, is_regenerate)
-        except Exception as e:
-            print(f"❌ Error getting streaming response: {e}")
-            print(f"🔍 Query that failed: '{query}'")
-            print(f"🔍 Filter type: {filter_type}")
-            print(
-                f"🔍 Number of matches: {len(matches) if 'matches' in locals() else 'N/A'}")
-            import traceback
-            traceback.print_exc()
+        # Detect broad queries that should return more results
+        is_broad_query = context.intent.broad
 
-            # Try to provide a more specific fallback for manufacturing queries
-            if "manufacturing" in query.lower():
-                print(
-                    f"🔄 Providing manufacturing-specific fallback for: {query}")
-                yield "Ryan has significant manufacturing experience working with AIDA America on servo press assembly and retrofit projects. He worked on presses ranging from 200 to 4,000 metric tons, installing electrical systems, routing communication cables, and integrating modern PLCs and safety interlocks. This work involved both in-house manufacturing and on-site retrofitting in live production environments."
-            else:
-                yield self._get_fallback_response(query)
+        # Use more results for broad queries
+        top_k = 6 if is_broad_query else 3
+        print(
+            f"[DEBUG] Querying portfolio with top_k={top_k}, filter_type={filter_type}")
+        matches = self.query_portfolio(
+            query, top_k=top_k, filter_type=filter_type, context=context)
+        print(
+            f"[DEBUG] Found {len(matches)} matches for '{query}' (filter={filter_type}, top_k={top_k})")
+        print(
+            f"[DEBUG] Project names: {[m.get('metadata', {}).get('name', 'Unknown') for m in matches]}")
+        context.matches = matches
+        return matches
+
+    def _corpus_hash(self) -> str:
+        """Project files hash, re-read at most every HASH_CHECK_INTERVAL seconds."""
+        checked_at, file_hash = PortfolioAssistant._corpus_hash_state
+        now = time.monotonic()
+        if file_hash is None or now - checked_at > SEMANTIC_CACHE_CONFIG["HASH_CHECK_INTERVAL"]:
+            file_hash = self._get_file_hash()
+            PortfolioAssistant._corpus_hash_state = (now, file_hash)
+        return file_hash
+
+    def _cached_answer(self, context: QueryContext, bypass_predefined: bool = False) -> Optional[dict]:
+        """Look up a previously generated answer to a paraphrase of this query."""
+        # Regenerate requests always want a fresh answer
+        if not SEMANTIC_CACHE_CONFIG["ENABLED"] or bypass_predefined or context.is_regenerate:
+            return None
+        if not context.embedding:
+            return None
+
+        query, user_id = context.query, context.user_id
+        entry = PortfolioAssistant._semantic_cache.lookup(
+            context.embedding, context.filter_type, self._corpus_hash())
+        if entry is None:
+            return None
+
+        print(
+            f"🧠 Semantic cache HIT ({entry['similarity']:.2f}) for: '{query[:50]}' (matched '{entry['query'][:50]}')")
+        if entry["project_images"]:
+            self.update_user_state(
+                user_id, project_images=entry["project_images"])
+        return entry
+
+    def _remember_answer(self, query: str, q_embedding: Optional[List[float]], filter_type: Optional[str], full_response: str, extras: List[str], projects_with_images: List[dict]):
+        """Store a freshly generated answer in the semantic cache."""
+        if not q_embedding or not full_response.strip():
+            return
+        PortfolioAssistant._semantic_cache.store(
+            q_embedding, filter_type, self._corpus_hash(),
+            query=query, answer=full_response + "".join(extras),
+            response=full_response, project_images=projects_with_images)
+
+    def _stream_error_response(self, query: str, error: Exception) -> str:
+        """Log a failed generation and pick the fallback text to send instead."""
+        print(f"❌ Error getting streaming response: {error}")
+        print(f"🔍 Query that failed: '{query}'")
+        import traceback
+        traceback.print_exc()
+
+        # Try to provide a more specific fallback for manufacturing queries
+        if "manufacturing" in query.lower():
+            print(
+                f"🔄 Providing manufacturing-specific fallback for: {query}")
+            return "Ryan has significant manufacturing experience working with AIDA America on servo press assembly and retrofit projects. He worked on presses ranging from 200 to 4,000 metric tons, installing electrical systems, routing communication cables, and integrating modern PLCs and safety interlocks. This work involved both in-house manufacturing and on-site retrofitting in live production environments."
+        return self._get_fallback_response(query)
 
     def _predefined_software_projects(self) -> Iterator[str]:
         yield (
@@ -2182,97 +2220,16 @@ Most Active Repositories:
             "[BUTTON|show_programming_report|View Detailed Programming Report]"
         )
 
-    def is_portfolio_related(self, question: str) -> bool:
+    def is_portfolio_related(self, question: str, q_embedding: Optional[List[float]] = None) -> bool:
         """Check if a question is related to portfolio topics (projects, skills, experience)."""
-        q = question.lower()
-        print(f"[DEBUG] is_portfolio_related checking: '{q}'")
-
-        # Portfolio-related keywords
-        portfolio_keywords = [
-            # General portfolio terms
-            "project", "projects", "work", "experience", "skill", "skills", "portfolio", "built", "developed", "created",
-            "technologies", "technology", "expertise", "background", "accomplishments", "achievements",
-
-            # Programming/Software
-            "programming", "software", "python", "javascript", "code", "coding", "github", "api", "websocket",
-            "model", "fastapi", "plotly", "pyo3", "async", "chatbot", "frontend", "library", "libraries", "app", "application",
-            "development", "web", "fullstack", "framework", "database", "algorithm", "nlp", "machine learning",
-            "tensorflow", "keras", "rust", "pydantic", "jwt", "authentication", "encryption",
-
-            # Electrical/Manufacturing
-            "electrical", "qa", "infrared", "tegg", "thermal", "ultrasonic", "power distribution", "voltage",
-            "inspection", "manufacturing", "press", "assembly", "retrofit", "tonnage", "metric", "aida",
-            "servo", "mechanical", "industrial", "production",
-
-            # Hardware/Hobbies
-            "hardware", "hobby", "hobbies", "pcb", "etching", "soldering", "prototyping", "embedded",
-            "microcontroller", "midi", "ble", "rgb", "led", "strip", "guitar", "overlay", "effects",
-            "musical", "interface", "design", "electronics", "circuit", "van", "esp32", "controller",
-
-            # Technical skills
-            "technical", "engineering", "architect", "design", "implementation", "testing", "debugging",
-            "optimization", "performance", "security", "scalability",
-
-            # Personal/Life questions
-            "fun", "hobby", "hobbies", "personal", "life", "about", "who", "what", "how", "when", "where", "why",
-            "story", "journey", "background", "experience", "interests", "passion", "enjoy", "like", "love",
-
-            # Content creation and sharing
-            "youtube", "video", "tutorial", "tutorials", "content", "stream", "streaming", "twitch", "reddit",
-            "mentor", "teaching", "sharing", "knowledge", "educational", "content creation"
-        ]
-
-        # Check if any portfolio keywords are present
-        matching_keywords = [
-            keyword for keyword in portfolio_keywords if keyword in q]
-        if matching_keywords:
-            print(f"[DEBUG] Found portfolio keywords: {matching_keywords}")
-            return True
-
-        # Check for common question patterns about portfolio
-        portfolio_patterns = [
-            "what did", "what have", "tell me about", "show me", "can you", "how did", "what projects",
-            "what work", "what experience", "what skills", "what technologies", "what tools", "what libraries",
-            "what does", "what do", "whats", "what's", "who is", "who's", "how is", "how's", "when does",
-            "where does", "why does", "tell me", "show me", "can you tell", "do you know",
-            "does he", "does she", "do they", "does ryan", "does he do", "does he have"
-        ]
+        print(f"[DEBUG] is_portfolio_related checking: '{question.lower()}'")
+        return QueryContext(question, embedding=q_embedding, route=self._route_intent).is_portfolio
 
-        matching_patterns = [
-            pattern for pattern in portfolio_patterns if pattern in q]
-        if matching_patterns:
-            print(f"[DEBUG] Found portfolio patterns: {matching_patterns}")
-            return True
-
-        print(f"[DEBUG] No portfolio keywords or patterns found")
-        return False
-
-    def infer_filter_type(self, question: str) -> Optional[str]:
+    def infer_filter_type(self, question: str, q_embedding: Optional[List[float]] = None) -> Optional[str]:
         """Infer whether the user is asking about electrical, software, or manufacturing projects."""
-        q = question.lower()
-
-        # Manufacturing/Industrial projects (AIDA press work)
-        if any(word in q for word in ["manufacturing", "press", "assembly", "retrofit", "tonnage", "metric", "aida", "servo", "mechanical", "industrial", "production"]):
-            return "electrical"  # AIDA project is stored as electrical type
-
-        # Electrical projects (TEGG work)
-        if any(word in q for word in ["electrical", "qa", "infrared", "tegg", "thermal", "ultrasonic", "power distribution", "voltage", "inspection"]):
-            return "electrical"
-
-        if any(word in q for word in ["programming", "software", "python", "code", "github", "api", "websocket", "model", "fastapi", "plotly", "pyo3", "async", "chatbot", "frontend", "library", "libraries", "app", "application", "development"]):
-            return "software"
-        if any(word in q for word in ["hardware", "hobby", "hobbies", "pcb", "etching", "soldering", "prototyping", "embedded", "microcontroller", "midi", "ble", "rgb", "led", "strip", "guitar", "overlay", "effects", "musical", "interface", "design"]):
-            return "hobby"
-
-        # Professional profile queries
-        if any(word in q for word in ["professional", "profile", "background", "experience", "career", "resume", "cv", "about you", "your background", "work history", "professional experience", "skills", "expertise", "qualifications"]):
-            return "professional"
-
-        # Professional story queries
-        if any(word in q for word in ["story", "journey", "path", "how did you", "how did you get", "your story", "your journey", "electrician coder", "bridging", "power systems and code", "mission critical", "data centers", "servo press"]):
-            return "professional_story"
-
-        return None  # fallback to no filter
+        # Keywords: manufacturing/industrial (AIDA press work, stored as electrical type),
+        # then electrical (TEGG work), software, hobby, professional profile and story
+        return QueryContext(question, embedding=q_embedding, route=self._route_intent).filter_type
 
     def save_query_and_response(self, query: str, response: str, username: str = "unknown", ip_address: str = None):
         """Save query and response to database with user information and IP address."""
@@ -2336,6 +2293,7 @@ Most Active Repositories:
         """Clean up class-level cached resources."""
         cls._model_cache = None
         cls._chroma_client = None
+        cls._semantic_cache.clear()
         print("🧹 Cleaned up cached resources")
 
     def _create_youtube_gallery(self, youtube_urls, project_name):
@@ -2391,8 +2349,8 @@ Most Active Repositories:
             full_text += text
             count += 1
 
-            # periodic status
-            if count % 10 == 0:
+            # periodic status, only until text is flowing
+            if count % 10 == 0 and not full_text:
                 status_chunk = f"[STATUS|Generated {count} chunks...]"
                 chunks.append(status_chunk)
 
@@ -1,24 +1,32 @@
 
-from fastapi import WebSocket
 import json
-from typing import Union
+from typing import Optional, Union
+from server.chat.connection import ClientConnection, EncodedMessage
+from server.chat.broker import Broker, InProcessBroker, PRIVATE_CHANNEL
 from server.utils.models import PrivateMessage
 
 
 class PrivateConnectionManager:
-    def __init__(self):
-        self.private_connections: dict[str, WebSocket] = {}
+    def __init__(self, broker: Optional[Broker] = None):
+        # Shares each user's ClientConnection (and outbound queue) with ConnectionManager
+        self.private_connections: dict[str, ClientConnection] = {}
         self.public_keys: dict[str, str] = {}
+        # PMs and public keys for users on other workers travel over the broker
+        self.broker = broker or InProcessBroker()
+        self.broker.subscribe(PRIVATE_CHANNEL, self._on_remote)
+        self.broker.add_connect_listener(self._announce)
 
-    async def connect(self, websocket: WebSocket, username: str):
-            self.private_connections[username] = websocket
+    async def connect(self, connection: ClientConnection, username: str):
+            self.private_connections[username] = connection
 
-    def disconnect(self, username: str):
-        self.private_connections.pop(username, None)
+    def disconnect(self, username: str, connection: Optional[ClientConnection] = None):
+        if connection is None or self.private_connections.get(username) is connection:
+            self.private_connections.pop(username, None)
 
     def register_pubkey(self, username: str, pubkey: str):
         print(f"Registering pubkey for {username}: {pubkey}")
         self.public_keys[username] = pubkey
+        self.broker.publish(PRIVATE_CHANNEL, {"op": "pubkeys", "keys": {username: pubkey}})
 
     def get_pubkey(self, username: str) -> str:
         print(f"Getting pubkey for {username}: {self.public_keys.get(username)}")
@@ -46,7 +54,29 @@ class PrivateConnectionManager:
                 # Connection is closed, remove it from private connections
                 if username in self.private_connections:
                     del self.private_connections[username]
+        elif self.broker.has_peers:
+            # May be connected to another worker
+            message_to_send = payload.model_dump(by_alias=True) if hasattr(payload, 'model_dump') else payload
+            self.broker.publish(PRIVATE_CHANNEL, {"op": "send", "user": username, "payload": message_to_send})
     
+    def _on_remote(self, message: dict):
+        op = message.get("op")
+        if op == "send":
+            connection = self.private_connections.get(message.get("user"))
+            if connection is not None:
+                connection.deliver(EncodedMessage(payload=message["payload"]))
+        elif op == "pubkeys":
+            self.public_keys.update(message.get("keys", {}))
+        elif op == "hello":
+            # Share the keys of users connected here with the new node
+            local_keys = {username: key for username, key in self.public_keys.items()
+                          if username in self.private_connections}
+            if local_keys:
+                self.broker.publish(PRIVATE_CHANNEL, {"op": "pubkeys", "keys": local_keys})
+
+    def _announce(self):
+        self.broker.publish(PRIVATE_CHANNEL, {"op": "hello"})
+
     def _validate_message(self, payload: dict) -> PrivateMessage:
         """Validate a message payload against the PrivateMessage models"""
         msg_type = payload.get("type")
@@ -0,0 +1,192 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Query keywords that jump straight to one special project
+LED_KEYWORDS = ("led", "horticulture", "grow light", "hydroponic")
+PROFESSIONAL_KEYWORDS = ("professional", "profile", "background", "experience", "career",
+                         "resume", "cv", "about you", "your background")
+STORY_KEYWORDS = ("story", "journey", "path", "how did you", "how did you get", "your story",
+                  "your journey", "electrician coder", "bridging", "power systems and code")
+YOUTUBE_KEYWORDS = ("youtube", "video", "tutorial", "stream", "twitch", "reddit", "content")
+
+# Removed from the query before matching it against project names
+QUERY_FILLER_WORDS = ("what", "is", "tell", "me", "about", "@bot", "whats", "what's")
+
+LED_PROJECT_NAME = "custom hydroponic hot pepper led grow light"
+
+
+class IndexedProject:
+    """A project with everything direct matching needs precomputed."""
+
+    __slots__ = ("type", "name_lower", "first_word", "match", "special_match")
+
+    def __init__(self, position: int, project: Dict[str, Any]):
+        self.type = project.get("type")
+        display_name = project.get("name", project.get("title", f"Project {position}"))
+        self.name_lower = display_name.lower()
+        words = self.name_lower.split()
+        self.first_word = words[0] if words else None
+
+        skills = ", ".join(project.get("skills", []))
+        summary = (f"Project: {display_name}\n"
+                   f"Description: {project.get('description', '')}\n"
+                   f"Skills: {skills}\n"
+                   f"Code URL: {project.get('code_url', 'N/A')}\n"
+                   "Notes:\n- " + "\n- ".join(project.get("notes", [])))
+        metadata = {
+            "type": project.get("type", "software"),
+            "name": display_name,
+            "code_url": project.get("code_url", ""),
+            "skills": skills,
+            "image": project.get("image", "")
+        }
+        text = summary + (f"\nImage: {project['image']}" if project.get("image") else "")
+        # Returned for name/skill matches
+        self.match = {"text": text.strip(), "metadata": metadata}
+
+        # Returned when a keyword rule (LED, manufacturing, profile, story) picks this project
+        youtube = project.get("youtube_tutorials")
+        youtube_line = f"\nYouTube Tutorials: {', '.join(youtube)}" if youtube else ""
+        if self.type == "professional_story":
+            story = f"Project: {project.get('title', 'Professional Story')}\nIntro: {project.get('intro', '')}\n"
+            for section in project.get("sections", []):
+                story += f"\n{section.get('heading', '')}:"
+                for content in section.get("content", []):
+                    story += f"\n{content}"
+                for bullet in section.get("bullets", []):
+                    story += f"\n- {bullet}"
+            self.special_match = {
+                "text": (story + youtube_line).strip(),
+                "metadata": {
+                    "type": "professional_story",
+                    "name": project.get("title", f"Professional Story {position}"),
+                    "code_url": "",
+                    "skills": "",
+                    "image": "",
+                    "youtube_tutorials": ", ".join(project.get("youtube_tutorials", []))
+                }
+            }
+        elif self.type == "professional":
+            self.special_match = {
+                "text": (summary + youtube_line).strip(),
+                "metadata": dict(metadata, youtube_tutorials=", ".join(project.get("youtube_tutorials", [])))
+            }
+        else:
+            self.special_match = {"text": summary.strip(), "metadata": metadata}
+
+
+def _copy(match: Dict[str, Any]) -> Dict[str, Any]:
+    """Matches are handed out as copies so callers can't corrupt the index."""
+    return {"text": match["text"], "metadata": dict(match["metadata"])}
+
+
+class ProjectIndex:
+    """
+    Lookup structure for matching a question directly to projects, built once
+    when the projects are loaded.
+
+    Keyword rules resolve to projects chosen at build time, projects are
+    bucketed by type, and query words that appear in no project name are
+    rejected with one scan of the joined names. Recent results are memoized,
+    since one request looks up the same question more than once.
+    """
+
+    CACHE_SIZE = 256
+
+    def __init__(self, projects: List[Dict[str, Any]]):
+        self.entries = [IndexedProject(i, project) for i, project in enumerate(projects)]
+        self.by_type: Dict[Optional[str], List[IndexedProject]] = {}
+        for entry in self.entries:
+            self.by_type.setdefault(entry.type, []).append(entry)
+        # Query words hold no whitespace, so "word in _names" is "word in any name" in one scan
+        self._names = "\n".join(entry.name_lower for entry in self.entries)
+
+        def first(predicate) -> Optional[IndexedProject]:
+            return next((entry for entry, project in zip(self.entries, projects)
+                         if predicate(entry, project)), None)
+
+        self.led_project = first(lambda e, p: e.type == "hobby"
+                                 and LED_PROJECT_NAME in p.get("name", "").lower())
+        self.aida_project = first(lambda e, p: e.type == "electrical"
+                                  and "aida" in p.get("name", "").lower()
+                                  and "manufacturing" in " ".join(p.get("skills", [])).lower())
+        self.manufacturing_project = first(lambda e, p: e.type == "electrical"
+                                           and any("manufacturing" in skill.lower()
+                                                   for skill in p.get("skills", [])))
+        self.professional_profile = first(lambda e, p: e.type == "professional")
+        self.professional_story = first(lambda e, p: e.type == "professional_story")
+        self.youtube_story = first(lambda e, p: e.type == "professional_story"
+                                   and p.get("youtube_tutorials"))
+
+        # (question, filter_type) -> prebuilt matches, shared until copied out
+        self._cache: "OrderedDict[Tuple[str, Optional[str]], Tuple[dict, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def find_direct_matches(self, question: str, filter_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Projects a question names directly, in the same format as ChromaDB results."""
+        question_lower = question.lower().strip()
+        key = (question_lower, filter_type)
+        with self._lock:
+            found = self._cache.get(key)
+            if found is not None:
+                self._cache.move_to_end(key)
+        if found is None:
+            found = self._find(question_lower, filter_type)
+            with self._lock:
+                self._cache[key] = found
+                if len(self._cache) > self.CACHE_SIZE:
+                    self._cache.popitem(last=False)
+
+        return [_copy(match) for match in found]
+
+    def all_matches(self, filter_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Every project (of a type), e.g. as context when semantic search fails."""
+        candidates = self.entries if filter_type is None else self.by_type.get(filter_type, [])
+        return [_copy(entry.match) for entry in candidates]
+
+    def _find(self, question_lower: str, filter_type: Optional[str]) -> Tuple[dict, ...]:
+        special = self._special_match(question_lower)
+        if special is not None:
+            return (special.special_match,)
+
+        for word in QUERY_FILLER_WORDS:
+            question_lower = question_lower.replace(word, "").strip()
+
+        candidates = self.entries if filter_type is None else self.by_type.get(filter_type, [])
+        significant = [word for word in question_lower.split()
+                       if len(word) > 3 and word in self._names]
+        return tuple(
+            entry.match for entry in candidates
+            if question_lower in entry.name_lower
+            or (entry.first_word is not None and entry.first_word in question_lower)
+            or any(word in entry.name_lower for word in significant))
+
+    def _special_match(self, question_lower: str) -> Optional[IndexedProject]:
+        """Keyword rules that override name matching (regardless of filter type)."""
+        if self.led_project is not None and any(word in question_lower for word in LED_KEYWORDS):
+            print(f"[DEBUG] LED horticulture query -> {self.led_project.name_lower}")
+            return self.led_project
+        if "manufacturing" in question_lower:
+            project = self.aida_project or self.manufacturing_project
+            if project is not None:
+                print(f"[DEBUG] Manufacturing query -> {project.name_lower}")
+                return project
+        if self.professional_profile is not None and any(
+                word in question_lower for word in PROFESSIONAL_KEYWORDS):
+            print(f"[DEBUG] Professional profile query")
+            return self.professional_profile
+        if self.professional_story is not None and any(
+                word in question_lower for word in STORY_KEYWORDS):
+            print(f"[DEBUG] Professional story query")
+            return self.professional_story
+        if self.youtube_story is not None and any(
+                word in question_lower for word in YOUTUBE_KEYWORDS):
+            print(f"[DEBUG] YouTube/content query -> professional story")
+            return self.youtube_story
+        return None
+
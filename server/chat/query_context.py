@@ -0,0 +1,100 @@
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from server.chat.intent_router import IntentMatch
+from server.chat.query_intent import QueryIntent, classify_query
+
+
+_UNSET = object()
+
+
+class QueryContext:
+    """
+    One incoming message and everything derived from it.
+
+    Each field is computed on first use and at most once, then shared by
+    routing, the semantic cache, retrieval and the cached-answer checks in
+    the WebSocket route, so a message is embedded by the model only once.
+    """
+
+    def __init__(self, query: str, user_id: str = "default",
+                 encode: Optional[Callable[[str], Optional[List[float]]]] = None,
+                 route: Optional[Callable[[List[float]], Optional[IntentMatch]]] = None,
+                 embedding: Optional[List[float]] = None):
+        self.query = query
+        self.user_id = user_id
+        self.normalized = " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+        self.is_button_click = query.startswith("[BUTTON_CLICK|")
+        self.is_regenerate = "[REGENERATE]" in query
+
+        # Project matches used as LLM context, once retrieved
+        self.matches: Optional[List[Dict[str, Any]]] = None
+
+        self._encode = encode
+        self._route = route
+        self._embedding = _UNSET if embedding is None else embedding
+        self._routed = _UNSET
+        self._filter_type = _UNSET
+
+    def __repr__(self) -> str:
+        return f"QueryContext({self.query[:50]!r}, user={self.user_id!r})"
+
+    @property
+    def intent(self) -> QueryIntent:
+        """Keyword classification (memoized by classify_query)."""
+        return classify_query(self.query)
+
+    @property
+    def embedding(self) -> Optional[List[float]]:
+        """Query embedding, or None for button clicks and when the model is unavailable."""
+        if self._embedding is _UNSET:
+            self._embedding = None
+            if self._encode is not None and not self.is_button_click:
+                self._embedding = self._encode(self.query) or None
+        return self._embedding
+
+    @property
+    def routed(self) -> Optional[IntentMatch]:
+        """The intent router's decision when it is confident, else None (keywords decide)."""
+        if self._routed is _UNSET:
+            routed = None
+            if self._route is not None and self.embedding:
+                routed = self._route(self.embedding)
+            self._routed = routed if routed is not None and routed.confident else None
+        return self._routed
+
+    @property
+    def filter_type(self) -> Optional[str]:
+        if self._filter_type is _UNSET:
+            routed = self.routed
+            self._filter_type = (routed.filter_type if routed else None) or self.intent.filter_type
+        return self._filter_type
+
+    @property
+    def is_portfolio(self) -> bool:
+        """Declined only when clearly closer to the off-topic examples than to any portfolio intent."""
+        if self.routed is not None:
+            return not self.routed.off_topic
+        matching_keywords = self.intent.matching("portfolio")
+        if matching_keywords:
+            print(f"[DEBUG] Found portfolio keywords: {matching_keywords}")
+        return bool(matching_keywords)
+
+    def _is_list(self, intent: str, keyword_flag: bool) -> bool:
+        """
+        A list intent swaps the answer for a canned list, so the router only
+        overrules the keywords on it above LIST_THRESHOLD, not at the general
+        routing threshold.
+        """
+        routed = self.routed
+        if routed is not None and routed.decides_list:
+            return routed.intent == intent
+        return keyword_flag
+
+    @property
+    def is_hobby_list(self) -> bool:
+        return self._is_list("hobby_list", self.intent.hobby_list)
+
+    @property
+    def is_software_list(self) -> bool:
+        return self._is_list("software_list", self.intent.software_list)
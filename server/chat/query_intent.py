@@ -0,0 +1,256 @@
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+
+# Keyword groups a query is classified against. Phrases match whole words
+# (case-insensitive), allowing simple inflections like "design" -> "designed".
+INTENT_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    # Anything the assistant should answer instead of the off-topic reply
+    "portfolio": (
+        # General portfolio terms
+        "project", "projects", "work", "experience", "skill", "skills", "portfolio", "built", "developed", "created",
+        "technologies", "technology", "expertise", "background", "accomplishments", "achievements",
+        # Programming/Software
+        "programming", "software", "python", "javascript", "code", "coding", "github", "api", "websocket",
+        "model", "fastapi", "plotly", "pyo3", "async", "chatbot", "frontend", "library", "libraries", "app",
+        "application", "development", "web", "fullstack", "framework", "database", "algorithm", "nlp",
+        "machine learning", "tensorflow", "keras", "rust", "pydantic", "jwt", "authentication", "encryption",
+        # Electrical/Manufacturing
+        "electrical", "qa", "infrared", "tegg", "thermal", "ultrasonic", "power distribution", "voltage",
+        "inspection", "manufacturing", "press", "assembly", "retrofit", "tonnage", "metric", "aida",
+        "servo", "mechanical", "industrial", "production",
+        # Hardware/Hobbies
+        "hardware", "hobby", "hobbies", "pcb", "etching", "soldering", "prototyping", "embedded",
+        "microcontroller", "midi", "ble", "rgb", "led", "strip", "guitar", "overlay", "effects",
+        "musical", "interface", "design", "electronics", "circuit", "van", "esp32", "controller",
+        # Technical skills
+        "technical", "engineering", "architect", "implementation", "testing", "debugging",
+        "optimization", "performance", "security", "scalability",
+        # Personal/Life questions
+        "fun", "personal", "life", "about", "who", "what", "how", "when", "where", "why",
+        "story", "journey", "interests", "passion", "enjoy", "like", "love",
+        # Content creation and sharing
+        "youtube", "video", "tutorial", "tutorials", "content", "stream", "streaming", "twitch", "reddit",
+        "mentor", "teaching", "sharing", "knowledge", "educational", "content creation",
+        # Question patterns
+        "what did", "what have", "tell me about", "show me", "can you", "how did", "what projects",
+        "what work", "what experience", "what skills", "what technologies", "what tools", "what libraries",
+        "what does", "what do", "whats", "what's", "who is", "who's", "how is", "how's", "when does",
+        "where does", "why does", "tell me", "can you tell", "do you know",
+        "does he", "does she", "do they", "does ryan", "does he do", "does he have"
+    ),
+
+    # Project type filters, checked in this order (see QueryIntent.filter_type)
+    "manufacturing": (
+        "manufacturing", "press", "assembly", "retrofit", "tonnage", "metric", "aida", "servo",
+        "mechanical", "industrial", "production"
+    ),
+    "electrical": (
+        "electrical", "qa", "infrared", "tegg", "thermal", "ultrasonic", "power distribution",
+        "voltage", "inspection"
+    ),
+    "software": (
+        "programming", "software", "python", "code", "github", "api", "websocket", "model", "fastapi",
+        "plotly", "pyo3", "async", "chatbot", "frontend", "library", "libraries", "app", "application",
+        "development"
+    ),
+    "hobby": (
+        "hardware", "hobby", "hobbies", "pcb", "etching", "soldering", "prototyping", "embedded",
+        "microcontroller", "midi", "ble", "rgb", "led", "strip", "guitar", "overlay", "effects",
+        "musical", "interface", "design"
+    ),
+    "professional": (
+        "professional", "profile", "background", "experience", "career", "resume", "cv", "about you",
+        "your background", "work history", "professional experience", "skills", "expertise",
+        "qualifications"
+    ),
+    "professional_story": (
+        "story", "journey", "path", "how did you", "how did you get", "your story", "your journey",
+        "electrician coder", "bridging", "power systems and code", "mission critical", "data centers",
+        "servo press"
+    ),
+
+    # Asking for the hobby project list (arms the hobby selection state)
+    "hobby_list": (
+        "hobbies", "hobby projects", "hobby project", "personal projects", "hardware projects",
+        "electronics projects", "diy projects", "side projects", "hobby showcases", "hobby work",
+        "what hobbies", "tell me about his hobbies", "hardware work", "electronics work"
+    ),
+    # Answered with the predefined software project list
+    "software_list": (
+        "programming projects", "software projects", "code projects", "python projects",
+        "what projects has he built", "list his projects", "developer projects",
+        "programming languages", "languages", "what languages", "programming language"
+    ),
+    # Gets the "View Detailed Programming Report" button
+    "programming": (
+        "programming", "code", "python", "javascript", "typescript", "java", "rust", "go",
+        "languages", "libraries", "frameworks", "github", "repositories", "development",
+        "software", "lines of code", "functions", "classes", "commits", "projects", "coding",
+        "developer", "programming experience", "technical skills", "codebase", "programming languages"
+    ),
+    # Gets the GitHub repository statistics in the LLM context
+    "repo_context": (
+        "programming", "code", "python", "javascript", "languages", "libraries", "repositories",
+        "github", "development", "software"
+    ),
+    # Retrieves more matches
+    "broad": (
+        "programming projects", "software projects", "projects", "portfolio", "all projects",
+        "what projects", "work on", "built", "developed"
+    ),
+    # Skips cached answers: asks for something fresh, or about code (answers use live repo data)
+    "bypass_cache": (
+        "fresh", "new", "latest", "update", "recent", "current", "generate", "create", "make", "build",
+        "develop", "libraries", "programming", "python", "javascript", "code", "github",
+        "repositories", "development", "software", "languages", "frameworks", "tools", "technologies"
+    ),
+
+    # Replies while the bot waits for a hobby pick
+    "hobby_reply": (
+        "esp32", "van", "controller", "guitar", "midi", "overlay", "ble", "rgb", "strip", "pcb",
+        "mosfet", "help", "options", "list", "show"
+    ),
+    "small_talk": (
+        "hi", "hello", "hey", "thanks", "thank you", "ok", "okay", "bye", "goodbye", "cool", "nice",
+        "awesome", "great", "cancel", "nevermind", "never mind", "stop", "exit", "quit"
+    )
+}
+
+# Order in which filter groups decide the project type to search
+FILTER_TYPES = (
+    ("manufacturing", "electrical"),  # AIDA project is stored as electrical type
+    ("electrical", "electrical"),
+    ("software", "software"),
+    ("hobby", "hobby"),
+    ("professional", "professional"),
+    ("professional_story", "professional_story")
+)
+
+# Endings a keyword may carry and still match ("designed", "leds", "projects")
+INFLECTIONS = ("s", "es", "d", "ed", "ing", "er", "ers")
+
+
+def _phrase_pattern(phrase: str) -> str:
+    pattern = r"\s+".join(re.escape(word) for word in phrase.split())
+    # Two-letter words take no endings, so "hi" doesn't match "his"
+    if len(phrase.split()[-1]) > 2:
+        pattern += "(?:" + "|".join(INFLECTIONS) + ")?"
+    return pattern
+
+
+def _build_matcher():
+    """
+    One regex over every phrase, plus the groups each phrase stands for.
+
+    The regex is a lookahead at each word start that picks the longest phrase
+    there, so overlapping phrases are all seen. A phrase that contains another
+    ("tell me about" / "about") also carries the shorter phrase's groups.
+    """
+    groups: Dict[str, set] = {}
+    for group, phrases in INTENT_KEYWORDS.items():
+        for phrase in phrases:
+            groups.setdefault(" ".join(phrase.split()), set()).add(group)
+
+    phrases = sorted(groups, key=len, reverse=True)
+    patterns = {phrase: re.compile(r"\b" + _phrase_pattern(phrase) + r"\b") for phrase in phrases}
+    closure = {}
+    for phrase in phrases:
+        covered = set(groups[phrase])
+        for other in phrases:
+            if other != phrase and other[:2] in phrase and patterns[other].search(phrase):
+                covered |= groups[other]
+        closure[phrase] = frozenset(covered)
+
+    alternation = "|".join(_phrase_pattern(phrase) for phrase in phrases)
+    regex = re.compile(r"\b(?=((?:" + alternation + r"))\b)", re.IGNORECASE)
+    return regex, closure
+
+
+_MATCHER, _PHRASE_GROUPS = _build_matcher()
+
+
+def _phrase_for(text: str) -> str:
+    """The keyword a matched (possibly inflected) piece of text stands for."""
+    text = " ".join(text.split())
+    if text in _PHRASE_GROUPS:
+        return text
+    return max((text[:-len(ending)] for ending in INFLECTIONS
+                if text.endswith(ending) and text[:-len(ending)] in _PHRASE_GROUPS), key=len)
+
+
+class QueryIntent:
+    """Every keyword-based intent flag of a query, from one regex pass."""
+
+    __slots__ = ("groups", "phrases")
+
+    def __init__(self, groups: FrozenSet[str], phrases: Tuple[str, ...]):
+        self.groups = groups
+        self.phrases = phrases  # matched keywords, for debugging
+
+    def __contains__(self, group: str) -> bool:
+        return group in self.groups
+
+    def __repr__(self) -> str:
+        return f"QueryIntent(filter_type={self.filter_type!r}, groups={sorted(self.groups)})"
+
+    @property
+    def portfolio(self) -> bool:
+        return "portfolio" in self.groups
+
+    @property
+    def filter_type(self) -> Optional[str]:
+        for group, filter_type in FILTER_TYPES:
+            if group in self.groups:
+                return filter_type
+        return None
+
+    @property
+    def hobby_list(self) -> bool:
+        return "hobby_list" in self.groups
+
+    @property
+    def software_list(self) -> bool:
+        return "software_list" in self.groups
+
+    @property
+    def programming(self) -> bool:
+        return "programming" in self.groups
+
+    @property
+    def repo_context(self) -> bool:
+        return "repo_context" in self.groups
+
+    @property
+    def broad(self) -> bool:
+        return "broad" in self.groups
+
+    @property
+    def bypass_cache(self) -> bool:
+        return "bypass_cache" in self.groups
+
+    @property
+    def hobby_reply(self) -> bool:
+        return "hobby_reply" in self.groups
+
+    @property
+    def small_talk(self) -> bool:
+        return "small_talk" in self.groups
+
+    def matching(self, group: str) -> List[str]:
+        """Matched keywords that belong to a group."""
+        return [phrase for phrase in self.phrases if group in _PHRASE_GROUPS[phrase]]
+
+
+@lru_cache(maxsize=1024)
+def classify_query(query: str) -> QueryIntent:
+    """Classify a query once; the routing, retrieval and prompt code all reuse the result."""
+    groups = set()
+    phrases = []
+    for match in _MATCHER.finditer(query.lower()):
+        phrase = _phrase_for(match.group(1))
+        if phrase not in phrases:
+            phrases.append(phrase)
+            groups |= _PHRASE_GROUPS[phrase]
+    return QueryIntent(frozenset(groups), tuple(phrases))
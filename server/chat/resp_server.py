@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+from typing import Dict, Optional, Set
+
+from server.chat.broker import _read_reply
+
+
+def _bulk(data) -> bytes:
+    data = data if isinstance(data, bytes) else str(data).encode("utf-8")
+    return f"${len(data)}\r\n".encode() + data + b"\r\n"
+
+
+def _array(*items: bytes) -> bytes:
+    return f"*{len(items)}\r\n".encode() + b"".join(items)
+
+
+def _integer(value: int) -> bytes:
+    return f":{value}\r\n".encode()
+
+
+class LocalRespServer:
+    """
+    Minimal stand-in for Redis pub/sub: SUBSCRIBE, UNSUBSCRIBE, PUBLISH, PING
+    and AUTH (any password) over RESP2, enough for RedisBroker. Used to try
+    multi-worker chat without a Redis install:
+
+        python -m server.chat.resp_server --port 6379
+        CHAT_BROKER_URL=redis://localhost:6379 uvicorn ... --workers 2
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        # channel -> subscribed client writers, and each client's channels
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self.clients: Dict[asyncio.StreamWriter, Set[bytes]] = {}
+        self._handlers: Set[asyncio.Task] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """Start listening; returns the port (useful with port=0)."""
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+        self.drop_clients()
+        if self._handlers:
+            await asyncio.wait(self._handlers)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    def drop_clients(self, subscribers: bool = True, publishers: bool = True):
+        """Close client connections, like a Redis restart (or a network blip on one side)."""
+        for writer, channels in list(self.clients.items()):
+            if (subscribers and channels) or (publishers and not channels):
+                writer.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscribed = self.clients.setdefault(writer, set())
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                command = await _read_reply(reader)
+                if not isinstance(command, list) or not command:
+                    writer.write(b"-ERR Protocol error\r\n")
+                    continue
+                name, args = command[0].upper(), command[1:]
+
+                if name == b"PUBLISH" and len(args) == 2:
+                    receivers = self.channels.get(args[0], set())
+                    frame = _array(_bulk(b"message"), _bulk(args[0]), _bulk(args[1]))
+                    for receiver in list(receivers):
+                        receiver.write(frame)
+                    writer.write(_integer(len(receivers)))
+                elif name == b"SUBSCRIBE" and args:
+                    for channel in args:
+                        self.channels.setdefault(channel, set()).add(writer)
+                        subscribed.add(channel)
+                        writer.write(_array(_bulk(b"subscribe"), _bulk(channel), _integer(len(subscribed))))
+                elif name == b"UNSUBSCRIBE":
+                    for channel in args or list(subscribed):
+                        self.channels.get(channel, set()).discard(writer)
+                        subscribed.discard(channel)
+                        writer.write(_array(_bulk(b"unsubscribe"), _bulk(channel), _integer(len(subscribed))))
+                elif name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif name == b"AUTH":
+                    writer.write(b"+OK\r\n")
+                else:
+                    writer.write(f"-ERR unknown command '{name.decode(errors='replace')}'\r\n".encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            for channel in self.clients.pop(writer, ()):
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
+
+
+async def _serve_forever(host: str, port: int):
+    server = LocalRespServer(host, port)
+    await server.start()
+    print(f"📡 Local RESP pub/sub server listening on {host}:{server.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minimal Redis pub/sub stand-in for the chat broker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    options = parser.parse_args()
+    try:
+        asyncio.run(_serve_forever(options.host, options.port))
+    except KeyboardInterrupt:
+        pass
@@ -1,16 +1,24 @@
-from server.voice.synth import synthesize_to_base64
+from server.voice.synth import synthesize_to_urls_async, negotiate_formats
+from server.voice.segments import VoiceSegments
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, HTTPException, Depends
 from jose import jwt, JWTError
-from typing import List
+from typing import Dict, List, Set
 import json
 import asyncio
-import difflib
+import hashlib
+import uuid
 from pydantic import ValidationError
-from server.chat.manager import ConnectionManager
+from server.chat.manager import ConnectionManager, LOBBY_ROOM, bot_room
 from server.auth.auth import SECRET_KEY, ALGORITHM
 from server.utils.models import WsEvent, ChatMessageData, JoinData, LeaveData, ServerBroadcastData
 from server.chat.private_manager import PrivateConnectionManager
+from server.chat.broker import chat_broker
 from server.chat.bot_user import initialize_bot, get_bot
+from server.chat.scheduler import llm_scheduler
+from server.chat.singleflight import inflight_generations
+from server.chat.coalescer import coalesce_chunks
+from server.chat.connection import ClientConnection, negotiate_protocol, wants_compression
+from server.chat.query_intent import classify_query
 from server.db.db import SessionLocal
 from server.db.dbmodels import ChatHistory
 # from server.cache.client_cache import client_cache  # DISABLED
@@ -32,28 +40,79 @@ client_cache = DummyClientCache()
 
 
 router = APIRouter()
-manager = ConnectionManager()
-private_manager = PrivateConnectionManager()
+manager = ConnectionManager(chat_broker)
+private_manager = PrivateConnectionManager(chat_broker)
 
+# In-flight bot handler tasks per WebSocket connection, cancelled when that
+# connection ends. Keyed by connection, not username: a reconnect replaces the
+# old socket, and its teardown must not cancel work the new session started.
+bot_tasks: Dict[ClientConnection, Set[asyncio.Task]] = {}
 
-def calculate_similarity(text1: str, text2: str) -> float:
-    """
-    Calculate similarity between two text strings using difflib.
-    Returns a value between 0.0 (completely different) and 1.0 (identical).
-    """
-    # Normalize text for better comparison
-    text1_normalized = text1.lower().strip()
-    text2_normalized = text2.lower().strip()
 
-    # Use difflib's SequenceMatcher for similarity calculation
-    similarity = difflib.SequenceMatcher(
-        None, text1_normalized, text2_normalized).ratio()
+def _start_bot_task(connection: ClientConnection, coro):
+    """Run a bot handler in the background and track it for cancellation."""
+    task = asyncio.create_task(coro)
+    bot_tasks.setdefault(connection, set()).add(task)
+
+    def _forget(finished_task):
+        tasks = bot_tasks.get(connection)
+        if tasks is not None:
+            tasks.discard(finished_task)
+            if not tasks:
+                bot_tasks.pop(connection, None)
+
+    task.add_done_callback(_forget)
+    return task
+
+
+def _cancel_bot_tasks(connection: ClientConnection):
+    """Cancel queued or running bot work started from a connection that has ended."""
+    tasks = bot_tasks.pop(connection, set())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        print(f"🛑 Cancelled {len(tasks)} bot task(s) for {connection.username}")
+
+
+def _bot_rooms(username: str):
+    """Rooms that see the bot's answers to username: their own session plus the lobby."""
+    return (bot_room(username), LOBBY_ROOM)
+
 
-    return similarity
+def _new_message_id() -> str:
+    """Id tying a bot answer's stream, completion and audio frames together."""
+    return uuid.uuid4().hex[:12]
+
+
+def _content_hash(text: str) -> str:
+    """Short SHA-256 of the answer; clients check the text they rebuilt from chunks against it."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _bot_voice_segments(bot, manager: ConnectionManager, rooms, message_id: str = None) -> VoiceSegments:
+    """Sentence-by-sentence TTS whose ordered clips are broadcast as bot_voice events."""
+    async def send(payload: dict):
+        await manager.broadcast({
+            "event": "bot_voice",
+            "data": {"user": bot.username, "message_id": message_id, **payload}
+        }, rooms=rooms)
+    # Only encode the formats some subscribed client can play
+    return VoiceSegments(send, negotiate_formats(manager.requested_audio_formats(rooms)))
+
+
+async def _broadcast_bot_voice(bot, text: str, manager: ConnectionManager, rooms, message_id: str = None):
+    """Synthesize a finished bot response off the event loop and send the audio as its own events."""
+    voice = _bot_voice_segments(bot, manager, rooms, message_id)
+    try:
+        voice.feed(text)
+        await voice.finish()
+    finally:
+        voice.cancel()
 
 
 async def _handle_bot_button_click(bot, username: str, message: str, manager: ConnectionManager, ip_address: str = None):
     """Handle bot responses to button clicks - process gallery commands without showing text"""
+    rooms = _bot_rooms(username)
     try:
         # Get bot response to button click (usually gallery commands)
         bot_response = bot.portfolio_assistant.handle_button_click(
@@ -72,14 +131,14 @@ async def _handle_bot_button_click(bot, username: str, message: str, manager: Co
                 })
             else:
                 # If it's not gallery commands, send as regular message (e.g., error messages)
-                # Error messages should be sent to everyone for context
-                await manager.broadcast(json.dumps({
+                # to everyone following this user's bot session
+                await manager.broadcast({
                     "event": "chat_message",
                     "data": {
                         "user": bot.username,
                         "message": bot_response
                     }
-                }))
+                }, rooms=rooms)
 
     except Exception as e:
         print(f"❌ Error handling button click: {e}")
@@ -95,6 +154,8 @@ async def _handle_bot_button_click(bot, username: str, message: str, manager: Co
 
 async def _handle_bot_public_response(bot, username: str, message: str, manager: ConnectionManager, ip_address: str = None):
     """Handle bot responses to public chat messages with streaming support"""
+    # Bot output only goes to the asker's session room (and lobby watchers)
+    rooms = _bot_rooms(username)
 
     message_lower = message.lower()
 
@@ -113,33 +174,21 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                 # Only respond if the message looks like a hobby selection
                 # (number, project name, or direct hobby-related content)
                 cleaned_msg = message.strip().lower()
+                intent = classify_query(cleaned_msg)
 
-                # Check if it's a hobby selection (number 1-3, project names, or hobby-related)
+                # Check if it's a hobby selection (number 1-3, hobby project keywords or help/option requests)
                 is_hobby_selection = (
-                    # Valid number selection
-                    (cleaned_msg.isdigit() and 1 <= int(cleaned_msg) <= 3) or
-                    # Contains hobby project keywords
-                    any(word in cleaned_msg for word in [
-                        'esp32', 'van', 'controller', 'guitar', 'midi', 'overlay',
-                        'ble', 'rgb', 'strip', 'pcb', 'mosfet'
-                    ]) or
-                    # Help/option requests
-                    any(word in cleaned_msg for word in [
-                        'help', 'options', 'list', 'show'])
-                )
+                    (cleaned_msg.isdigit() and 1 <= int(cleaned_msg) <= 3) or intent.hobby_reply)
 
                 # Explicitly NOT hobby selections (common chat messages + cancel commands)
-                is_chat_message = any(word in cleaned_msg for word in [
-                    'hi', 'hello', 'hey', 'thanks', 'thank you', 'ok', 'okay',
-                    'bye', 'goodbye', 'cool', 'nice', 'awesome', 'great',
-                    'cancel', 'nevermind', 'never mind', 'stop', 'exit', 'quit'
-                ])
+                is_chat_message = intent.small_talk
 
                 # If it's clearly a chat message or not a hobby selection, clear the waiting state
                 if is_chat_message or not is_hobby_selection:
                     print(
                         f"🔄 Clearing hobby selection state for {username} - message: '{message}' (chat_message: {is_chat_message}, hobby_selection: {is_hobby_selection})")
-                    user_state["awaiting_hobby_choice"] = False
+                    bot.portfolio_assistant.update_user_state(
+                        username, awaiting_hobby_choice=False)
                     bot_should_respond = False
                 else:
                     bot_should_respond = True
@@ -149,13 +198,13 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
     if bot_should_respond:
         try:
             # Send typing indicator
-            await manager.broadcast(json.dumps({
+            await manager.broadcast({
                 "event": "bot_typing",
                 "data": {
                     "user": bot.username,
                     "typing": True
                 }
-            }))
+            }, rooms=rooms)
 
             # Add delay to make it feel more natural
             await asyncio.sleep(1.0)
@@ -173,36 +222,26 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
 
             # Check server cache (admin cache) if client cache miss
             server_cached_response = None
+            server_cached_question = None
             if not cached_response:
                 try:
-                    from server.cache.routes import load_cache_data
-                    cache_data = load_cache_data()
+                    from server.cache.store import cache_store
+                    match = await asyncio.to_thread(cache_store.lookup, cleaned_message)
 
-                    # First check for exact match
-                    if cleaned_message in cache_data:
-                        server_cached_response = cache_data[cleaned_message]
+                    if match and match[0] == cleaned_message:
+                        server_cached_question, server_cached_response, _ = match
                         print(
                             f"🎯 Server cache EXACT HIT for: {cleaned_message[:50]}...")
+                    elif match:
+                        # Fuzzy/similar match from the store's trigram index
+                        server_cached_question, server_cached_response, best_similarity = match
+                        print(
+                            f"🎯 Server cache FUZZY HIT ({best_similarity:.2f}) for: {cleaned_message[:50]}...")
+                        print(
+                            f"🎯 Matched with: {server_cached_question[:50]}...")
                     else:
-                        # Check for fuzzy/similar matches
-                        best_match = None
-                        best_similarity = 0.0
-
-                        for cached_question in cache_data.keys():
-                            similarity = calculate_similarity(
-                                cleaned_message, cached_question)
-                            if similarity > best_similarity and similarity >= 0.8:  # 80% similarity threshold
-                                best_similarity = similarity
-                                best_match = cached_question
-
-                        if best_match:
-                            server_cached_response = cache_data[best_match]
-                            print(
-                                f"🎯 Server cache FUZZY HIT ({best_similarity:.2f}) for: {cleaned_message[:50]}...")
-                            print(f"🎯 Matched with: {best_match[:50]}...")
-                        else:
-                            print(
-                                f"❌ No server cache match found for: {cleaned_message[:50]}...")
+                        print(
+                            f"❌ No server cache match found for: {cleaned_message[:50]}...")
 
                 except Exception as e:
                     print(f"❌ Error checking server cache: {e}")
@@ -220,6 +259,10 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                 print(f"🔄 Original message: '{message}'")
                 print(f"🔄 Cleaned message: '{cleaned_message}'")
 
+            # Embedding, intent and retrieval results for this message, each computed at most once
+            query_context = bot.portfolio_assistant.query_context(
+                cleaned_message, username)
+
             # Check if this would be a duplicate response (same as last response to this user)
             # Only check for duplicates if regenerate flag is not present
             would_be_duplicate = False
@@ -243,33 +286,15 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                         should_bypass_cache = True
 
             # Check for other bypass keywords (only if not already bypassing)
+            # Fresh-answer requests and programming questions (answered from live repo data)
+            intent = query_context.intent
             if not should_bypass_cache and (cached_response or server_cached_response):
-                bypass_keywords = [
-                    "fresh", "new", "latest", "update", "recent", "current",
-                    "generate", "create", "make", "build", "develop",
-                    "libraries", "programming", "python", "javascript", "code", "github",
-                    "repositories", "development", "software", "languages"
-                ]
-                matching_bypass_keywords = [
-                    keyword for keyword in bypass_keywords if keyword in cleaned_message.lower()]
-                should_bypass_cache = len(matching_bypass_keywords) > 0
-                if matching_bypass_keywords:
+                should_bypass_cache = intent.bypass_cache
+                if should_bypass_cache:
                     print(
-                        f"🔍 Found bypass keywords: {matching_bypass_keywords}")
+                        f"🔍 Found bypass keywords: {intent.matching('bypass_cache')}")
                     print(f"🔍 Bypassing cache due to programming keywords")
 
-            # Also bypass cache for any query that contains programming-related words (independent check)
-            if not should_bypass_cache:
-                programming_indicators = ["libraries", "programming", "python", "javascript", "code", "github",
-                                          "repositories", "development", "software", "languages", "frameworks", "tools", "technologies"]
-                matching_indicators = [
-                    indicator for indicator in programming_indicators if indicator in cleaned_message.lower()]
-                if matching_indicators:
-                    should_bypass_cache = True
-                    print(
-                        f"🔍 Found programming indicators: {matching_indicators}")
-                    print(f"🔍 Bypassing cache due to programming indicators in query")
-
             # Debug cache bypass logic
             print(f"🔍 Cache check for: '{cleaned_message}'")
             print(f"🔍 Client cache found: {cached_response is not None}")
@@ -291,9 +316,7 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                 elif would_be_duplicate:
                     print(f"🔍 Bypassing due to duplicate detection")
                 else:
-                    matching_keywords = [kw for kw in ["journey", "story", "professional", "background", "experience", "career",
-                                                       "how did you", "your journey", "your story", "electrician coder", "bridging"] if kw in cleaned_message.lower()]
-                    print(f"🔍 Matching bypass keywords: {matching_keywords}")
+                    print(f"🔍 Matching bypass keywords: {intent.matching('bypass_cache')}")
 
             print(
                 f"🔍 Final cache decision - should_bypass_cache: {should_bypass_cache}")
@@ -311,10 +334,8 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                     # Remove "View Images" button if no images are available
                     if "[BUTTON|view_project_images|View Images]" in response_buffer:
                         # Check if there are actually images available for this query
-                        matches = bot.portfolio_assistant.query_portfolio(
-                            cleaned_message, top_k=3)
-                        projects_with_images = bot.portfolio_assistant._extract_project_images(
-                            matches, top_n=2)
+                        projects_with_images = await asyncio.to_thread(
+                            bot.portfolio_assistant.ensure_project_images, cleaned_message, username, query_context)
                         if not projects_with_images or len(projects_with_images) == 0:
                             response_buffer = response_buffer.replace(
                                 "[BUTTON|view_project_images|View Images]", "")
@@ -345,10 +366,8 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                     # Remove "View Images" button if no images are available
                     if "[BUTTON|view_project_images|View Images]" in response_buffer:
                         # Check if there are actually images available for this query
-                        matches = bot.portfolio_assistant.query_portfolio(
-                            cleaned_message, top_k=3)
-                        projects_with_images = bot.portfolio_assistant._extract_project_images(
-                            matches, top_n=2)
+                        projects_with_images = await asyncio.to_thread(
+                            bot.portfolio_assistant.ensure_project_images, cleaned_message, username, query_context)
                         if not projects_with_images or len(projects_with_images) == 0:
                             response_buffer = response_buffer.replace(
                                 "[BUTTON|view_project_images|View Images]", "")
@@ -371,26 +390,13 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                     cache_source = "server"
                     # Increment server cache hit count
                     try:
-                        from server.cache.routes import load_cache_data, save_cache_data
-                        cache_data = load_cache_data()
-                        if cleaned_message in cache_data:
-                            cache_data[cleaned_message]["hitCount"] = cache_data[cleaned_message].get(
-                                "hitCount", 0) + 1
-                            save_cache_data(cache_data)
+                        from server.cache.store import cache_store
+                        cache_store.record_hit(server_cached_question)
                     except Exception as e:
                         print(
                             f"❌ Error incrementing server cache hit count: {e}")
 
-                # Generate TTS for cached response
-                try:
-                    voice_b64 = synthesize_to_base64(response_buffer)
-                    print(f"🎯 Generated TTS for cached response")
-                except Exception as e:
-                    print(
-                        f"❌ Failed to synthesize voice for cached response: {e}")
-                    voice_b64 = None
-
-                # Send cached response as complete message with TTS
+                # Send cached response as complete message (TTS follows separately)
                 print(
                     f"🎯 Broadcasting cached response: {response_buffer[:100]}...")
 
@@ -407,11 +413,8 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                 else:
                     # For server cache, get the model from the cache data
                     try:
-                        from server.cache.routes import load_cache_data
-                        cache_data = load_cache_data()
-                        if cleaned_message in cache_data:
-                            cached_model = cache_data[cleaned_message].get(
-                                "model", "unknown")
+                        cached_model = server_cached_response.get(
+                            "model", "unknown")
                     except Exception as e:
                         print(f"❌ Error getting cached model: {e}")
 
@@ -420,24 +423,29 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                 setattr(manager, last_response_key, response_buffer)
                 print(f"📝 Tracked response for {username}")
 
-                # Send cached response as a complete bot message with proper styling and TTS
-                await manager.broadcast(json.dumps({
+                # Send cached response as a single first-and-complete stream frame
+                message_id = _new_message_id()
+                manager.remember_bot_message(message_id, response_buffer)
+                await manager.broadcast({
                     "event": "bot_message_stream",
                     "data": {
                         "user": bot.username,
-                        "chunk": "",
+                        "chunk": response_buffer,
                         "is_first": True,
                         "is_complete": True,
-                        "full_message": response_buffer,
-                        "voice_b64": voice_b64,
+                        "message_id": message_id,
+                        "content_hash": _content_hash(response_buffer),
                         "cached": True,
                         "cache_source": cache_source,
                         "cached_model": cached_model
                     }
-                }))
+                }, rooms=rooms)
 
                 print(f"🎯 Cached response sent successfully")
 
+                # Audio for the cached response follows as bot_voice events
+                await _broadcast_bot_voice(bot, response_buffer, manager, rooms, message_id)
+
             else:
                 if should_bypass_cache:
                     print(
@@ -456,6 +464,9 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                 # Generate streaming bot response using portfolio assistant
                 response_buffer = ""
                 is_first_chunk = True
+                message_id = _new_message_id()
+                # Sentences are voiced while the rest of the answer is still streaming
+                voice = _bot_voice_segments(bot, manager, rooms, message_id)
 
                 try:
                     total_chunks = 0
@@ -465,7 +476,26 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                         f"🔄 Starting fresh response generation with bypass_predefined={should_bypass_cache}")
                     print(f"🔄 Query: '{cleaned_message}'")
 
-                    for chunk in bot.portfolio_assistant.get_response_stream(cleaned_message, username, bypass_predefined=should_bypass_cache):
+                    # Identical questions already being answered share that generation
+                    coalesce_key = bot.portfolio_assistant.coalesce_key(
+                        cleaned_message, username, should_bypass_cache)
+                    # Sharing someone else's generation means their images, not ours, were recorded
+                    joined_flight = coalesce_key is not None and inflight_generations.in_flight(
+                        coalesce_key)
+                    # Tokens are batched once per generation (every few ms / chars) before fan-out.
+                    # A shared generation is queued and fair-shared under the user who started
+                    # it; joiners ride along without using a turn of their own. It keeps that
+                    # slot until the last subscriber leaves, even if the originator disconnects.
+                    response_stream = inflight_generations.stream(
+                        coalesce_key,
+                        lambda: coalesce_chunks(llm_scheduler.stream(
+                            username,
+                            lambda: bot.portfolio_assistant.aget_response_stream(
+                                cleaned_message, username, bypass_predefined=should_bypass_cache,
+                                context=query_context)
+                        ))
+                    )
+                    async for chunk in response_stream:
                         if chunk:
                             # Check if this is a status marker
                             if chunk.startswith("[STATUS|"):
@@ -474,73 +504,63 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                                 if len(status_parts) >= 2:
                                     status_message = status_parts[1]
 
-                                    # Send status update
-                                    await manager.broadcast(json.dumps({
+                                    # Send status update (slow clients may skip stale ones,
+                                    # but never the first frame that opens the message)
+                                    await manager.broadcast({
                                         "event": "bot_message_stream",
                                         "data": {
                                             "user": bot.username,
                                             "chunk": "",
                                             "is_first": is_first_chunk,
                                             "is_complete": False,
-                                            "status": status_message
+                                            "status": status_message,
+                                            # Every frame names its answer: answers to several users
+                                            # can stream into the lobby at once
+                                            "message_id": message_id
                                         }
-                                    }))
+                                    }, kind=None if is_first_chunk else "status", rooms=rooms)
                             else:
                                 # Regular text chunk
                                 response_buffer += chunk
+                                voice.feed(chunk)
 
-                                # Send streaming chunk
-                                await manager.broadcast(json.dumps({
+                                # Send streaming chunk (mergeable for clients that fall behind)
+                                await manager.broadcast({
                                     "event": "bot_message_stream",
                                     "data": {
                                         "user": bot.username,
                                         "chunk": chunk,
                                         "is_first": is_first_chunk,
-                                        "is_complete": False
+                                        "is_complete": False,
+                                        "message_id": message_id
                                     }
-                                }))
+                                }, kind="chunk", rooms=rooms)
 
                             is_first_chunk = False
 
-                            # Small delay between chunks for better UX
-                            await asyncio.sleep(0.1)
-
-                    # Send completion signal with 100% progress
-                    await manager.broadcast(json.dumps({
+                    # Send completion signal with 100% progress. Clients already have the
+                    # text from the chunks, so only its hash goes out, not the text again
+                    manager.remember_bot_message(message_id, response_buffer)
+                    await manager.broadcast({
                         "event": "bot_message_stream",
                         "data": {
                             "user": bot.username,
                             "chunk": "",
                             "is_first": False,
                             "is_complete": True,
-                            "full_message": response_buffer,
+                            "message_id": message_id,
+                            "content_hash": _content_hash(response_buffer),
                             "progress": 100
                         }
-                    }))
-
-                    # synthesize the response to base64
-                    try:
-                        voice_b64 = synthesize_to_base64(response_buffer)
-                    except Exception as e:
-                        print(f"❌ Failed to synthesize voice: {e}")
-                        voice_b64 = None
-
-                    # Send final message + optional audio
-                    await manager.broadcast(json.dumps({
-                        "event": "bot_message_stream",
-                        "data": {
-                            "user": bot.username,
-                            "chunk": "",
-                            "is_first": False,
-                            "is_complete": True,
-                            "full_message": response_buffer,
-                            "voice_b64": voice_b64  # Base64-encoded WAV
-                        }
-                    }))
+                    }, rooms=rooms)
 
                     print(
                         f"✅ Bot response generation completed, length: {len(response_buffer)}")
 
+                    if joined_flight and "[BUTTON|view_project_images|" in response_buffer:
+                        await asyncio.to_thread(
+                            bot.portfolio_assistant.ensure_project_images, cleaned_message, username, query_context)
+
                     # Track the last response given to this user
                     last_response_key = f"last_response_{username}"
                     setattr(manager, last_response_key, response_buffer)
@@ -555,16 +575,25 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                     # )
 
                     # save the response to db
-                    bot.portfolio_assistant.save_response(
+                    await asyncio.to_thread(
+                        bot.portfolio_assistant.save_response,
                         cleaned_message, username, response_buffer, ip_address)
 
+                    # Wait for the remaining voice segments to go out
+                    await voice.finish()
+
                 except Exception as stream_error:
                     print(f"❌ Error in streaming response: {stream_error}")
                     # Fallback to complete message if streaming fails
                     try:
                         # Use the streaming method but collect all chunks
                         fallback_response = ""
-                        for chunk in bot.portfolio_assistant.get_response_stream(cleaned_message, username):
+                        fallback_stream = llm_scheduler.stream(
+                            username,
+                            lambda: bot.portfolio_assistant.aget_response_stream(
+                                cleaned_message, username, context=query_context)
+                        )
+                        async for chunk in fallback_stream:
                             if chunk and not chunk.startswith("[PROGRESS|") and not chunk.startswith("[STATUS|"):
                                 fallback_response += chunk
 
@@ -573,13 +602,13 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                         setattr(manager, last_response_key, fallback_response)
                         print(f"📝 Tracked fallback response for {username}")
 
-                        await manager.broadcast(json.dumps({
+                        await manager.broadcast({
                             "event": "chat_message",
                             "data": {
                                 "user": bot.username,
                                 "message": fallback_response
                             }
-                        }))
+                        }, rooms=rooms)
                     except Exception as fallback_error:
                         print(f"❌ Fallback also failed: {fallback_error}")
                         # Track the error fallback response
@@ -589,13 +618,16 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
                         print(
                             f"📝 Tracked error fallback response for {username}")
 
-                        await manager.broadcast(json.dumps({
+                        await manager.broadcast({
                             "event": "chat_message",
                             "data": {
                                 "user": bot.username,
                                 "message": error_message
                             }
-                        }))
+                        }, rooms=rooms)
+                finally:
+                    # No-op once finished; stops stray audio if the response was abandoned
+                    voice.cancel()
 
         except Exception as e:
             print(f"❌ Error generating bot response: {e}")
@@ -607,13 +639,13 @@ async def _handle_bot_public_response(bot, username: str, message: str, manager:
             setattr(manager, last_response_key, error_message)
             print(f"📝 Tracked main error response for {username}")
 
-            await manager.broadcast(json.dumps({
+            await manager.broadcast({
                 "event": "chat_message",
                 "data": {
                     "user": bot.username,
                     "message": error_message
                 }
-            }))
+            }, rooms=rooms)
 
 
 @router.post("/chat")
@@ -626,6 +658,12 @@ async def send_event(request: WsEvent):
             status_code=500, detail=f"Failed to send event: {str(e)}")
 
 
+@router.get("/connection-stats")
+async def get_connection_stats():
+    """Outbound queue depth, dropped/merged frames and send lag per connected client."""
+    return {"connections": manager.connection_stats()}
+
+
 @router.get("/chat-history")
 async def get_chat_history(username: str = None, limit: int = 50):
     """Get chat history from database, optionally filtered by username."""
@@ -826,8 +864,12 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
         await websocket.close(code=1008)
         return
 
-    await manager.connect(websocket, username)
-    await private_manager.connect(websocket, username)
+    # Every send to this client goes through its outbound queue, encoded
+    # as JSON text or msgpack binary frames (large ones deflated if it opted in)
+    protocol, subprotocol = negotiate_protocol(websocket)
+    connection = await manager.connect(websocket, username, protocol, subprotocol,
+                                       compress=wants_compression(websocket))
+    await private_manager.connect(connection, username)
 
     # Get client IP address for tracking
     client_ip = None
@@ -863,13 +905,13 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
                 if not isinstance(data, dict):
                     print(
                         f"⚠️ Received non-dict message from {username}: {type(data)} - {data}")
-                    await manager.send_message("Invalid message format", websocket)
+                    await manager.send_message("Invalid message format", connection)
                     continue
 
                 if msg_type is None:
                     print(
                         f"⚠️ Received message without type from {username}: {data}")
-                    await manager.send_message("Message missing type field", websocket)
+                    await manager.send_message("Message missing type field", connection)
                     continue
 
                 if msg_type == "chat_message":
@@ -895,11 +937,11 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
                     if bot and username != bot.username:
                         if is_button_click:
                             # Handle button clicks separately - don't broadcast the response as text
-                            asyncio.create_task(_handle_bot_button_click(
+                            _start_bot_task(connection, _handle_bot_button_click(
                                 bot, username, message_text, manager, client_ip))
                         else:
                             # Start bot response handling in background (don't await)
-                            asyncio.create_task(_handle_bot_public_response(
+                            _start_bot_task(connection, _handle_bot_public_response(
                                 bot, username, message_text, manager, client_ip))
 
                 elif msg_type == "pm_invite":
@@ -1013,34 +1055,70 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
                 elif msg_type == "request_pubkey":
                     target = data.get("user")
                     pubkey = private_manager.get_pubkey(target)
-                    await websocket.send_json({
+                    await connection.send_json({
                         "type": "pubkey_response",
                         "user": target,
                         "key": pubkey
                     })
 
+                elif msg_type == "room_subscribe":
+                    # Opt in/out of the lobby, which sees every user's bot answers
+                    room_data = data.get("data", {})
+                    if room_data.get("room") == LOBBY_ROOM:
+                        if room_data.get("subscribe", True):
+                            manager.join_room(username, LOBBY_ROOM)
+                        else:
+                            manager.leave_room(username, LOBBY_ROOM)
+                    continue
+
+                elif msg_type == "user_list_request":
+                    # Client missed a roster delta; resend the full list
+                    manager.send_user_list(username)
+                    continue
+
+                elif msg_type == "bot_message_request":
+                    # Text rebuilt from chunks didn't match the content hash (e.g. joined mid-stream)
+                    message_id = data.get("data", {}).get("message_id")
+                    text = manager.bot_message(message_id) if message_id else None
+                    if text is not None:
+                        await connection.send_json({
+                            "event": "bot_message_full",
+                            "data": {"message_id": message_id, "full_message": text}
+                        })
+                    continue
+
                 elif msg_type == "ping":
                     # Respond to ping with pong
-                    await websocket.send_json({"type": "pong"})
+                    await connection.send_json({"type": "pong"})
                     continue
 
                 elif msg_type == "pong":
                     # Acknowledge pong (no response needed)
                     continue
 
+                elif msg_type == "audio_formats":
+                    # Client reports which voice formats it can play, best first
+                    formats = data.get("data", {}).get("formats", [])
+                    if isinstance(formats, list):
+                        manager.set_audio_formats(username, formats)
+                        print(
+                            f"🔊 {username} voice formats: {negotiate_formats(formats)}")
+                    continue
+
                 elif msg_type == "tts_request":
                     # Handle TTS request for cached responses
                     text = data.get("data", {}).get("text", "")
                     if text:
                         try:
-                            # Synthesize the text to base64 audio
-                            voice_b64 = synthesize_to_base64(text)
+                            # Synthesize (or reuse) the clip and send its URLs
+                            voice_urls = await synthesize_to_urls_async(
+                                text, formats=negotiate_formats(manager.audio_formats.get(username)))
 
                             # Send TTS audio back to the requesting user
-                            await websocket.send_json({
+                            await connection.send_json({
                                 "type": "tts_response",
                                 "data": {
-                                    "voice_b64": voice_b64,
+                                    "voice_urls": voice_urls,
                                     "text": text
                                 }
                             })
@@ -1049,19 +1127,19 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
                         except Exception as e:
                             print(
                                 f"❌ Failed to synthesize TTS for cached response: {e}")
-                            await websocket.send_json({
+                            await connection.send_json({
                                 "type": "tts_response",
                                 "data": {
-                                    "voice_b64": None,
+                                    "voice_urls": None,
                                     "text": text,
                                     "error": "TTS synthesis failed"
                                 }
                             })
                     else:
-                        await websocket.send_json({
+                        await connection.send_json({
                             "type": "tts_response",
                             "data": {
-                                "voice_b64": None,
+                                "voice_urls": None,
                                 "text": "",
                                 "error": "No text provided for TTS"
                             }
@@ -1070,21 +1148,23 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
                 else:
                     print(
                         f"❌ Unknown message type '{msg_type}' from {username}: {data}")
-                    await manager.send_message("Unknown message type", websocket)
+                    await manager.send_message("Unknown message type", connection)
 
             except asyncio.TimeoutError:
                 # Send ping to keep connection alive
                 try:
-                    await websocket.send_json({"type": "ping"})
+                    await connection.send_json({"type": "ping"})
                 except Exception:
                     # Connection is dead, break out of the loop
                     break
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
                 # Log the specific error but don't break the connection for recoverable errors
                 print(f"⚠️ WebSocket message error for user {username}: {e}")
                 # Send error message to client
                 try:
-                    await websocket.send_json({
+                    await connection.send_json({
                         "type": "error",
                         "message": "Message processing error, please try again"
                     })
@@ -1094,14 +1174,11 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(...)):
 
     except WebSocketDisconnect:
         print(f"🔌 WebSocket disconnected for user {username}")
-        manager.disconnect(username)
-        private_manager.disconnect(username)
-        # Broadcast updated user list to all remaining users
-        await manager.broadcast_user_list()
     except Exception as e:
         # Handle any other exceptions that might occur
         print(f"❌ WebSocket error for user {username}: {e}")
-        manager.disconnect(username)
-        private_manager.disconnect(username)
-        # Broadcast updated user list to all remaining users
-        await manager.broadcast_user_list()
+    finally:
+        # However the loop ended, drop the connection and its queued or running bot work
+        manager.disconnect(username, connection)
+        private_manager.disconnect(username, connection)
+        _cancel_bot_tasks(connection)
@@ -0,0 +1,154 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Callable, Deque
+
+from server.chat.portfolio_assistant import OLLAMA_CONFIG
+
+
+class _Ticket:
+    """A queued request for a generation slot."""
+
+    __slots__ = ("username", "granted")
+
+    def __init__(self, username: str):
+        self.username = username
+        self.granted = asyncio.get_running_loop().create_future()
+
+
+class LLMScheduler:
+    """
+    Bounds the number of in-flight LLM generations.
+
+    Waiting requests are queued per username and served round-robin across
+    users (FIFO within a user), so one visitor firing off several questions
+    can't starve everyone else.
+
+    Accounting is per originator: a generation shared through SingleFlight
+    counts only against the user who started it, not the users who joined.
+    Queuing shared generations under a neutral key instead would give a user
+    an extra round-robin turn for every distinct question they ask.
+    """
+
+    def __init__(self, max_concurrent: int = 1):
+        self.max_concurrent = max(1, max_concurrent)
+        self._active = 0
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._changed = asyncio.Event()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _notify(self):
+        """Wake everyone waiting on a queue change."""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _service_order(self) -> list:
+        """Tickets in the order they will be granted (round-robin by user)."""
+        order = []
+        queues = [list(q) for q in self._queues.values()]
+        depth = 0
+        while True:
+            added = False
+            for q in queues:
+                if depth < len(q):
+                    order.append(q[depth])
+                    added = True
+            if not added:
+                return order
+            depth += 1
+
+    def position(self, ticket: _Ticket) -> int:
+        """1-based queue position of a waiting ticket (0 once granted)."""
+        if ticket.granted.done():
+            return 0
+        for i, queued in enumerate(self._service_order(), 1):
+            if queued is ticket:
+                return i
+        return 0
+
+    def _dispatch(self):
+        """Hand free slots to the next users in line."""
+        dispatched = False
+        while self._active < self.max_concurrent and self._queues:
+            username, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            # Rotate this user to the back so other users get the next slot
+            del self._queues[username]
+            if queue:
+                self._queues[username] = queue
+            if ticket.granted.done():
+                continue
+            self._active += 1
+            ticket.granted.set_result(True)
+            dispatched = True
+        if dispatched:
+            self._notify()
+
+    def _enqueue(self, username: str) -> _Ticket:
+        ticket = _Ticket(username)
+        if self._active < self.max_concurrent and not self._queues:
+            self._active += 1
+            ticket.granted.set_result(True)
+            return ticket
+        self._queues.setdefault(username, deque()).append(ticket)
+        self._notify()
+        return ticket
+
+    def _abandon(self, ticket: _Ticket):
+        """Drop a ticket that is no longer wanted (cancelled or finished)."""
+        if ticket.granted.done() and not ticket.granted.cancelled():
+            # Ticket held a slot - release it
+            self._active -= 1
+        else:
+            ticket.granted.cancel()
+            queue = self._queues.get(ticket.username)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket.username]
+        self._dispatch()
+        self._notify()
+
+    async def stream(self, username: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Wait for a generation slot, then relay the stream produced by factory.
+
+        While queued, yields [STATUS|...] markers with the current queue position.
+        Cancelling the consumer (e.g. on client disconnect) frees the slot or
+        removes the request from the queue.
+        """
+        ticket = self._enqueue(username)
+        try:
+            last_position = None
+            while not ticket.granted.done():
+                position = self.position(ticket)
+                if position != last_position:
+                    last_position = position
+                    print(
+                        f"⏳ {username} queued for LLM at position {position} ({self._active} active)")
+                    yield f"[STATUS|Queued - position {position} in line...]"
+                changed = self._changed
+                waiter = asyncio.ensure_future(changed.wait())
+                try:
+                    await asyncio.wait({ticket.granted, waiter},
+                                       return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    waiter.cancel()
+
+            if last_position is not None:
+                yield "[STATUS|Your turn - starting generation...]"
+
+            async for chunk in factory():
+                yield chunk
+        finally:
+            self._abandon(ticket)
+
+
+# Global scheduler shared by all chat connections in this process
+llm_scheduler = LLMScheduler(OLLAMA_CONFIG["MAX_CONCURRENT_GENERATIONS"])
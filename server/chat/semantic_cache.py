@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on query embeddings.
+
+    Stored queries live in one preallocated float32 matrix of unit vectors, so
+    a lookup is a single matrix-vector product. Entries expire after ttl
+    seconds, the least recently used entry is evicted when the matrix is full,
+    and everything is dropped when the portfolio data hash changes.
+    """
+
+    def __init__(self, capacity: int = 256, threshold: float = 0.92, ttl: float = 3600):
+        self.capacity = max(1, capacity)
+        self.threshold = threshold
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._valid = np.zeros(self.capacity, dtype=bool)
+        self._created = np.zeros(self.capacity, dtype=np.float64)
+        self._last_used = np.zeros(self.capacity, dtype=np.float64)
+        self._filters: List[Optional[str]] = [None] * self.capacity
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self._corpus_hash: Optional[str] = None
+
+    def __len__(self) -> int:
+        return int(self._valid.sum())
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._valid[:] = False
+        self._filters = [None] * self.capacity
+        self._entries = [None] * self.capacity
+
+    def _check_corpus(self, corpus_hash: str):
+        if corpus_hash != self._corpus_hash:
+            if self._corpus_hash is not None and self._valid.any():
+                print("🧹 Portfolio data changed, clearing semantic answer cache")
+            self._clear()
+            self._corpus_hash = corpus_hash
+
+    def _expire(self, now: float):
+        expired = self._valid & (now - self._created > self.ttl)
+        if expired.any():
+            for slot in np.flatnonzero(expired):
+                self._entries[slot] = None
+            self._valid[expired] = False
+
+    def _best_slot(self, vector: np.ndarray, filter_type: Optional[str]):
+        if self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+            return None, 0.0
+        mask = self._valid & np.fromiter(
+            (f == filter_type for f in self._filters), dtype=bool, count=self.capacity)
+        if not mask.any():
+            return None, 0.0
+        scores = self._vectors @ vector
+        scores[~mask] = -1.0
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def lookup(self, embedding, filter_type: Optional[str], corpus_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for a paraphrase of a stored query, if any."""
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_corpus(corpus_hash)
+            self._expire(now)
+            slot, score = self._best_slot(vector, filter_type)
+            if slot is None or score < self.threshold:
+                return None
+            self._last_used[slot] = now
+            entry = dict(self._entries[slot])
+        entry["similarity"] = score
+        return entry
+
+    def store(self, embedding, filter_type: Optional[str], corpus_hash: str, **entry):
+        """Cache an answer, replacing a near-identical stored query or the LRU entry."""
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_corpus(corpus_hash)
+            self._expire(now)
+            if self._vectors is None or vector.shape[0] != self._vectors.shape[1]:
+                self._vectors = np.zeros(
+                    (self.capacity, vector.shape[0]), dtype=np.float32)
+                self._clear()
+
+            slot, score = self._best_slot(vector, filter_type)
+            if slot is None or score < self.threshold:
+                free = np.flatnonzero(~self._valid)
+                if len(free):
+                    slot = int(free[0])
+                else:
+                    slot = int(np.argmin(self._last_used))
+
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._filters[slot] = filter_type
+            self._entries[slot] = entry
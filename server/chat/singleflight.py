@@ -0,0 +1,99 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+
+class _Flight:
+    """One running generation and the chunks it has produced so far."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        await self._changed.wait()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent generations.
+
+    The first caller for a key starts the stream in a background task; later
+    callers with the same key subscribe to it instead of starting another one.
+    Each subscriber gets the text produced so far followed by the live chunks.
+    The generation is cancelled once every subscriber has gone away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    async def stream(self, key: Optional[Hashable], factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Relay the stream for key, starting it with factory if nobody else is."""
+        if key is None:
+            async for chunk in factory():
+                yield chunk
+            return
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._pump(key, flight, factory))
+        else:
+            print(
+                f"🔗 Coalescing with in-flight generation for: {str(key[0] if isinstance(key, tuple) else key)[:50]}...")
+
+        flight.subscribers += 1
+        # Late subscribers only need the text so far, not stale status markers
+        joined_at = len(flight.chunks)
+        index = 0
+        try:
+            while True:
+                while index < len(flight.chunks):
+                    chunk = flight.chunks[index]
+                    index += 1
+                    if index <= joined_at and chunk.startswith("[STATUS|"):
+                        continue
+                    yield chunk
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                flight.task.cancel()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    async def _pump(self, key: Hashable, flight: _Flight, factory: Callable[[], AsyncIterator[str]]):
+        """Drive the shared stream and publish its chunks to subscribers."""
+        try:
+            async for chunk in factory():
+                flight.chunks.append(chunk)
+                flight.notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Shared generation failed: {e}")
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.notify()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+
+# Global registry of in-flight bot generations
+inflight_generations = SingleFlight()
@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+
+# Per-user conversation state (hobby selection, last project images)
+USER_STATE_CONFIG = {
+    # "memory" (per process) or "sqlite" (survives restarts, shared by workers)
+    "BACKEND": os.getenv("USER_STATE_BACKEND", "memory").lower(),
+
+    "SQLITE_PATH": os.getenv("USER_STATE_DB", ".portfolio_cache/user_state.db"),
+
+    # Seconds of inactivity before a user's state is forgotten
+    "TTL": float(os.getenv("USER_STATE_TTL", "86400")),
+
+    # Max users kept by the in-memory backend (least recently used are evicted)
+    "MAX_USERS": int(os.getenv("USER_STATE_MAX_USERS", "10000"))
+}
+
+
+def _encode(state: dict) -> str:
+    return json.dumps(state, separators=(",", ":"), ensure_ascii=False)
+
+
+class UserStateStore(ABC):
+    """
+    Where PortfolioAssistant keeps per-user state between messages.
+
+    get() returns a private copy; callers write changes back with set().
+    Entries expire after ttl seconds without a write.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, user_id: str) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    def set(self, user_id: str, state: dict):
+        pass
+
+    @abstractmethod
+    def delete(self, user_id: str):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+
+class MemoryUserStateStore(UserStateStore):
+    """Bounded LRU of JSON-encoded states, local to this process."""
+
+    def __init__(self, ttl: float, max_users: int):
+        super().__init__(ttl)
+        self.max_users = max(1, max_users)
+        self._lock = threading.Lock()
+        self._states: "OrderedDict[str, tuple]" = OrderedDict()  # user_id -> (updated_at, json)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            item = self._states.get(user_id)
+            if item is None:
+                return None
+            if time.time() - item[0] > self.ttl:
+                del self._states[user_id]
+                return None
+            self._states.move_to_end(user_id)
+        return json.loads(item[1])
+
+    def set(self, user_id: str, state: dict):
+        encoded = _encode(state)
+        with self._lock:
+            self._states[user_id] = (time.time(), encoded)
+            self._states.move_to_end(user_id)
+            while len(self._states) > self.max_users:
+                self._states.popitem(last=False)
+
+    def delete(self, user_id: str):
+        with self._lock:
+            self._states.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+
+class SQLiteUserStateStore(UserStateStore):
+    """
+    States in a small SQLite table (WAL mode), so they survive restarts and
+    every uvicorn worker on the machine sees the same state.
+    """
+
+    # Purge expired rows every this many writes
+    _PURGE_EVERY = 500
+
+    def __init__(self, path: str, ttl: float):
+        super().__init__(ttl)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS user_state ("
+            "user_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)")
+        self._db.commit()
+        self._writes = 0
+        self._purge()
+
+    def get(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM user_state WHERE user_id = ? AND updated_at >= ?",
+                (user_id, time.time() - self.ttl)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, user_id: str, state: dict):
+        encoded = _encode(state)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO user_state (user_id, state, updated_at) VALUES (?, ?, ?)",
+                (user_id, encoded, time.time()))
+            self._db.commit()
+            self._writes += 1
+            purge = self._writes % self._PURGE_EVERY == 0
+        if purge:
+            self._purge()
+
+    def delete(self, user_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM user_state WHERE user_id = ?", (user_id,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM user_state")
+            self._db.commit()
+
+    def _purge(self):
+        with self._lock:
+            deleted = self._db.execute(
+                "DELETE FROM user_state WHERE updated_at < ?",
+                (time.time() - self.ttl,)).rowcount
+            self._db.commit()
+        if deleted:
+            print(f"🧹 Purged {deleted} expired user state(s)")
+
+
+def create_user_state_store() -> UserStateStore:
+    backend = USER_STATE_CONFIG["BACKEND"]
+    if backend == "sqlite":
+        print(f"🗄️ User state stored in {USER_STATE_CONFIG['SQLITE_PATH']}")
+        return SQLiteUserStateStore(USER_STATE_CONFIG["SQLITE_PATH"], USER_STATE_CONFIG["TTL"])
+    if backend != "memory":
+        print(f"⚠️ Unknown USER_STATE_BACKEND '{backend}', using memory")
+    return MemoryUserStateStore(USER_STATE_CONFIG["TTL"], USER_STATE_CONFIG["MAX_USERS"])
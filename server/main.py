@@ -13,9 +13,12 @@ from pathlib import Path
 from server.utils.template_engine import templates
 from server.db.db import init_db
 from server.auth.routes import router as auth_router
-from server.chat.routes import router as chat_router
+from server.chat.routes import router as chat_router, manager as chat_manager
+from server.chat.broker import chat_broker
 from server.pages.routes import router as pages_router
 from server.cache.routes import router as cache_router
+from server.chat.portfolio_assistant import PortfolioAssistant
+from server.cache.store import cache_store
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -60,6 +63,27 @@ app.templates = templates
 DATA_PATH = Path("data.json")
 
 
+@app.on_event("startup")
+async def start_chat_broker():
+    await chat_broker.start()
+
+
+@app.on_event("shutdown")
+async def stop_chat_broker():
+    chat_manager.detach()
+    await chat_broker.close()
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await PortfolioAssistant.close_http_client()
+
+
+@app.on_event("shutdown")
+async def flush_cache_store():
+    await cache_store.aclose()
+
+
 @app.get("/form", response_class=HTMLResponse)
 async def get_form(request: Request):
     return templates.TemplateResponse("form.html", {"request": request})
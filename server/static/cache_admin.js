@@ -742,7 +742,7 @@ async function toggleTTS(question) {
 
     if (data.success) {
       // Create audio element and play the TTS
-      currentAudio = new Audio(`data:audio/wav;base64,${data.data.audio}`);
+      currentAudio = new Audio(data.data.audio_url);
       currentQuestion = question;
 
       // Update button to show stop state
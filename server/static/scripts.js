@@ -8,6 +8,9 @@ const WS_CONFIG = {
   MAX_RECONNECT_DELAY: 30000, // Max 30 seconds
   PING_INTERVAL: 30000, // Send ping every 30 seconds
   PONG_TIMEOUT: 10000, // Wait 10 seconds for pong response
+  WATCH_ALL_BOT_ANSWERS: false, // Join the lobby to also see the bot's answers to other users
+  PROTOCOL: 'json', // 'msgpack' asks the server for smaller binary frames (falls back to JSON)
+  COMPRESS: true, // Let the server deflate large frames (needs DecompressionStream)
 };
 
 // State management
@@ -22,6 +25,10 @@ let isAudioEnabled = true; // Audio toggle state
 let audioVolume = 0.5; // Volume level (0.0 to 1.0)
 let audioPlaybackRate = 1.3; // Playback speed (0.5x to 2.0x)
 let currentAudio = null; // Currently playing audio element
+let voiceQueue = []; // Bot voice segments waiting to play, in order
+let voiceSegments = []; // All voice segments of the latest bot response (for replay)
+let onlineUsers = []; // Usernames currently online (kept in sync by user_list / user_list_delta)
+let rosterVersion = -1; // Version of onlineUsers; a gap means we missed a delta
 let userHasInteracted = false; // Track if user has interacted (required for iOS audio)
 let pendingAudio = null; // Audio waiting to be played after user interaction
 
@@ -32,6 +39,7 @@ let pingTimer = null;
 let pongTimer = null;
 let isReconnecting = false;
 let lastPongTime = Date.now();
+let compressedFrames = false; // Binary frames start with a plain/deflate flag byte
 
 // Background settings
 const backgroundSettings = {
@@ -322,21 +330,35 @@ const messageHandler = {
     utils.scrollToBottom(container);
   },
 
-  handleStreamingChunk: (container, user, chunk, isFirst) => {
-    let streamingMessage = container.querySelector('#streaming-message');
+  // The bot message being streamed for an answer. Several answers can stream at
+  // once (the lobby sees everyone's), so frames are matched by their message id
+  findStreamingMessage: (container, messageId) => {
+    if (messageId) {
+      return container.querySelector(
+        `.message.bot.streaming[data-message-id="${CSS.escape(messageId)}"]`);
+    }
+    const streaming = container.querySelectorAll('.message.bot.streaming');
+    return streaming[streaming.length - 1] || null;
+  },
+
+  handleStreamingChunk: (container, user, chunk, isFirst, messageId) => {
+    let streamingMessage = messageHandler.findStreamingMessage(container, messageId);
 
-    if (isFirst || !streamingMessage) {
+    if (isFirst) {
       // Reset TTS data for new response
       currentResponseTTS = null;
-
+    }
+    if (!streamingMessage || (isFirst && !messageId)) {
       streamingMessage = document.createElement('div');
       streamingMessage.className = 'message bot streaming';
-      streamingMessage.id = 'streaming-message';
       streamingMessage.innerHTML = `
         <span class="user-name">${user}</span>
         <span class="message-text"></span>
         <span class="cursor-blink">|</span>
       `;
+      if (messageId) {
+        streamingMessage.dataset.messageId = messageId;
+      }
       container.appendChild(streamingMessage);
     }
 
@@ -347,69 +369,74 @@ const messageHandler = {
     utils.scrollToBottom(container);
   },
 
-  completeStreamingMessage: (container, user) => {
-    const streamingMessage = container.querySelector('#streaming-message');
-    if (streamingMessage) {
-      const messageText = streamingMessage.querySelector('.message-text');
-      if (messageText) {
-        let content = messageText.textContent;
-
-        // Handle gallery commands
-        const galleryMatch = content.match(/\[GALLERY_SHOW\|(.*?)\|([^|]+)\]/);
-        if (galleryMatch) {
-          const [fullMatch, imagesStr, title] = galleryMatch;
-          const images = imagesStr.includes('||')
-            ? imagesStr.split('||').map((img) => img.trim())
-            : [imagesStr.trim()];
-
-          // Only show gallery if we have valid images
-          if (images.length > 0 && images[0].trim() !== '') {
-            ImageGalleryController.showGallery(images, title);
-            content =
-              content.replace(fullMatch, '').trim() ||
-              `📸 Showing ${images.length} image${images.length > 1 ? 's' : ''} for ${title}`;
-          } else {
-            // Remove the gallery command if no valid images
-            content = content.replace(fullMatch, '').trim();
-          }
-        }
+  // Turn a bot message's raw text (gallery, YouTube and button commands) into its final HTML
+  renderBotText: (messageText) => {
+    let content = messageText.textContent;
 
-        // Handle YouTube gallery commands
-        content = content.replace(/\[YOUTUBE_SHOW\|(.*?)\|([^|]+)\]/g, (_, videosStr, title) => {
-          const videos = videosStr.includes('||')
-            ? videosStr.split('||').map((video) => video.trim())
-            : [videosStr.trim()];
-
-          // Only create button if we have valid videos
-          if (videos.length > 0 && videos[0].trim() !== '') {
-            // Use base64 encoding to avoid JSON corruption from linkifyUrls
-            const vidsJson = btoa(JSON.stringify(videos));
-
-            const buttonId = `youtube-gallery-${Date.now()}`;
-
-            return `<button 
-                class="chat-button youtube-gallery-btn" 
-                data-videos='${vidsJson}' 
-                data-title='${title.replace(/'/g, '&#39;')}'
-                data-button-id='${buttonId}'
-              >
-                🎥 View ${videos.length} YouTube Video${videos.length > 1 ? 's' : ''} for ${title}
-              </button>`;
-          } else {
-            // Return empty string if no valid videos
-            return '';
-          }
-        });
+    // Handle gallery commands
+    const galleryMatch = content.match(/\[GALLERY_SHOW\|(.*?)\|([^|]+)\]/);
+    if (galleryMatch) {
+      const [fullMatch, imagesStr, title] = galleryMatch;
+      const images = imagesStr.includes('||')
+        ? imagesStr.split('||').map((img) => img.trim())
+        : [imagesStr.trim()];
 
-        // Linkify URLs after creating buttons
-        content = utils.linkifyUrls(content);
+      // Only show gallery if we have valid images
+      if (images.length > 0 && images[0].trim() !== '') {
+        ImageGalleryController.showGallery(images, title);
+        content =
+          content.replace(fullMatch, '').trim() ||
+          `📸 Showing ${images.length} image${images.length > 1 ? 's' : ''} for ${title}`;
+      } else {
+        // Remove the gallery command if no valid images
+        content = content.replace(fullMatch, '').trim();
+      }
+    }
 
-        // Handle button commands
-        content = content.replace(
-          /\[BUTTON\|([^|]+)\|([^|]+)\]/g,
-          '<button class="chat-button" onclick="sendButtonClick(\'$1\', \'$2\')">$2</button>'
-        );
-        messageText.innerHTML = content;
+    // Handle YouTube gallery commands
+    content = content.replace(/\[YOUTUBE_SHOW\|(.*?)\|([^|]+)\]/g, (_, videosStr, title) => {
+      const videos = videosStr.includes('||')
+        ? videosStr.split('||').map((video) => video.trim())
+        : [videosStr.trim()];
+
+      // Only create button if we have valid videos
+      if (videos.length > 0 && videos[0].trim() !== '') {
+        // Use base64 encoding to avoid JSON corruption from linkifyUrls
+        const vidsJson = btoa(JSON.stringify(videos));
+
+        const buttonId = `youtube-gallery-${Date.now()}`;
+
+        return `<button 
+            class="chat-button youtube-gallery-btn" 
+            data-videos='${vidsJson}' 
+            data-title='${title.replace(/'/g, '&#39;')}'
+            data-button-id='${buttonId}'
+          >
+            🎥 View ${videos.length} YouTube Video${videos.length > 1 ? 's' : ''} for ${title}
+          </button>`;
+      } else {
+        // Return empty string if no valid videos
+        return '';
+      }
+    });
+
+    // Linkify URLs after creating buttons
+    content = utils.linkifyUrls(content);
+
+    // Handle button commands
+    content = content.replace(
+      /\[BUTTON\|([^|]+)\|([^|]+)\]/g,
+      '<button class="chat-button" onclick="sendButtonClick(\'$1\', \'$2\')">$2</button>'
+    );
+    messageText.innerHTML = content;
+  },
+
+  completeStreamingMessage: (container, user, messageId) => {
+    const streamingMessage = messageHandler.findStreamingMessage(container, messageId);
+    if (streamingMessage) {
+      const messageText = streamingMessage.querySelector('.message-text');
+      if (messageText) {
+        messageHandler.renderBotText(messageText);
       }
 
       const cursor = streamingMessage.querySelector('.cursor-blink');
@@ -420,7 +447,6 @@ const messageHandler = {
       if (statusIndicator) statusIndicator.remove();
 
       streamingMessage.classList.remove('streaming');
-      streamingMessage.removeAttribute('id');
     } else {
       // Fallback for cached responses that don't have a streaming message
       // This handles the case where we receive a complete message without streaming context
@@ -428,8 +454,8 @@ const messageHandler = {
     }
   },
 
-  updateStreamingStatus: (container, statusMessage) => {
-    const streamingMessage = container.querySelector('#streaming-message');
+  updateStreamingStatus: (container, statusMessage, messageId) => {
+    const streamingMessage = messageHandler.findStreamingMessage(container, messageId);
     if (!streamingMessage) {
       return;
     }
@@ -451,6 +477,46 @@ const messageHandler = {
   },
 };
 
+// Rebuild the online users panel
+function renderUserList(users) {
+  if (!elements.onlineUsers) return;
+  elements.onlineUsers.innerHTML = '';
+
+  users
+    .filter((user) => user !== currentUsername)
+    .forEach((user, index) => {
+      const li = document.createElement('li');
+      li.className = 'online-user';
+
+      // Check if PM tab already exists for this user
+      const existingTab = document.getElementById(`pm-tab-${user}`);
+      const hasPmChat = existingTab !== null;
+
+      const isEncryptionAvailable = utils.isCryptoAvailable();
+      const pmDisabled = hasPmChat || !isEncryptionAvailable;
+      const pmTitle = hasPmChat
+        ? 'PM chat already open'
+        : !isEncryptionAvailable
+        ? 'Private messages require HTTPS or localhost'
+        : 'Send PM invite';
+
+      // Store the backend username as a data attribute for PM functionality
+      li.innerHTML = `
+      <span class="user-name" data-backend-username="${user}">${user}</span>
+      <button class="pm-button ${pmDisabled ? 'disabled' : ''}" 
+              onclick="${pmDisabled ? 'return false;' : `sendPmInvite('${user}')`}" 
+              ${pmDisabled ? 'disabled' : ''}
+              title="${pmTitle}">
+        ${hasPmChat ? '✓' : !isEncryptionAvailable ? '🔒' : 'PM'}
+      </button>
+    `;
+      if (!isPanelHidden) {
+        li.style.animationDelay = `${0.4 + index * 0.1}s`;
+      }
+      elements.onlineUsers.appendChild(li);
+    });
+}
+
 // WebSocket message handlers
 const socketHandlers = {
   chat_message: (data) => {
@@ -470,76 +536,9 @@ const socketHandlers = {
 
   tts_response: (data) => {
     // Handle TTS response for cached responses
-    if (data.voice_b64 && isAudioEnabled) {
-      // Stop any currently playing audio
-      if (currentAudio) {
-        currentAudio.pause();
-        currentAudio.currentTime = 0;
-      }
-
-      // Detect iOS Safari
-      const isIOS = /iPad|iPhone|iPod/.test(navigator.userAgent) && !window.MSStream;
-      const isSafari = /^((?!chrome|android).)*safari/i.test(navigator.userAgent);
-      const isIOSSafari = isIOS && isSafari;
-
-      let audio;
-
-      if (isIOSSafari) {
-        // iOS Safari: Use Blob URL approach
-        try {
-          const binary = atob(data.voice_b64);
-          const array = new Uint8Array(binary.length);
-          for (let i = 0; i < binary.length; i++) {
-            array[i] = binary.charCodeAt(i);
-          }
-          const blob = new Blob([array], { type: 'audio/wav' });
-          const blobUrl = URL.createObjectURL(blob);
-
-          audio = new Audio(blobUrl);
-
-          // Clean up blob URL when audio ends or errors
-          audio.addEventListener('ended', () => {
-            URL.revokeObjectURL(blobUrl);
-            currentAudio = null;
-          });
-
-          audio.addEventListener('error', () => {
-            URL.revokeObjectURL(blobUrl);
-            currentAudio = null;
-          });
-        } catch (blobErr) {
-          console.error('🔧 Blob creation failed, falling back to Data URI:', blobErr);
-          audio = new Audio('data:audio/wav;base64,' + data.voice_b64);
-        }
-      } else {
-        // Non-iOS: Use Data URI approach
-        audio = new Audio('data:audio/wav;base64,' + data.voice_b64);
-      }
-
-      // Set audio properties
-      audio.volume = audioVolume;
-      audio.playbackRate = audioPlaybackRate;
-      audio.preload = 'auto';
-      currentAudio = audio;
-
-      // Play audio with iOS workaround
-      const playAudio = async () => {
-        try {
-          await audio.play();
-        } catch (err) {
-          console.error('🔇 TTS play failed:', err);
-
-          // iOS Safari workaround: Add play button
-          if (isIOSSafari) {
-            addPlayAudioButton(audio, data.voice_b64);
-          }
-        }
-      };
-
-      playAudio();
-
-      // Add replay button to the last cached response message
-      addTTSReplayButtonToCachedResponse(data.voice_b64);
+    const voice = pickVoice(data);
+    if (voice && isAudioEnabled) {
+      playVoice(voice);
     } else if (data.error) {
       console.error('❌ TTS error for cached response:', data.error);
     }
@@ -553,29 +552,29 @@ const socketHandlers = {
     }
 
     if (!data.is_complete) {
-      messageHandler.handleStreamingChunk(elements.messages, data.user, data.chunk, data.is_first);
+      messageHandler.handleStreamingChunk(
+        elements.messages, data.user, data.chunk, data.is_first, data.message_id);
 
       // Update status indicator if available
       if (data.status !== undefined) {
-        messageHandler.updateStreamingStatus(elements.messages, data.status);
+        messageHandler.updateStreamingStatus(elements.messages, data.status, data.message_id);
       }
     } else {
-      messageHandler.completeStreamingMessage(elements.messages, data.user);
-
-      // If there was no streaming message to complete, create a new message for cached responses
-      if (data.cached && data.full_message) {
-        const existingMessage = elements.messages.querySelector('.message.bot:last-child');
-        if (!existingMessage || !existingMessage.querySelector('.message-text')) {
-          console.log('🔧 Creating new message for cached response');
-          messageHandler.addMessage(elements.messages, data.user, data.full_message, 'bot');
-        }
+      // Cached answers arrive whole, as one frame that both opens and completes the message
+      if (data.chunk) {
+        messageHandler.handleStreamingChunk(
+          elements.messages, data.user, data.chunk, data.is_first, data.message_id);
       }
 
-      // Debug: Log all incoming data to understand the structure
-
-      // Cache the complete response if we have the full message
+      // The text is rebuilt from the chunks; the completion frame only carries its hash
+      const streamingMessage = messageHandler.findStreamingMessage(elements.messages, data.message_id);
+      const rebuiltText = streamingMessage?.querySelector('.message-text')?.textContent ?? '';
+      messageHandler.completeStreamingMessage(elements.messages, data.user, data.message_id);
+      if (streamingMessage && data.message_id && data.content_hash) {
+        verifyBotMessage(data.message_id, rebuiltText, data.content_hash);
+      }
 
-      if (data.full_message && data.is_complete) {
+      if (streamingMessage) {
         // Try to find the original question from recent messages
         const recentMessages = Array.from(elements.messages.children)
           .filter((msg) => msg.classList.contains('message') && !msg.classList.contains('bot'))
@@ -592,174 +591,88 @@ const socketHandlers = {
           const cleanQuestion = question.replace(/@bot\s*/i, '').trim();
 
           // Cache system removed - no more local storage caching
-          // Add timestamp to response
-          const lastBotMessage = Array.from(elements.messages.children)
-            .filter((msg) => msg.classList.contains('message') && msg.classList.contains('bot'))
-            .pop();
-
-          if (lastBotMessage && !lastBotMessage.querySelector('.generated-timestamp')) {
+          // Add timestamp to the response that just completed
+          if (!streamingMessage.querySelector('.generated-timestamp')) {
             // Check if this is a cached response
             const isCached = data.cached === true;
             const cachedModel = data.cached_model || null;
-            addGeneratedTimestamp(lastBotMessage, currentResponseTTS, isCached, cachedModel);
+            addGeneratedTimestamp(streamingMessage, currentResponseTTS, isCached, cachedModel);
             // Reset TTS data after using it
             currentResponseTTS = null;
           }
         } else {
         }
       }
+    }
+  },
 
-      // ✅ Store TTS data for timestamp replay button
-      if (data.voice_b64) {
-        currentResponseTTS = data.voice_b64;
-      }
-
-      // ✅ Play TTS audio if provided and audio is enabled
-      if (data.voice_b64 && isAudioEnabled) {
-        // Stop any currently playing audio
-        if (currentAudio) {
-          currentAudio.pause();
-          currentAudio.currentTime = 0;
-        }
-
-        // Detect iOS Safari
-        const isIOS = /iPad|iPhone|iPod/.test(navigator.userAgent) && !window.MSStream;
-        const isSafari = /^((?!chrome|android).)*safari/i.test(navigator.userAgent);
-        const isIOSSafari = isIOS && isSafari;
-
-        let audio;
-
-        if (isIOSSafari) {
-          // iOS Safari: Use Blob URL approach
-          try {
-            const binary = atob(data.voice_b64);
-            const array = new Uint8Array(binary.length);
-            for (let i = 0; i < binary.length; i++) {
-              array[i] = binary.charCodeAt(i);
-            }
-            const blob = new Blob([array], { type: 'audio/wav' });
-            const blobUrl = URL.createObjectURL(blob);
-
-            audio = new Audio(blobUrl);
-
-            // Clean up blob URL when audio ends or errors
-            audio.addEventListener('ended', () => {
-              URL.revokeObjectURL(blobUrl);
-              currentAudio = null;
-            });
-
-            audio.addEventListener('error', () => {
-              URL.revokeObjectURL(blobUrl);
-              currentAudio = null;
-            });
-          } catch (blobErr) {
-            console.error('🔧 Blob creation failed, falling back to Data URI:', blobErr);
-            audio = new Audio('data:audio/wav;base64,' + data.voice_b64);
-          }
-        } else {
-          // Non-iOS: Use Data URI approach
-          audio = new Audio('data:audio/wav;base64,' + data.voice_b64);
-        }
-
-        // Set audio properties
-        audio.volume = audioVolume;
-        audio.playbackRate = audioPlaybackRate;
-        audio.preload = 'auto';
-        currentAudio = audio;
-
-        // iOS-compatible play with multiple fallbacks
-        const playAudio = async () => {
-          try {
-            // Try to play immediately
-            await audio.play();
-          } catch (err) {
-            console.error('🔇 Initial play failed, trying iOS workaround:', err);
-
-            // iOS Safari workaround: Load and play on user interaction
-            audio.load();
-
-            // Try again after a short delay
-            setTimeout(async () => {
-              try {
-                await audio.play();
-              } catch (retryErr) {
-                console.error('🔇 Audio play failed after retry:', retryErr);
-                currentAudio = null;
-
-                // Add play button for iOS users when auto-play fails
-                if (isIOSSafari) {
-                  addPlayAudioButton(audio, data.voice_b64);
-                } else {
-                  // Show user-friendly message for other browsers
-                  if (retryErr.name === 'NotAllowedError') {
-                    messageHandler.addSystemMessage(
-                      elements.messages,
-                      '🔇 Audio blocked by browser. Try tapping the audio button or interacting with the page first.'
-                    );
-                  }
-                }
-              }
-            }, 100);
-          }
-        };
-
-        // Add event listeners
-        audio.addEventListener('canplaythrough', () => {
-          // Audio is ready to play
-        });
+  bot_message_full: (data) => {
+    // Reply to bot_message_request: the answer's full text, when ours didn't match its hash
+    const message = elements.messages?.querySelector(
+      `.message.bot[data-message-id="${CSS.escape(data.message_id)}"]`);
+    const messageText = message?.querySelector('.message-text');
+    if (messageText) {
+      messageText.textContent = data.full_message;
+      messageHandler.renderBotText(messageText);
+    }
+  },
 
-        audio.addEventListener('ended', () => {
-          currentAudio = null;
-        });
+  bot_voice: (data) => {
+    // Audio arrives sentence by sentence, in order, separately from the text
+    if (data.segment === 0) {
+      // A new response: drop whatever is still queued from the previous one
+      voiceSegments = [];
+      voiceQueue = [];
+      if (currentAudio) {
+        currentAudio.pause();
+        currentAudio = null;
+      }
+    }
 
-        audio.addEventListener('error', (err) => {
-          console.error('🔇 Audio error:', err);
-          currentAudio = null;
-        });
+    const voice = pickVoice(data);
+    if (voice) {
+      voiceSegments.push(voice);
+      if (isAudioEnabled) {
+        enqueueVoice(voice);
+      }
+    }
 
-        // Start playing
-        playAudio();
+    if (data.is_last && voiceSegments.length > 0) {
+      // The answer this audio belongs to, or the latest bot message
+      const lastBotMessage =
+        (data.message_id &&
+          elements.messages?.querySelector(
+            `.message.bot[data-message-id="${CSS.escape(data.message_id)}"]`)) ||
+        Array.from(elements.messages?.children || [])
+          .filter((msg) => msg.classList.contains('message') && msg.classList.contains('bot'))
+          .pop();
+      if (lastBotMessage && !lastBotMessage.querySelector('.tts-replay-btn-small')) {
+        addTTSReplayButton(lastBotMessage, [...voiceSegments]);
       }
     }
   },
 
   user_list: (data) => {
-    if (!elements.onlineUsers) return;
-    elements.onlineUsers.innerHTML = '';
-
-    data.users
-      .filter((user) => user !== currentUsername)
-      .forEach((user, index) => {
-        const li = document.createElement('li');
-        li.className = 'online-user';
-
-        // Check if PM tab already exists for this user
-        const existingTab = document.getElementById(`pm-tab-${user}`);
-        const hasPmChat = existingTab !== null;
-
-        const isEncryptionAvailable = utils.isCryptoAvailable();
-        const pmDisabled = hasPmChat || !isEncryptionAvailable;
-        const pmTitle = hasPmChat
-          ? 'PM chat already open'
-          : !isEncryptionAvailable
-          ? 'Private messages require HTTPS or localhost'
-          : 'Send PM invite';
-
-        // Store the backend username as a data attribute for PM functionality
-        li.innerHTML = `
-        <span class="user-name" data-backend-username="${user}">${user}</span>
-        <button class="pm-button ${pmDisabled ? 'disabled' : ''}" 
-                onclick="${pmDisabled ? 'return false;' : `sendPmInvite('${user}')`}" 
-                ${pmDisabled ? 'disabled' : ''}
-                title="${pmTitle}">
-          ${hasPmChat ? '✓' : !isEncryptionAvailable ? '🔒' : 'PM'}
-        </button>
-      `;
-        if (!isPanelHidden) {
-          li.style.animationDelay = `${0.4 + index * 0.1}s`;
-        }
-        elements.onlineUsers.appendChild(li);
-      });
+    onlineUsers = [...data.users];
+    rosterVersion = data.version ?? -1;
+    renderUserList(onlineUsers);
+  },
+
+  user_list_delta: (data) => {
+    if (data.version !== rosterVersion + 1) {
+      // Missed an update (or got one twice) - ask for a fresh snapshot
+      if (data.version > rosterVersion && socket && socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({ type: 'user_list_request' }));
+      }
+      return;
+    }
+    const left = new Set(data.left || []);
+    onlineUsers = onlineUsers.filter((user) => !left.has(user));
+    (data.joined || []).forEach((user) => {
+      if (!onlineUsers.includes(user)) onlineUsers.push(user);
+    });
+    rosterVersion = data.version;
+    renderUserList(onlineUsers);
   },
 
   pm_message: async (data) => {
@@ -859,6 +772,161 @@ const socketHandlers = {
   },
 };
 
+// Voice formats the server may offer, best first
+const VOICE_FORMAT_TYPES = {
+  opus: 'audio/ogg; codecs="opus"',
+  pcm16k: 'audio/wav',
+  wav: 'audio/wav',
+};
+
+function supportedVoiceFormats() {
+  const probe = document.createElement('audio');
+  return Object.keys(VOICE_FORMAT_TYPES).filter((fmt) => probe.canPlayType(VOICE_FORMAT_TYPES[fmt]) !== '');
+}
+
+// Pick the best clip this browser can play from a voice payload
+function pickVoice(data) {
+  if (data.voice_urls) {
+    const playable = supportedVoiceFormats();
+    const fmt = Object.keys(data.voice_urls).find((f) => playable.includes(f));
+    if (fmt) return data.voice_urls[fmt];
+  }
+  return data.voice_url || data.voice_b64 || null;
+}
+
+// Build an audio source from a clip URL or base64 WAV data
+function voiceSource(voice) {
+  return /^(\/|https?:)/.test(voice) ? voice : 'data:audio/wav;base64,' + voice;
+}
+
+// Queue a bot voice segment behind any segment that is still playing
+function enqueueVoice(voiceB64) {
+  voiceQueue.push(voiceB64);
+  if (!currentAudio) {
+    playNextVoice();
+  }
+}
+
+function playNextVoice() {
+  const next = voiceQueue.shift();
+  if (next) {
+    playVoice(next, playNextVoice);
+  }
+}
+
+// Play a bot voice clip (URL or base64 WAV), with iOS Safari fallbacks
+function playVoice(voiceB64, onEnded = null) {
+  // Stop any currently playing audio
+  if (currentAudio) {
+    currentAudio.pause();
+    currentAudio.currentTime = 0;
+  }
+
+  // Detect iOS Safari
+  const isIOS = /iPad|iPhone|iPod/.test(navigator.userAgent) && !window.MSStream;
+  const isSafari = /^((?!chrome|android).)*safari/i.test(navigator.userAgent);
+  const isIOSSafari = isIOS && isSafari;
+
+  let audio;
+
+  if (voiceSource(voiceB64) === voiceB64) {
+    // Clip served by URL: no data URI workarounds needed
+    audio = new Audio(voiceB64);
+  } else if (isIOSSafari) {
+    // iOS Safari: Use Blob URL approach
+    try {
+      const binary = atob(voiceB64);
+      const array = new Uint8Array(binary.length);
+      for (let i = 0; i < binary.length; i++) {
+        array[i] = binary.charCodeAt(i);
+      }
+      const blob = new Blob([array], { type: 'audio/wav' });
+      const blobUrl = URL.createObjectURL(blob);
+
+      audio = new Audio(blobUrl);
+
+      // Clean up blob URL when audio ends or errors
+      audio.addEventListener('ended', () => {
+        URL.revokeObjectURL(blobUrl);
+        currentAudio = null;
+      });
+
+      audio.addEventListener('error', () => {
+        URL.revokeObjectURL(blobUrl);
+        currentAudio = null;
+      });
+    } catch (blobErr) {
+      console.error('🔧 Blob creation failed, falling back to Data URI:', blobErr);
+      audio = new Audio('data:audio/wav;base64,' + voiceB64);
+    }
+  } else {
+    // Non-iOS: Use Data URI approach
+    audio = new Audio('data:audio/wav;base64,' + voiceB64);
+  }
+
+  // Set audio properties
+  audio.volume = audioVolume;
+  audio.playbackRate = audioPlaybackRate;
+  audio.preload = 'auto';
+  currentAudio = audio;
+
+  // iOS-compatible play with multiple fallbacks
+  const playAudio = async () => {
+    try {
+      // Try to play immediately
+      await audio.play();
+    } catch (err) {
+      console.error('🔇 Initial play failed, trying iOS workaround:', err);
+
+      // iOS Safari workaround: Load and play on user interaction
+      audio.load();
+
+      // Try again after a short delay
+      setTimeout(async () => {
+        try {
+          await audio.play();
+        } catch (retryErr) {
+          console.error('🔇 Audio play failed after retry:', retryErr);
+          currentAudio = null;
+          voiceQueue = [];
+
+          // Add play button for iOS users when auto-play fails
+          if (isIOSSafari) {
+            addPlayAudioButton(audio, voiceB64);
+          } else {
+            // Show user-friendly message for other browsers
+            if (retryErr.name === 'NotAllowedError') {
+              messageHandler.addSystemMessage(
+                elements.messages,
+                '🔇 Audio blocked by browser. Try tapping the audio button or interacting with the page first.'
+              );
+            }
+          }
+        }
+      }, 100);
+    }
+  };
+
+  // Add event listeners
+  audio.addEventListener('canplaythrough', () => {
+    // Audio is ready to play
+  });
+
+  audio.addEventListener('ended', () => {
+    if (currentAudio === audio) currentAudio = null;
+    if (onEnded) onEnded();
+  });
+
+  audio.addEventListener('error', (err) => {
+    console.error('🔇 Audio error:', err);
+    if (currentAudio === audio) currentAudio = null;
+    if (onEnded) onEnded();
+  });
+
+  // Start playing
+  playAudio();
+}
+
 // Function to add play audio button for iOS users
 function addPlayAudioButton(audio, voiceB64) {
   // Find the last bot message
@@ -1006,13 +1074,144 @@ function resetReconnectAttempts() {
   isReconnecting = false;
 }
 
+// Minimal MessagePack decoder for the server's binary frames (no ext types)
+const textDecoder = new TextDecoder();
+
+function decodeMsgpack(buffer) {
+  const view = new DataView(buffer);
+  const bytes = new Uint8Array(buffer);
+  let offset = 0;
+
+  const str = (length) => {
+    const value = textDecoder.decode(bytes.subarray(offset, offset + length));
+    offset += length;
+    return value;
+  };
+  const bin = (length) => {
+    const value = bytes.slice(offset, offset + length);
+    offset += length;
+    return value;
+  };
+  const array = (length) => {
+    const value = new Array(length);
+    for (let i = 0; i < length; i++) value[i] = read();
+    return value;
+  };
+  const map = (length) => {
+    const value = {};
+    for (let i = 0; i < length; i++) {
+      const key = read();
+      value[key] = read();
+    }
+    return value;
+  };
+  const next = (size, getter) => {
+    const value = getter(offset);
+    offset += size;
+    return value;
+  };
+
+  function read() {
+    const type = bytes[offset++];
+    if (type <= 0x7f) return type;
+    if (type <= 0x8f) return map(type & 0x0f);
+    if (type <= 0x9f) return array(type & 0x0f);
+    if (type <= 0xbf) return str(type & 0x1f);
+    if (type >= 0xe0) return type - 0x100;
+    switch (type) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return bin(next(1, (o) => view.getUint8(o)));
+      case 0xc5: return bin(next(2, (o) => view.getUint16(o)));
+      case 0xc6: return bin(next(4, (o) => view.getUint32(o)));
+      case 0xca: return next(4, (o) => view.getFloat32(o));
+      case 0xcb: return next(8, (o) => view.getFloat64(o));
+      case 0xcc: return next(1, (o) => view.getUint8(o));
+      case 0xcd: return next(2, (o) => view.getUint16(o));
+      case 0xce: return next(4, (o) => view.getUint32(o));
+      case 0xcf: return next(8, (o) => Number(view.getBigUint64(o)));
+      case 0xd0: return next(1, (o) => view.getInt8(o));
+      case 0xd1: return next(2, (o) => view.getInt16(o));
+      case 0xd2: return next(4, (o) => view.getInt32(o));
+      case 0xd3: return next(8, (o) => Number(view.getBigInt64(o)));
+      case 0xd9: return str(next(1, (o) => view.getUint8(o)));
+      case 0xda: return str(next(2, (o) => view.getUint16(o)));
+      case 0xdb: return str(next(4, (o) => view.getUint32(o)));
+      case 0xdc: return array(next(2, (o) => view.getUint16(o)));
+      case 0xdd: return array(next(4, (o) => view.getUint32(o)));
+      case 0xde: return map(next(2, (o) => view.getUint16(o)));
+      case 0xdf: return map(next(4, (o) => view.getUint32(o)));
+      default:
+        throw new Error(`Unsupported msgpack type 0x${type.toString(16)}`);
+    }
+  }
+
+  return read();
+}
+
+function decodeBinaryPayload(buffer) {
+  return WS_CONFIG.PROTOCOL === 'msgpack'
+    ? decodeMsgpack(buffer)
+    : JSON.parse(textDecoder.decode(buffer));
+}
+
+// Some browsers have DecompressionStream but not the 'deflate-raw' format
+function supportsDeflateRaw() {
+  try {
+    new DecompressionStream('deflate-raw');
+    return true;
+  } catch {
+    return false;
+  }
+}
+
+function inflateRaw(buffer) {
+  const stream = new Blob([buffer]).stream().pipeThrough(new DecompressionStream('deflate-raw'));
+  return new Response(stream).arrayBuffer();
+}
+
+// Server frames are JSON text, or binary: msgpack when WS_CONFIG.PROTOCOL is
+// 'msgpack', and prefixed with a flag byte (1 = deflated) when compression is on
+async function decodeServerMessage(frame) {
+  if (typeof frame === 'string') return JSON.parse(frame);
+  if (!compressedFrames) return decodeMsgpack(frame);
+  const body = frame.slice(1);
+  const isDeflated = new Uint8Array(frame, 0, 1)[0] === 1;
+  return decodeBinaryPayload(isDeflated ? await inflateRaw(body) : body);
+}
+
+// Short SHA-256 of a bot answer, matching the server's content_hash
+async function contentHash(text) {
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest).slice(0, 8))
+    .map((byte) => byte.toString(16).padStart(2, '0'))
+    .join('');
+}
+
+// Ask for the full answer if the text rebuilt from chunks is incomplete (e.g. joined mid-stream)
+async function verifyBotMessage(messageId, text, expectedHash) {
+  if (!window.crypto?.subtle) return;
+  if ((await contentHash(text)) === expectedHash) return;
+  console.warn(`⚠️ Bot message ${messageId} is incomplete, requesting full text`);
+  if (socket && socket.readyState === WebSocket.OPEN) {
+    socket.send(JSON.stringify({ type: 'bot_message_request', data: { message_id: messageId } }));
+  }
+}
+
 // WebSocket setup
 function setupSocket() {
   if (socket && socket.readyState === WebSocket.OPEN) {
     socket.close();
   }
 
-  socket = new WebSocket(`${WS_CONFIG.ACTIVE_WS_URL}?token=${token}`);
+  compressedFrames = WS_CONFIG.COMPRESS && supportsDeflateRaw();
+  const proto = WS_CONFIG.PROTOCOL === 'msgpack' ? '&proto=msgpack' : '';
+  const compress = compressedFrames ? '&compress=1' : '';
+  socket = new WebSocket(`${WS_CONFIG.ACTIVE_WS_URL}?token=${token}${proto}${compress}`);
+  socket.binaryType = 'arraybuffer';
+  // Inflating is asynchronous, so frames are handled through a chain to keep their order
+  let inboundFrames = Promise.resolve();
 
   socket.addEventListener('open', () => {
     console.log('✅ WebSocket connected');
@@ -1025,56 +1224,76 @@ function setupSocket() {
 
     // Start ping timer
     startPingTimer();
+
+    // Tell the server which voice formats this browser can play
+    socket.send(
+      JSON.stringify({
+        type: 'audio_formats',
+        data: { formats: supportedVoiceFormats() },
+      })
+    );
+
+    // Bot answers to other visitors are only delivered to lobby subscribers
+    if (WS_CONFIG.WATCH_ALL_BOT_ANSWERS) {
+      socket.send(
+        JSON.stringify({
+          type: 'room_subscribe',
+          data: { room: 'lobby', subscribe: true },
+        })
+      );
+    }
   });
 
   socket.addEventListener('message', (event) => {
-    try {
-      const data = JSON.parse(event.data);
-      console.log('🔍 Received WebSocket message:', data);
-
-      // Handle ping/pong
-      if (data.type === 'ping') {
-        // Respond to ping with pong
-        if (socket && socket.readyState === WebSocket.OPEN) {
-          socket.send(JSON.stringify({ type: 'pong' }));
+    inboundFrames = inboundFrames.then(async () => {
+      try {
+        const data = await decodeServerMessage(event.data);
+        console.log('🔍 Received WebSocket message:', data);
+
+        // Handle ping/pong
+        if (data.type === 'ping') {
+          // Respond to ping with pong
+          if (socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ type: 'pong' }));
+          }
+          return;
         }
-        return;
-      }
 
-      if (data.type === 'pong') {
-        // Update last pong time
-        lastPongTime = Date.now();
-        if (pongTimer) {
-          clearTimeout(pongTimer);
-          pongTimer = null;
+        if (data.type === 'pong') {
+          // Update last pong time
+          lastPongTime = Date.now();
+          if (pongTimer) {
+            clearTimeout(pongTimer);
+            pongTimer = null;
+          }
+          return;
         }
-        return;
-      }
 
-      if (data.type === 'error') {
-        console.error('❌ Server error:', data.message);
-        messageHandler.addMessage(elements.messages, 'System', `Error: ${data.message}`, 'system');
-        return;
-      }
+        if (data.type === 'error') {
+          console.error('❌ Server error:', data.message);
+          messageHandler.addMessage(elements.messages, 'System', `Error: ${data.message}`, 'system');
+          return;
+        }
 
-      const handler = socketHandlers[data.event] || socketHandlers[data.type];
-      if (handler) {
-        handler(data.data || data);
-      } else {
-        console.warn('⚠️ No handler found for message type:', data.type || data.event);
-        // Handle unknown message types gracefully
-        if (data.message) {
-          messageHandler.addMessage(elements.messages, 'System', data.message, 'system');
-        } else if (typeof event.data === 'string') {
-          messageHandler.addMessage(elements.messages, 'System', event.data, 'system');
+        const handler = socketHandlers[data.event] || socketHandlers[data.type];
+        if (handler) {
+          handler(data.data || data);
+        } else {
+          console.warn('⚠️ No handler found for message type:', data.type || data.event);
+          // Handle unknown message types gracefully
+          if (data.message) {
+            messageHandler.addMessage(elements.messages, 'System', data.message, 'system');
+          } else if (typeof event.data === 'string') {
+            messageHandler.addMessage(elements.messages, 'System', event.data, 'system');
+          }
+        }
+      } catch (error) {
+        console.error('Error parsing WebSocket message:', error);
+        if (typeof event.data === 'string') {
+          messageHandler.addMessage(elements.messages, 'System', event.data, 'bot');
         }
       }
-    } catch (error) {
-      console.error('Error parsing WebSocket message:', error);
-      if (typeof event.data === 'string') {
-        messageHandler.addMessage(elements.messages, 'System', event.data, 'bot');
-      }
-    }
+    });
   });
 
   socket.addEventListener('error', (error) => {
@@ -4145,17 +4364,22 @@ async function addGeneratedTimestamp(
 
   // Add TTS replay button at the end of the message if voice data is available
   if (voiceB64) {
-    const replayButton = document.createElement('button');
-    replayButton.className = 'tts-replay-btn-small';
-    replayButton.innerHTML = '🔊';
-    replayButton.title = 'Replay TTS audio';
-    replayButton.onclick = () => replayTTS(voiceB64);
-
-    // Append the button to the end of the message
-    messageElement.appendChild(replayButton);
+    addTTSReplayButton(messageElement, voiceB64);
   }
 }
 
+// Add a small TTS replay button to the end of a bot message
+function addTTSReplayButton(messageElement, voiceB64) {
+  const replayButton = document.createElement('button');
+  replayButton.className = 'tts-replay-btn-small';
+  replayButton.innerHTML = '🔊';
+  replayButton.title = 'Replay TTS audio';
+  replayButton.onclick = () => replayTTS(voiceB64);
+
+  // Append the button to the end of the message
+  messageElement.appendChild(replayButton);
+}
+
 // Cache system removed - no more local storage caching
 
 // Function to replay TTS audio
@@ -4166,23 +4390,32 @@ function replayTTS(voiceB64) {
       userHasInteracted = true;
     }
 
-    // Create audio element from base64 data
-    const audio = new Audio('data:audio/wav;base64,' + voiceB64);
+    // Streamed responses carry one clip per sentence; play them back to back
+    const clips = Array.isArray(voiceB64) ? voiceB64 : [voiceB64];
+    const playClip = (index) => {
+      if (index >= clips.length) return;
 
-    // Set audio properties
-    audio.volume = audioVolume;
-    audio.playbackRate = audioPlaybackRate;
+      // Create audio element from base64 data
+      const audio = new Audio(voiceSource(clips[index]));
 
-    // Play the audio
-    audio
-      .play()
-      .then(() => {
-        // TTS replay successful
-      })
-      .catch((error) => {
-        console.error('🔇 TTS replay failed:', error);
-        showToast('Failed to replay audio', 'error', 2000);
-      });
+      // Set audio properties
+      audio.volume = audioVolume;
+      audio.playbackRate = audioPlaybackRate;
+      audio.addEventListener('ended', () => playClip(index + 1));
+
+      // Play the audio
+      audio
+        .play()
+        .then(() => {
+          // TTS replay successful
+        })
+        .catch((error) => {
+          console.error('🔇 TTS replay failed:', error);
+          showToast('Failed to replay audio', 'error', 2000);
+        });
+    };
+
+    playClip(0);
   } catch (error) {
     console.error('🔇 TTS replay error:', error);
     showToast('Failed to replay audio', 'error', 2000);
@@ -76,6 +76,14 @@ class PubkeyResponseMessage(BaseModel):
 class UserListMessage(BaseModel):
     type: Literal["user_list"] = "user_list"
     users: List[str] = Field(..., title="List of online usernames")
+    version: int = Field(0, title="Roster version this snapshot reflects")
+
+
+class UserListDeltaMessage(BaseModel):
+    type: Literal["user_list_delta"] = "user_list_delta"
+    joined: List[str] = Field(default_factory=list, title="Usernames that came online")
+    left: List[str] = Field(default_factory=list, title="Usernames that went offline")
+    version: int = Field(..., title="Roster version after applying this delta")
 
 
 # Union of all private message types
@@ -0,0 +1,96 @@
+import io
+import wave
+from typing import List, Tuple
+
+import numpy as np
+
+try:
+    import soundfile as sf
+except ImportError:  # Opus output is optional
+    sf = None
+
+
+def _read_wav(wav_bytes: bytes) -> Tuple[np.ndarray, int]:
+    """Decode 16-bit PCM WAV bytes into mono int16 samples."""
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wav_file:
+        rate = wav_file.getframerate()
+        channels = wav_file.getnchannels()
+        samples = np.frombuffer(
+            wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, rate
+
+
+def _resample(samples: np.ndarray, rate: int, target_rate: int) -> np.ndarray:
+    """Linear-interpolation resample (plenty for speech)."""
+    if rate == target_rate or len(samples) == 0:
+        return samples
+    duration = len(samples) / rate
+    target_len = max(1, int(round(duration * target_rate)))
+    positions = np.linspace(0, len(samples) - 1, target_len)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+
+
+def _encode_wav(wav_bytes: bytes) -> bytes:
+    return wav_bytes
+
+
+def _encode_pcm16k(wav_bytes: bytes) -> bytes:
+    """Mono 16 kHz 16-bit WAV - plays everywhere, ~30% smaller than Piper's 22 kHz output."""
+    samples, rate = _read_wav(wav_bytes)
+    samples = _resample(samples, rate, 16000)
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(16000)
+        wav_file.writeframes(samples.tobytes())
+    return out.getvalue()
+
+
+def _encode_opus(wav_bytes: bytes) -> bytes:
+    """Opus in an Ogg container - roughly a tenth of the WAV size for speech."""
+    samples, rate = _read_wav(wav_bytes)
+    # Opus only accepts 8/12/16/24/48 kHz input
+    samples = _resample(samples, rate, 24000)
+    out = io.BytesIO()
+    sf.write(out, samples, 24000, format="OGG", subtype="OPUS")
+    return out.getvalue()
+
+
+def _opus_supported() -> bool:
+    try:
+        return sf is not None and "OPUS" in sf.available_subtypes("OGG")
+    except Exception:
+        return False
+
+
+# format name -> (file extension, MIME type, encoder)
+AUDIO_ENCODERS = {
+    "opus": ("opus.ogg", 'audio/ogg; codecs="opus"', _encode_opus),
+    "pcm16k": ("16k.wav", "audio/wav", _encode_pcm16k),
+    "wav": ("wav", "audio/wav", _encode_wav),
+}
+
+
+def available_formats(requested: List[str]) -> List[str]:
+    """Requested formats this server can actually produce (falls back to WAV)."""
+    formats = []
+    for fmt in requested:
+        fmt = fmt.strip().lower()
+        if fmt not in AUDIO_ENCODERS or fmt in formats:
+            continue
+        if fmt == "opus" and not _opus_supported():
+            print("⚠️ soundfile/libsndfile without Opus support, skipping opus voice output")
+            continue
+        formats.append(fmt)
+    return formats or ["wav"]
+
+
+def encode_audio(wav_bytes: bytes, fmt: str) -> bytes:
+    return AUDIO_ENCODERS[fmt][2](wav_bytes)
+
+
+def audio_extension(fmt: str) -> str:
+    return AUDIO_ENCODERS[fmt][0]
@@ -0,0 +1,115 @@
+import asyncio
+import re
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional
+
+from server.voice.synth import clean_tts_text, synthesize_to_urls_async
+
+
+class SentenceSplitter:
+    """Split streamed text into complete sentences as the chunks arrive."""
+
+    # Sentence end (optionally followed by closing quotes/brackets) then whitespace, or a blank line
+    _BOUNDARY = re.compile(r'[.!?]+["\')\]]*\s+|\n\s*\n')
+
+    def __init__(self, min_chars: int = 20):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> List[str]:
+        """Add a chunk and return any sentences it completed."""
+        self._buffer += chunk
+        sentences = []
+        start = 0
+        for match in self._BOUNDARY.finditer(self._buffer):
+            end = match.end()
+            candidate = self._buffer[start:end]
+            # Never split inside a [COMMAND|...] marker or keep tiny fragments on their own
+            if candidate.count("[") != candidate.count("]") or len(candidate.strip()) < self.min_chars:
+                continue
+            sentences.append(candidate.strip())
+            start = end
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Return whatever text is left once the stream has finished."""
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return remainder or None
+
+
+class VoiceSegments:
+    """
+    Incremental TTS for a streaming bot response.
+
+    Each sentence is handed to the TTS worker pool as soon as it is complete,
+    and the resulting clips are delivered through send() strictly in order as
+    bot_voice payloads with a segment index and an is_last flag.
+    """
+
+    def __init__(self, send: Callable[[dict], Awaitable[None]], formats: Optional[List[str]] = None):
+        self._send = send
+        self._formats = formats
+        self._splitter = SentenceSplitter()
+        self._pending: Deque[asyncio.Future] = deque()
+        self._finished = False
+        self._wakeup = asyncio.Event()
+        self._sender = asyncio.create_task(self._deliver())
+
+    def feed(self, chunk: str):
+        for sentence in self._splitter.feed(chunk):
+            self._submit(sentence)
+
+    def _submit(self, text: str):
+        if not re.search(r"\w", clean_tts_text(text)):
+            return
+        self._pending.append(asyncio.ensure_future(
+            synthesize_to_urls_async(text, formats=self._formats)))
+        self._wakeup.set()
+
+    async def finish(self):
+        """Synthesize the trailing text and wait until every clip is sent."""
+        remainder = self._splitter.flush()
+        if remainder:
+            self._submit(remainder)
+        self._finished = True
+        self._wakeup.set()
+        await self._sender
+
+    def cancel(self):
+        """Stop delivering audio (e.g. the response was abandoned)."""
+        self._sender.cancel()
+        while self._pending:
+            self._pending.popleft().cancel()
+
+    async def _deliver(self):
+        segment = 0
+        closed = False
+        while True:
+            if not self._pending:
+                if self._finished:
+                    break
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            try:
+                voice_urls = await self._pending.popleft()
+            except Exception as e:
+                print(f"❌ Failed to synthesize voice segment {segment}: {e}")
+                voice_urls = None
+
+            is_last = self._finished and not self._pending
+            if voice_urls is not None or is_last:
+                await self._send({
+                    "segment": segment,
+                    "is_last": is_last,
+                    "voice_urls": voice_urls  # {format: URL}, best format first
+                })
+                segment += 1
+                closed = is_last
+
+        if not closed:
+            # Close the sequence so clients know no more audio is coming
+            await self._send({"segment": segment, "is_last": True, "voice_urls": None})
@@ -1,14 +1,23 @@
 import io
+import os
 import wave
 import base64
+import asyncio
+import hashlib
+from typing import Dict, Iterable, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from piper import PiperVoice, SynthesisConfig
 import re
+from server.voice.tts_cache import TTSCache
+from server.voice.encoders import available_formats, audio_extension, encode_audio
 
+_MODEL_PATH = "server/voice/en_US-ryanTTS-medium.onnx"
+_MODEL_CONFIG_PATH = "server/voice/en_US-ryanTTS-medium.onnx.json"
 
 # Load model once globally
 _voice = PiperVoice.load(
-    "server/voice/en_US-ryanTTS-medium.onnx",
-    config_path="server/voice/en_US-ryanTTS-medium.onnx.json",
+    _MODEL_PATH,
+    config_path=_MODEL_CONFIG_PATH,
     use_cuda=False  # Set to True if you're using GPU + onnxruntime-gpu
 )
 
@@ -20,15 +29,102 @@ _config = SynthesisConfig(
     normalize_audio=True,
 )
 
-def synthesize_to_base64(text: str) -> str:
-    """Generate TTS from text and return base64-encoded .wav bytes"""
+# Bounded worker pool so ONNX inference never runs on the event loop
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TTS_MAX_WORKERS", "2")),
+    thread_name_prefix="piper-tts"
+)
+
+# Synthesized clips are cached on disk and served by the static files mount
+tts_cache = TTSCache(
+    "server/static/tts_cache",
+    "/static/tts_cache",
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "200")) * 1024 * 1024
+)
+
+
+def _voice_fingerprint() -> str:
+    """Identify the voice model and settings so a change never serves stale audio"""
+    with open(_MODEL_CONFIG_PATH, 'rb') as f:
+        model_config = f.read()
+    model_size = os.path.getsize(_MODEL_PATH) if os.path.exists(_MODEL_PATH) else 0
+    return hashlib.sha256(
+        f"{_MODEL_PATH}|{model_size}|{repr(_config)}".encode("utf-8") + model_config
+    ).hexdigest()
+
+
+_fingerprint = _voice_fingerprint()
+
+# Voice formats offered to clients, best first (opus needs soundfile with libsndfile Opus support)
+AUDIO_FORMATS = available_formats(
+    os.getenv("TTS_AUDIO_FORMATS", "opus,pcm16k").split(","))
+
+def clean_tts_text(text: str) -> str:
+    """Strip markup that shouldn't be read aloud"""
     # remove asterisks and dashes from text and any http links and [BUTTON|view_project_images|View Images]
     text = text.replace('*', '')
     text = text.replace('-', '')
     text = re.sub(r'http\S+', '', text)
     text = re.sub(r'\[BUTTON\|.*?\|View [^\]]+\]', '', text)
+    return text
+
+
+def synthesize_wav(text: str) -> bytes:
+    """Generate TTS from text and return .wav bytes"""
+    text = clean_tts_text(text)
     wav_bytes = io.BytesIO()
     with wave.open(wav_bytes, "wb") as wav_file:
         _voice.synthesize_wav(text, wav_file, syn_config=_config)
-    wav_bytes.seek(0)
-    return base64.b64encode(wav_bytes.read()).decode("utf-8")
+    return wav_bytes.getvalue()
+
+
+def synthesize_to_base64(text: str) -> str:
+    """Generate TTS from text and return base64-encoded .wav bytes"""
+    return base64.b64encode(synthesize_wav(text)).decode("utf-8")
+
+
+def negotiate_formats(requested: Optional[Iterable[str]] = None) -> List[str]:
+    """Formats to produce for the given client preferences, in server preference order"""
+    if not requested:
+        return AUDIO_FORMATS
+    requested = set(requested)
+    return [fmt for fmt in AUDIO_FORMATS if fmt in requested] or AUDIO_FORMATS[-1:]
+
+
+def synthesize_to_urls(text: str, force: bool = False, formats: Optional[List[str]] = None) -> Dict[str, str]:
+    """Return {format: URL} of the cached clips for text, synthesizing/encoding any that are missing"""
+    formats = formats or AUDIO_FORMATS
+    key = TTSCache.make_key(clean_tts_text(text), _fingerprint)
+    urls = {}
+    if not force:
+        for fmt in formats:
+            url = tts_cache.lookup(f"{key}.{audio_extension(fmt)}")
+            if url:
+                urls[fmt] = url
+        if len(urls) == len(formats):
+            return urls
+
+    wav_bytes = synthesize_wav(text)
+    for fmt in formats:
+        if fmt not in urls:
+            urls[fmt] = tts_cache.store(
+                f"{key}.{audio_extension(fmt)}", encode_audio(wav_bytes, fmt))
+    # Keep the caller's preference order
+    return {fmt: urls[fmt] for fmt in formats}
+
+
+def synthesize_to_url(text: str, force: bool = False) -> str:
+    """Return the URL of the cached WAV clip for text, synthesizing it on a miss (or when forced)"""
+    return synthesize_to_urls(text, force, ["wav"])["wav"]
+
+
+async def synthesize_to_url_async(text: str, force: bool = False) -> str:
+    """Run synthesize_to_url on the TTS worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, synthesize_to_url, text, force)
+
+
+async def synthesize_to_urls_async(text: str, force: bool = False, formats: Optional[List[str]] = None) -> Dict[str, str]:
+    """Run synthesize_to_urls on the TTS worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, synthesize_to_urls, text, force, formats)
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class TTSCache:
+    """
+    Content-addressed on-disk store for synthesized speech.
+
+    Files are named by a hash of the cleaned text plus the voice/synthesis
+    settings, live under the static directory so clients can fetch them by
+    URL, and the least recently used files are deleted once the directory
+    grows past max_bytes.
+    """
+
+    def __init__(self, directory: str, url_prefix: str, max_bytes: int):
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip("/")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._scan()
+
+    def _scan(self):
+        """Index files left from earlier runs, oldest first."""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self._total += size
+        if entries:
+            print(
+                f"🗂️ TTS cache: {len(entries)} clips, {self._total / 1024 / 1024:.1f} MB")
+
+    @staticmethod
+    def make_key(text: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{fingerprint}\n{text}".encode("utf-8")).hexdigest()
+
+    def url_for(self, name: str) -> str:
+        return f"{self.url_prefix}/{name}"
+
+    def lookup(self, name: str) -> Optional[str]:
+        """URL of a cached file, marking it recently used."""
+        with self._lock:
+            if name not in self._files:
+                return None
+            self._files.move_to_end(name)
+        try:
+            os.utime(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            with self._lock:
+                self._total -= self._files.pop(name, 0)
+            return None
+        return self.url_for(name)
+
+    def store(self, name: str, data: bytes) -> str:
+        """Write a file atomically, evict old files over the size cap, and return its URL."""
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total -= self._files.pop(name, 0)
+            self._files[name] = len(data)
+            self._total += len(data)
+            evicted = []
+            while self._total > self.max_bytes and len(self._files) > 1:
+                old_name, size = self._files.popitem(last=False)
+                self._total -= size
+                evicted.append(old_name)
+
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old_name))
+            except FileNotFoundError:
+                pass
+        if evicted:
+            print(f"🧹 TTS cache evicted {len(evicted)} clip(s)")
+        return self.url_for(name)